@@ -1,33 +1,49 @@
-from typing import Any, Literal, Optional, List, Dict
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable, Literal, Optional, List, Dict
 
 import asyncio
+import base64
+import contextvars
 import csv
+import functools
 import io
 import json
 import logging
+import math
 import os
 import re
+import time
 import urllib.parse
 import uuid
-from datetime import datetime
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
 
-from fastapi import FastAPI, File, HTTPException, UploadFile, Depends
-from fastapi.responses import StreamingResponse
+from fastapi import FastAPI, File, HTTPException, Query, Request, UploadFile, Depends
+from fastapi.responses import Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from database import engine, Base, get_db
-from models import RunModel, KnowledgeBaseEntryModel
+from sqlalchemy import delete, func, literal_column, select, text, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, load_only
+import database
+from database import SessionLocal, get_async_db, get_db
+from models import RunModel, KnowledgeBaseEntryModel, BulkJobModel
+import bulk_jobs_helper
+import dedup_helper
+import cassette_helper
+import fakes_helper
+import kb_corrections_helper
+import kb_index_helper
+import listings_helper
+import llm_usage_helper
+import metrics_helper
+import read_cache_helper
+import tracing_helper
+import trends_helper
+import migrations
 from pydantic import BaseModel, Field, field_validator, model_validator
 from dotenv import load_dotenv
-import requests
-from bs4 import BeautifulSoup
-from playwright.sync_api import sync_playwright
-
-try:
-    from curl_cffi import requests as _curl_requests
-except ImportError:
-    _curl_requests = None
-
+# requests / BeautifulSoup / Playwright / curl_cffi are imported inside the velocity scrapers that use
+# them, keeping them off the import path of every cold start (see import_budget.py).
 from bedrock_helper import analyze_with_bedrock
 
 # BrowserUse SDK for /scrape/start + /scrape/results/{job_id} (only scraper in use)
@@ -35,13 +51,23 @@ _browser_use_client: Any = None
 
 def _get_browser_use_client():
     global _browser_use_client
+    if _browser_use_client is not None:
+        return _browser_use_client
+    client: Any = None
     api_key = os.environ.get("BROWSER_USE_API_KEY")
-    if _browser_use_client is None and api_key:
+    if cassette_helper.replaying():
+        client = cassette_helper.browser_use()
+    elif fakes_helper.enabled("browseruse"):
+        client = fakes_helper.browser_use()
+    elif api_key:
         try:
             from browser_use_sdk import AsyncBrowserUse  # type: ignore[import-untyped]
-            _browser_use_client = AsyncBrowserUse()
+            client = AsyncBrowserUse()
         except Exception as e:
             logger.warning("BrowserUse client init failed (check SDK install / serverless compatibility): %s", e)
+    if client is not None and cassette_helper.recording():
+        client = cassette_helper.browser_use(client)
+    _browser_use_client = client
     return _browser_use_client
 
 # In-memory job store for browser scrape jobs (per process)
@@ -76,7 +102,35 @@ _load_env()
 _best_effort_utf8_stdio()
 
 
-app = FastAPI(title="BUDLI helper API", version="0.1.0")
+# How often the event-loop lag histogram samples (budli_event_loop_lag_seconds on /metrics).
+EVENT_LOOP_LAG_INTERVAL_SECONDS = float(os.getenv("EVENT_LOOP_LAG_INTERVAL_SECONDS", "0.1"))
+
+
+@asynccontextmanager
+async def _lifespan(app: FastAPI):
+    # Schema changes live in migrations.py; set RUN_MIGRATIONS_ON_STARTUP=0 when the deploy runs
+    # `python migrations.py upgrade` itself.
+    if os.getenv("RUN_MIGRATIONS_ON_STARTUP", "1") == "1":
+        applied = await asyncio.get_running_loop().run_in_executor(None, migrations.upgrade)
+        if applied:
+            logger.info("Applied migrations: %s", applied)
+    try:
+        loaded = await _run_db(functools.partial(kb_index_helper.index.refresh, force=True))
+        logger.info("KB neighbour index loaded: %d entries", loaded)
+    except Exception as e:
+        logger.warning("Could not load KB neighbour index (loaded lazily on first estimate): %s", e)
+    if os.getenv("BULK_JOBS_RESUME_ON_STARTUP", "1") == "1":
+        try:
+            await _resume_running_bulk_jobs()
+        except Exception as e:
+            logger.warning("Could not resume bulk jobs on startup: %s", e)
+    lag_monitor = asyncio.create_task(metrics_helper.monitor_event_loop_lag(EVENT_LOOP_LAG_INTERVAL_SECONDS))
+    yield
+    lag_monitor.cancel()
+    await database.dispose_engines()
+
+
+app = FastAPI(title="BUDLI helper API", version="0.1.0", lifespan=_lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -84,22 +138,10 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
-
-# Initialize database tables
-Base.metadata.create_all(bind=engine)
-
-# Add scrape_results column if missing (e.g. existing DBs created before this field)
-def _ensure_scrape_results_column():
-    try:
-        from sqlalchemy import text
-        with engine.connect() as conn:
-            conn.execute(text("ALTER TABLE runs ADD COLUMN IF NOT EXISTS scrape_results JSONB DEFAULT '{}'"))
-            conn.commit()
-    except Exception as e:
-        logger.warning("Could not add scrape_results column (may already exist): %s", e)
-
-_ensure_scrape_results_column()
+# Bedrock usage is attributed to the request path (and to the jobs a request starts).
+app.add_middleware(llm_usage_helper.EndpointMiddleware)
 
 logger = logging.getLogger("budli-api")
 if not logger.handlers:
@@ -211,13 +253,32 @@ def _browser_results_to_devices(results: dict[str, list[BrowserScrapeDevice]]) -
     return devices
 
 
-async def _run_single_browser(client: Any, prompt: str, session_id: str) -> Any:
-    result = await client.run(
-        prompt,
-        session_id=session_id,
-        output_schema=BrowserScrapeDevicesList,
-    )
-    return result.output
+async def _run_single_browser(client: Any, prompt: str, session_id: str, source: str = "") -> Any:
+    start, outcome = time.perf_counter(), "error"
+    try:
+        with tracing_helper.span("scrape.source", source=source, session_id=session_id) as span:
+            result = await client.run(
+                prompt,
+                session_id=session_id,
+                output_schema=BrowserScrapeDevicesList,
+            )
+            if span:
+                span.set(items=len(getattr(result.output, "items", None) or []))
+        outcome = "ok"
+        return result.output
+    finally:
+        metrics_helper.SCRAPE_SECONDS.observe(time.perf_counter() - start, source=source, outcome=outcome)
+
+
+async def _create_browser_session(client: Any) -> Any:
+    start, outcome = time.perf_counter(), "error"
+    try:
+        with tracing_helper.span("browseruse.session.create"):
+            session = await client.sessions.create()
+        outcome = "ok"
+        return session
+    finally:
+        metrics_helper.BROWSER_SESSION_CREATE_SECONDS.observe(time.perf_counter() - start, outcome=outcome)
 
 
 _BROWSER_SOURCES = ["ovantica", "refitglobal", "cashify"]
@@ -240,8 +301,8 @@ async def _run_browser_scrape_tasks(
             len(session_ids),
         )
     tasks = [
-        asyncio.create_task(_run_single_browser(client, prompt, sid))
-        for prompt, sid in zip(prompts, session_ids)
+        asyncio.create_task(_run_single_browser(client, prompt, sid, source))
+        for source, prompt, sid in zip(_BROWSER_SOURCES, prompts, session_ids)
     ]
     results_list = await asyncio.gather(*tasks, return_exceptions=True)
     results: dict[str, list[BrowserScrapeDevice]] = {}
@@ -255,6 +316,7 @@ async def _run_browser_scrape_tasks(
                 x if isinstance(x, BrowserScrapeDevice) else BrowserScrapeDevice(**(x or {}))
                 for x in raw
             ]
+        metrics_helper.SCRAPE_ITEMS.inc(len(results[source]), source=source)
     return results
 
 
@@ -265,6 +327,7 @@ async def _run_browser_scrape(job_id: str, prompts: list[str], session_ids: list
         _browser_scrape_jobs[job_id]["error"] = "BrowserUse client not available"
         return
     results = await _run_browser_scrape_tasks(client, prompts, session_ids)
+    await _record_listings(results, _browser_scrape_jobs[job_id].get("query") or "")
     _browser_scrape_jobs[job_id]["results"] = results
     _browser_scrape_jobs[job_id]["status"] = "finished"
 
@@ -282,22 +345,73 @@ async def _scrape_with_browser(query: str) -> tuple[list[dict], list[dict]]:
     prompts = _browser_prompts_for_query(query)
     prompts = prompts[:NUM_BROWSER_SESSIONS]
     try:
-        sessions = [await client.sessions.create() for _ in range(NUM_BROWSER_SESSIONS)]
+        sessions = [await _create_browser_session(client) for _ in range(NUM_BROWSER_SESSIONS)]
     except Exception as e:
         logger.warning("Browser session create failed: %s", e)
         return [], []
 
     session_ids = [s.id for s in sessions]
     results = await _run_browser_scrape_tasks(client, prompts, session_ids)
+    await _record_listings(results, query)
     devices = _browser_results_to_devices(results)
     device_dicts = [d.model_dump() for d in devices]
+    return device_dicts, _source_urls_for_query(query)
+
+
+def _source_urls_for_query(query: str) -> list[dict]:
     encoded = urllib.parse.quote_plus(query)
-    source_urls = [
+    return [
         {"source": "ovantica", "url": f"https://ovantica.com/catalogsearch/result?q={urllib.parse.quote(query)}"},
         {"source": "refitglobal", "url": f"https://refitglobal.com/search?q={encoded}"},
         {"source": "cashify", "url": f"https://www.cashify.in/buy-refurbished-gadgets/all-gadgets/search?q={encoded}"},
     ]
-    return device_dicts, source_urls
+
+
+# Reuse listings scraped for the same query within this many hours instead of scraping again (0 = always scrape).
+LISTINGS_REUSE_MAX_AGE_HOURS = float(os.getenv("LISTINGS_REUSE_MAX_AGE_HOURS", "0"))
+
+
+def _store_listings(db: Session, rows: list[tuple]) -> None:
+    # Listings and the trend rollups they touch commit together.
+    listings_helper.copy_listings(db, rows, commit=False)
+    trends_helper.refresh_for_listings(db, rows)
+    db.commit()
+
+
+async def _record_listings(results: dict[str, list], query: str, run_id: Optional[str] = None) -> None:
+    """COPY a scrape's listings into the listings table. Best effort: a failure never fails the scrape."""
+    try:
+        rows = list(listings_helper.listing_rows(results, query, run_id=run_id))
+        if rows:
+            with tracing_helper.span("db.write", op="store_listings", rows=len(rows)):
+                await _run_db(_store_listings, rows)
+    except Exception as e:
+        logger.warning("Could not record listings for %r: %s", query, e)
+
+
+async def _recent_listings_as_devices(query: str) -> list[dict]:
+    """Listings from a recent scrape of `query`, shaped like _scrape_with_browser devices; [] if none/disabled."""
+    if LISTINGS_REUSE_MAX_AGE_HOURS <= 0:
+        return []
+    try:
+        rows = await _run_db(
+            listings_helper.recent_for_query, query, timedelta(hours=LISTINGS_REUSE_MAX_AGE_HOURS)
+        )
+    except Exception as e:
+        logger.warning("Listing history lookup failed for %r: %s", query, e)
+        return []
+    return [
+        {
+            "name": r["model"],
+            "price": str(r["price"]),
+            "source": r["source"],
+            "storage": f"{r['storage_gb']}GB" if r["storage_gb"] else None,
+            "ram": f"{r['ram_gb']}GB" if r["ram_gb"] else None,
+            "condition": r["condition"],
+            "scraped_at": r["scraped_at"],
+        }
+        for r in rows
+    ]
 
 
 class AnalyzeRequest(BaseModel):
@@ -332,7 +446,41 @@ class BedrockTestResponse(BaseModel):
 
 @app.get("/health")
 def health() -> dict[str, Any]:
-    return {"ok": True}
+    out = {"ok": True, "db_pool": database.pool_health(), "read_cache": read_cache_helper.cache.info()}
+    if fakes_helper.FAKE_SERVICES:
+        out["fakes"] = fakes_helper.stats()
+    if cassette_helper.MODE:
+        out["cassette"] = cassette_helper.stats()
+    return out
+
+
+def _job_counts() -> dict[tuple, int]:
+    counts: dict[tuple, int] = {}
+    for kind, jobs in (("browser_scrape", _browser_scrape_jobs), ("analyze_devices", _analyze_devices_jobs)):
+        for job in list(jobs.values()):
+            key = (kind, str(job.get("status")))
+            counts[key] = counts.get(key, 0) + 1
+    counts[("bulk_runner", "running")] = len(_bulk_job_tasks)
+    return counts
+
+
+def _read_cache_counts() -> dict[tuple, int]:
+    stats = read_cache_helper.cache.stats
+    return {
+        ("read_cache", "hit"): stats["hits"],
+        ("read_cache", "revalidated"): stats["revalidated"],
+        ("read_cache", "miss"): stats["misses"],
+    }
+
+
+metrics_helper.JOBS.set_function(_job_counts)
+metrics_helper.CACHE_REQUESTS.set_function(_read_cache_counts)
+
+
+@app.get("/metrics")
+def metrics() -> Response:
+    """Prometheus text exposition of the in-process metrics (see metrics_helper)."""
+    return Response(content=metrics_helper.registry.render(), media_type=metrics_helper.CONTENT_TYPE)
 
 
 @app.post("/scrape/start")
@@ -352,7 +500,7 @@ async def scrape_start(req: ScrapeRequest) -> dict[str, Any]:
     live_urls: list[str] = []
     for i in range(NUM_BROWSER_SESSIONS):
         try:
-            session = await client.sessions.create()
+            session = await _create_browser_session(client)
             sessions.append(session.id)
             live_urls.append(session.live_url)
         except Exception as e:
@@ -407,6 +555,7 @@ async def analyze(req: AnalyzeRequest) -> AnalyzeResponse:
             region=req.region,
             max_tokens=req.max_tokens,
             temperature=req.temperature,
+            caller="analyze",
         )
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"Bedrock analysis failed: {e}") from e
@@ -434,56 +583,64 @@ def _scrape_amazon_search_bs4(
     limit: int = 5,
 ) -> List[Dict[str, Optional[str]]]:
     """Amazon.in search scrape using requests + BeautifulSoup (no browser)."""
+    import requests
+
     query = f"{model} {ram} {storage} {color}"
     url = "https://www.amazon.in/s?k=" + query.replace(" ", "+")
-    items: List[Dict[str, Optional[str]]] = []
     try:
-        res = requests.get(url, headers=_AMAZON_HEADERS, timeout=30)
+        if fakes_helper.enabled("velocity"):
+            return fakes_helper.velocity_items("amazon", model, ram, storage, color, limit)
+        res = cassette_helper.http_get(requests.get, url, headers=_AMAZON_HEADERS, timeout=30)
         res.raise_for_status()
     except Exception as e:
         logger.warning("Amazon bs4 request failed: %s", e)
-        return items
-    soup = BeautifulSoup(res.text, "lxml")
-    results = soup.select("div[data-component-type='s-search-result']")
-    for r in results[:limit]:
-        def _text(el):
-            if el is None:
-                return None
-            t = el.get_text(strip=True)
-            return t if t else None
+        return []
+    return _parse_amazon_search_html(res.text, limit)
 
-        def _attr(el, name, default=None):
-            if el is None:
-                return default
-            return el.get(name, default)
 
+def _el_text(el: Any) -> Optional[str]:
+    if el is None:
+        return None
+    t = el.get_text(strip=True)
+    return t if t else None
+
+
+def _parse_amazon_search_html(html: str, limit: int = 5) -> List[Dict[str, Optional[str]]]:
+    """Amazon.in search results page -> velocity items (title, link, rating, reviews, bought). No network."""
+    from bs4 import BeautifulSoup
+
+    items: List[Dict[str, Optional[str]]] = []
+    soup = BeautifulSoup(html, "lxml")
+    results = soup.select("div[data-component-type='s-search-result']")
+    for r in results[:limit]:
         title_el_1 = r.select_one("h2 span")
         title_el_2 = r.select_one("a.a-link-normal h2 span")
         parts = []
         if title_el_1:
-            parts.append(_text(title_el_1))
-        if title_el_2 and _text(title_el_2):
-            parts.append(_text(title_el_2))
+            parts.append(_el_text(title_el_1))
+        if title_el_2 and _el_text(title_el_2):
+            parts.append(_el_text(title_el_2))
         title = " ".join(parts) if parts else None
         if not title:
             h2 = r.select_one("h2") or r.select_one("a.a-link-normal")
-            title = _text(h2) if h2 else None
+            title = _el_text(h2) if h2 else None
 
         link_el = r.select_one("a.a-link-normal[href*='/dp/'], a.a-link-normal[href*='/gp/product/']") or r.select_one("a.a-link-normal")
-        href = _attr(link_el, "href") if link_el else None
+        href = link_el.get("href") if link_el else None
         link = ("https://www.amazon.in" + href) if href and href.startswith("/") else href
 
         rating_el = r.select_one("span.a-icon-alt")
         reviews_el = r.select_one(".s-underline-text")
         bought_el = r.select_one("span.a-size-base.a-color-secondary")
-        rating = _text(rating_el)
-        reviews = _text(reviews_el)
-        bought = _text(bought_el)
+        rating = _el_text(rating_el)
+        reviews = _el_text(reviews_el)
+        bought = _el_text(bought_el)
 
         items.append({"title": title, "link": link, "rating": rating, "reviews": reviews, "bought": bought})
     return items
 
 
+@cassette_helper.recorded("playwright.amazon")
 def _scrape_amazon_search(
     model: str,
     ram: str,
@@ -497,12 +654,15 @@ def _scrape_amazon_search(
 
     items: List[Dict[str, Optional[str]]] = []
 
+    from playwright.sync_api import sync_playwright
+
     with sync_playwright() as p:
         browser = p.chromium.launch(channel="chrome", headless=True)
         page = browser.new_page()
 
-        page.goto(url)
-        page.wait_for_selector("div[data-component-type='s-search-result']")
+        with metrics_helper.PLAYWRIGHT_PAGE_LOAD_SECONDS.time(site="amazon"):
+            page.goto(url)
+            page.wait_for_selector("div[data-component-type='s-search-result']")
 
         results = page.query_selector_all("div[data-component-type='s-search-result']")
 
@@ -593,22 +753,36 @@ def _scrape_flipkart_search_bs4(
     limit: int = 10,
 ) -> List[Dict[str, Optional[str]]]:
     """Flipkart search scrape using requests + BeautifulSoup (no browser). Uses curl_cffi if available to avoid 403."""
+    import requests
+
+    try:
+        from curl_cffi import requests as curl_requests
+    except ImportError:
+        curl_requests = None
+
     query = f"{model} {ram} {storage} {color}"
     base_url = "https://www.flipkart.com/search?q="
     url = base_url + query.replace(" ", "%20")
-    items: List[Dict[str, Optional[str]]] = []
     try:
-        if _curl_requests is not None:
-            res = _curl_requests.get(url, headers=_FLIPKART_HEADERS, timeout=30, impersonate="chrome")
+        if curl_requests is not None:
+            res = cassette_helper.http_get(curl_requests.get, url, headers=_FLIPKART_HEADERS, timeout=30, impersonate="chrome")
         else:
-            res = requests.get(url, headers=_FLIPKART_HEADERS, timeout=30)
+            res = cassette_helper.http_get(requests.get, url, headers=_FLIPKART_HEADERS, timeout=30)
         if res.status_code != 200:
             logger.warning("Flipkart bs4 returned %s (e.g. 403 = bot block)", res.status_code)
-            return items
+            return []
     except Exception as e:
         logger.warning("Flipkart bs4 request failed: %s", e)
-        return items
-    soup = BeautifulSoup(res.text, "lxml")
+        return []
+    return _parse_flipkart_search_html(res.text, limit)
+
+
+def _parse_flipkart_search_html(html: str, limit: int = 10) -> List[Dict[str, Optional[str]]]:
+    """Flipkart search results page -> velocity items (title, link, price, rating). No network."""
+    from bs4 import BeautifulSoup
+
+    items: List[Dict[str, Optional[str]]] = []
+    soup = BeautifulSoup(html, "lxml")
     links = soup.select("a[href*='/p/']")
     seen_hrefs: set = set()
     for a in links:
@@ -646,6 +820,7 @@ def _scrape_flipkart_search_bs4(
     return items
 
 
+@cassette_helper.recorded("playwright.flipkart")
 def _scrape_flipkart_search(
     model: str,
     ram: str,
@@ -654,18 +829,23 @@ def _scrape_flipkart_search(
     limit: int = 10,
 ) -> List[Dict[str, Optional[str]]]:
     """Flipkart search scrape using Playwright (browser). Use when bs4 returns empty."""
+    if fakes_helper.enabled("velocity"):
+        return fakes_helper.velocity_items("flipkart", model, ram, storage, color, limit)
     query = f"{model} {ram} {storage} {color}"
     base_url = "https://www.flipkart.com/search?q="
     url = base_url + query.replace(" ", "%20")
 
     items: List[Dict[str, Optional[str]]] = []
 
+    from playwright.sync_api import sync_playwright
+
     with sync_playwright() as p:
         browser = p.chromium.launch(headless=True)
         page = browser.new_page()
 
-        page.goto(url, timeout=60000)
-        page.wait_for_load_state("networkidle")
+        with metrics_helper.PLAYWRIGHT_PAGE_LOAD_SECONDS.time(site="flipkart"):
+            page.goto(url, timeout=60000)
+            page.wait_for_load_state("networkidle")
 
         products = page.locator("a[href*='/p/']")
         count = min(products.count(), limit)
@@ -727,6 +907,7 @@ async def amazon_scrape(req: VelocityScrapeRequest) -> VelocityScrapeResponse:
     Uses requests + BeautifulSoup first; falls back to Playwright if bs4 returns no results.
     """
     loop = asyncio.get_running_loop()
+    start = time.perf_counter()
     items_raw = await loop.run_in_executor(
         None,
         _scrape_amazon_search_bs4,
@@ -736,6 +917,7 @@ async def amazon_scrape(req: VelocityScrapeRequest) -> VelocityScrapeResponse:
         req.color,
         req.limit,
     )
+    method = "bs4" if items_raw else "none"
     # If bs4 got nothing (e.g. page is JS-rendered or blocked), try Playwright
     if not items_raw:
         try:
@@ -748,8 +930,12 @@ async def amazon_scrape(req: VelocityScrapeRequest) -> VelocityScrapeResponse:
                 req.color,
                 req.limit,
             )
+            method = "playwright" if items_raw else "none"
         except Exception as e:
             logger.warning("Amazon Playwright fallback failed: %s", e)
+    metrics_helper.VELOCITY_SCRAPES.inc(site="amazon", method=method)
+    metrics_helper.SCRAPE_SECONDS.observe(time.perf_counter() - start, source="amazon", outcome="ok" if items_raw else "empty")
+    metrics_helper.SCRAPE_ITEMS.inc(len(items_raw), source="amazon")
 
     # Send scraped items + a filtering query to Bedrock so it can
     # return only the items that best match the requested config.
@@ -794,6 +980,7 @@ async def amazon_scrape(req: VelocityScrapeRequest) -> VelocityScrapeResponse:
         ),
         max_tokens=800,
         temperature=0.0,
+        caller="amazon_filter",
     )
 
     filtered_items: list[dict] = items_raw
@@ -801,9 +988,10 @@ async def amazon_scrape(req: VelocityScrapeRequest) -> VelocityScrapeResponse:
         parsed = json.loads(bedrock_text)
         if isinstance(parsed, list):
             filtered_items = [x for x in parsed if isinstance(x, dict)]
+        metrics_helper.LLM_JSON_PARSES.inc(caller="amazon_filter", outcome="ok")
     except Exception:
         # If Bedrock doesn't return valid JSON, fall back to unfiltered items.
-        pass
+        metrics_helper.LLM_JSON_PARSES.inc(caller="amazon_filter", outcome="error")
 
     # Extra safety: enforce that title contains the exact model string
     # and that we are not returning obvious accessories.
@@ -868,6 +1056,7 @@ async def flipkart_scrape(req: VelocityScrapeRequest) -> FlipkartScrapeResponse:
     loop = asyncio.get_running_loop()
     # Temporarily disable bs4 scraper so we always trigger the Playwright fallback
     items_raw: list[dict] = []
+    start = time.perf_counter()
     try:
         items_raw = await loop.run_in_executor(
             None,
@@ -880,6 +1069,9 @@ async def flipkart_scrape(req: VelocityScrapeRequest) -> FlipkartScrapeResponse:
         )
     except Exception as e:
         logger.warning("Flipkart Playwright fallback failed: %s", e)
+    metrics_helper.VELOCITY_SCRAPES.inc(site="flipkart", method="playwright" if items_raw else "none")
+    metrics_helper.SCRAPE_SECONDS.observe(time.perf_counter() - start, source="flipkart", outcome="ok" if items_raw else "empty")
+    metrics_helper.SCRAPE_ITEMS.inc(len(items_raw), source="flipkart")
 
     filter_query = (
         "Filter the following Flipkart search results for devices.\n"
@@ -911,6 +1103,7 @@ async def flipkart_scrape(req: VelocityScrapeRequest) -> FlipkartScrapeResponse:
         ),
         max_tokens=800,
         temperature=0.0,
+        caller="flipkart_filter",
     )
 
     filtered_items: list[dict] = items_raw
@@ -918,9 +1111,10 @@ async def flipkart_scrape(req: VelocityScrapeRequest) -> FlipkartScrapeResponse:
         parsed = json.loads(bedrock_text)
         if isinstance(parsed, list):
             filtered_items = [x for x in parsed if isinstance(x, dict)]
+        metrics_helper.LLM_JSON_PARSES.inc(caller="flipkart_filter", outcome="ok")
     except Exception:
         # If Bedrock doesn't return valid JSON, fall back to unfiltered items.
-        pass
+        metrics_helper.LLM_JSON_PARSES.inc(caller="flipkart_filter", outcome="error")
 
     # Extra safety: enforce that title contains the exact model string.
     model_norm = (req.model or "").lower()
@@ -980,7 +1174,8 @@ async def _fetch_velocity_signals_for_device(
     )
 
     try:
-        amazon_resp = await amazon_scrape(req)
+        with tracing_helper.span("velocity.amazon"):
+            amazon_resp = await amazon_scrape(req)
         for item in amazon_resp.results or []:
             if isinstance(item.bought, str) and item.bought.strip():
                 amazon_bought_tags.append(item.bought.strip())
@@ -989,7 +1184,8 @@ async def _fetch_velocity_signals_for_device(
         logger.exception("Velocity: amazon-scrape failed for model=%s: %s", model, e)
 
     try:
-        flipkart_resp = await flipkart_scrape(req)
+        with tracing_helper.span("velocity.flipkart"):
+            flipkart_resp = await flipkart_scrape(req)
         for item in flipkart_resp.results or []:
             if isinstance(item.rating, str) and item.rating.strip():
                 flipkart_rating_tags.append(item.rating.strip())
@@ -1069,6 +1265,12 @@ class AnalyzeDevicesResponseItem(BaseModel):
     flipkart_rating_tags: list[str] = []
     amazon_velocity_items: list[VelocityScrapeItem] = []
     flipkart_velocity_items: list[FlipkartScrapeItem] = []
+    # Review-based correction looked up for this device (see kb_corrections_helper); base_price is set when applied.
+    kb_correction: Optional[dict] = None
+    # Set when the price came from approved KB history instead of scrape + Bedrock (see kb_index_helper).
+    instant_estimate: Optional[dict] = None
+    # Bedrock tokens / cost / latency spent pricing this device (llm_usage_helper.summarize); null when reused.
+    llm_usage: Optional[dict] = None
 
 class AnalyzeDevicesRequest(BaseModel):
     devices: list[AnalyzeDevicesRequestItem] = Field(
@@ -1077,9 +1279,33 @@ class AnalyzeDevicesRequest(BaseModel):
         max_length=ANALYZE_DEVICES_MAX_ITEMS,
         description="List of devices to analyze (1–50 items)",
     )
+    instant_when_confident: bool = Field(
+        False,
+        description="Price devices from approved KB history, skipping scrape + Bedrock, when the estimate is high-confidence.",
+    )
+
+class AnalyzeDevicesStartRequest(AnalyzeDevicesRequest):
+    # When run_id or run_name is set, the job writes its results into that run as devices finish.
+    run_id: Optional[str] = Field(None, min_length=1, max_length=36)
+    run_name: Optional[str] = Field(None, max_length=200)
+    run_devices: Optional[list[dict]] = Field(
+        None, description="Device list to store on the run (client DeviceInput shape); derived from devices if omitted."
+    )
 
 class AnalyzeDevicesResponse(BaseModel):
     results: list[AnalyzeDevicesResponseItem]
+    dedup: Optional[dict[str, Any]] = None  # rows vs unique configs priced (see dedup_helper.dedup_report)
+    llm_usage: Optional[dict[str, Any]] = None  # Bedrock totals for the request, also by model / caller / device
+
+
+def _device_search_query(d: AnalyzeDevicesRequestItem) -> str:
+    """Browser scrape query for a device (brand + model; kept broad to get more samples)."""
+    return " ".join(x for x in [d.brand, d.model] if x)
+
+
+def _device_dedup_key(d: AnalyzeDevicesRequestItem) -> tuple[str, ...]:
+    """Pricing config key plus color (color only feeds the velocity lookups)."""
+    return (*dedup_helper.config_key(d.model_dump()), (d.color or "").strip().lower())
 
 
 @app.post("/bedrock-test", response_model=BedrockTestResponse)
@@ -1104,6 +1330,7 @@ def bedrock_test(req: AnalyzeRequest) -> BedrockTestResponse:
             region=req.region,
             max_tokens=min(req.max_tokens, 128),
             temperature=req.temperature,
+            caller="bedrock_test",
         )
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"Bedrock test failed: {e}") from e
@@ -1145,7 +1372,14 @@ async def _run_bedrock_analysis(
     )
 
     try:
-        scraped_devices, source_urls = await _scrape_with_browser(search_query)
+        scraped_devices = await _recent_listings_as_devices(search_query)
+        if LISTINGS_REUSE_MAX_AGE_HOURS > 0:
+            metrics_helper.CACHE_REQUESTS.inc(cache="listings_reuse", result="hit" if scraped_devices else "miss")
+        if scraped_devices:
+            source_urls = _source_urls_for_query(search_query)
+            logger.info("Row %d: reusing %d recent listings for '%s'", idx, len(scraped_devices), search_query)
+        else:
+            scraped_devices, source_urls = await _scrape_with_browser(search_query)
         ovantica_count = sum(1 for d in scraped_devices if d.get("source") == "ovantica")
         refit_count = sum(1 for d in scraped_devices if d.get("source") == "refitglobal")
         cashify_count = sum(1 for d in scraped_devices if d.get("source") == "cashify")
@@ -1187,14 +1421,23 @@ async def _run_bedrock_analysis(
     try:
         # Pass full listing dicts to Bedrock (include all keys: name, price, source, storage, etc.)
         logger.info("Row %d: sending %d scraped devices to Bedrock", idx, len(scraped_devices))
-        analysis_text = analyze_with_bedrock(
-            devices=[{**d, "source": d.get("source", "unknown")} for d in scraped_devices],
-            query=query_string,
-            instructions=instructions,
-            model_id=None,
-            region=None,
-            max_tokens=800,
-            temperature=0.1,
+        # Bedrock is a blocking boto3 call; run it off the event loop so concurrent rows overlap.
+        loop = asyncio.get_running_loop()
+        # Copy the context so the call's token usage is attributed to this request / job / device.
+        analysis_text = await loop.run_in_executor(
+            None,
+            contextvars.copy_context().run,
+            functools.partial(
+                analyze_with_bedrock,
+                devices=[{**d, "source": d.get("source", "unknown")} for d in scraped_devices],
+                query=query_string,
+                instructions=instructions,
+                model_id=None,
+                region=None,
+                max_tokens=800,
+                temperature=0.1,
+                caller="pricing",
+            ),
         )
         predicted_price: Optional[str] = ""
         explanation: Optional[str] = ""
@@ -1213,12 +1456,14 @@ async def _run_bedrock_analysis(
             value = parsed.get("recommended_price")
             explanation = parsed.get("explanation", "")
             risk_flags = parsed.get("risk_flags", [])
+            metrics_helper.LLM_JSON_PARSES.inc(caller="pricing", outcome="ok")
             if value is not None:
                 predicted_price = str(value)
                 logger.info("Row %d: predicted_price=%s", idx, predicted_price)
             else:
                 logger.warning("Row %d: analysis JSON missing 'recommended_price': %s", idx, analysis_text)
         except Exception as parse_err:
+            metrics_helper.LLM_JSON_PARSES.inc(caller="pricing", outcome="error")
             logger.warning(
                 "Row %d: could not parse analysis as JSON (%s); raw text: %s",
                 idx,
@@ -1271,6 +1516,7 @@ def _run_bedrock_only(
             region=None,
             max_tokens=800,
             temperature=0.1,
+            caller="pricing_job",
         )
         predicted_price: Optional[str] = ""
         explanation: Optional[str] = ""
@@ -1288,10 +1534,11 @@ def _run_bedrock_only(
             value = parsed.get("recommended_price")
             explanation = parsed.get("explanation", "")
             risk_flags = parsed.get("risk_flags", [])
+            metrics_helper.LLM_JSON_PARSES.inc(caller="pricing_job", outcome="ok")
             if value is not None:
                 predicted_price = str(value)
         except Exception:
-            pass
+            metrics_helper.LLM_JSON_PARSES.inc(caller="pricing_job", outcome="error")
         primary_url = source_urls[0]["url"] if source_urls else ""
         return predicted_price or "", explanation or "", risk_flags, primary_url, source_urls, sources_with_data
     except Exception as e:
@@ -1300,8 +1547,152 @@ def _run_bedrock_only(
         return "", "", [], primary_url, source_urls, []
 
 
+_SOURCE_SEARCH_LABELS = {"refitglobal": "ReFit Global (Search)", "cashify": "Cashify (Search)"}
+
+
+def _run_device_from_item(d: AnalyzeDevicesRequestItem) -> dict[str, Any]:
+    """Request item -> the DeviceInput shape stored in runs.devices."""
+    return {
+        "id": d.id,
+        "model": d.model,
+        "storage": d.storage_gb,
+        "ram": d.ram_gb,
+        "color": d.color,
+        "condition": d.condition_tier,
+    }
+
+
+def _run_result_from_item(r: dict[str, Any]) -> dict[str, Any]:
+    """AnalyzeDevicesResponseItem dict -> the PricingResult shape stored in runs.results (mirrors the client mapping)."""
+    try:
+        rec = int(float(r.get("predicted_price") or 0))
+    except ValueError:
+        rec = 0
+    scraped_at = datetime.now(timezone.utc).isoformat()
+    urls = r.get("source_urls") or (
+        [{"source": "ovantica", "url": r["source_url"]}] if r.get("source_url") else []
+    )
+    return {
+        "deviceId": r["id"],
+        "recommendedPrice": rec,
+        # Math.round semantics (half up), as in the client's mapping.
+        "priceLow": math.floor(rec * 0.92 / 100 + 0.5) * 100,
+        "priceHigh": math.floor(rec * 1.08 / 100 + 0.5) * 100,
+        "dataFoundIn": r.get("data_found_in") or [],
+        "pricingExplanation": r.get("explanation") or "No explanation provided.",
+        "riskFlags": r.get("risk_flags") or [],
+        "marketSignals": [
+            {
+                "source": _SOURCE_SEARCH_LABELS.get(u.get("source"), "Ovantica (Search)"),
+                "price": rec,
+                "condition": "Scraped Search Query",
+                "url": u.get("url"),
+                "scrapedAt": scraped_at,
+            }
+            for u in urls
+        ],
+        "sourceUrl": r.get("source_url"),
+        "amazonVelocityItems": r.get("amazon_velocity_items") or [],
+        "flipkartVelocityItems": r.get("flipkart_velocity_items") or [],
+        "kbCorrection": r.get("kb_correction"),
+        "instantEstimate": r.get("instant_estimate"),
+        "llmUsage": r.get("llm_usage"),
+    }
+
+
+def _create_job_run(db: Session, run_id: str, name: str, devices: list[dict]) -> bool:
+    """Insert the run a job will fill in. Returns False if the id is already taken."""
+    table = RunModel.__table__
+    stmt = (
+        pg_insert(table)
+        .values(id=run_id, name=name, status="processing", devices=devices, results=[], scrape_results={},
+                feedback_submitted=False)
+        .on_conflict_do_nothing(index_elements=["id"])
+        .returning(table.c.id)
+    )
+    created = db.execute(stmt).first() is not None
+    db.commit()
+    return created
+
+
+def _set_job_run_scrape_results(db: Session, run_id: str, scrape_results: dict[str, list]) -> None:
+    db.execute(
+        text("UPDATE runs SET scrape_results = CAST(:s AS JSONB), version = version + 1 WHERE id = :id"),
+        {"id": run_id, "s": json.dumps(scrape_results)},
+    )
+    db.commit()
+
+
+def _append_job_run_results(db: Session, run_id: str, results: list[dict]) -> None:
+    db.execute(
+        text(
+            "UPDATE runs SET results = " + _RUN_RESULTS_ARRAY + " || CAST(:r AS JSONB), version = version + 1 "
+            "WHERE id = :id"
+        ),
+        {"id": run_id, "r": json.dumps(results)},
+    )
+    db.commit()
+
+
+# Run-level Bedrock usage is broken down by device as well (results carry their own per-device totals).
+_RUN_LLM_USAGE_GROUPS = ("model", "caller", "device_id")
+
+
+def _finish_job_run(db: Session, run_id: str, status: str, llm_usage: Optional[dict] = None) -> None:
+    db.execute(
+        text(
+            "UPDATE runs SET status = :status, completed_at = now(), llm_usage = CAST(:u AS JSONB), "
+            "version = version + 1 WHERE id = :id"
+        ),
+        {"id": run_id, "status": status, "u": json.dumps(llm_usage) if llm_usage else None},
+    )
+    db.commit()
+
+
+async def _persist_job_run(job: dict[str, Any], fn: Callable[..., None], *args: Any) -> None:
+    """Write job progress to its run, if it has one. A failed write is logged and stops further writes;
+    the status endpoint then falls back to returning results inline."""
+    run_id = job.get("run_id")
+    if not run_id or job.get("run_error"):
+        return
+    try:
+        with tracing_helper.span("db.write", op=fn.__name__.lstrip("_")):
+            await _run_db(fn, run_id, *args)
+    except Exception as e:
+        logger.exception("Could not persist analyze-devices results to run %s: %s", run_id, e)
+        job["run_error"] = str(e)
+    else:
+        _invalidate_run_reads(run_id)
+
+
 async def _run_analyze_devices_job(job_id: str, devices: list[AnalyzeDevicesRequestItem]) -> None:
-    """Background task: scrape per device (each has 3 sessions), merge results, then Bedrock per device; store results."""
+    """Background task: scrape, price and (when the job has a run) persist; marks the run errored on failure."""
+    job = _analyze_devices_jobs.get(job_id) or {}
+    trace: Optional[tracing_helper.Trace] = job.get("trace")
+    llm_calls: list[dict[str, Any]] = job.get("llm_calls", [])
+    error: Optional[str] = None
+    with tracing_helper.activate(trace), llm_usage_helper.scope(llm_calls, job_id=job_id, run_id=job.get("run_id")):
+        try:
+            await _analyze_devices_job_steps(job_id, devices)
+        except BaseException as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            job = _analyze_devices_jobs.get(job_id)
+            if job and job.get("status") != "finished":
+                job["llm_usage"] = llm_usage_helper.summarize(llm_calls, group_by=_RUN_LLM_USAGE_GROUPS)
+                await _persist_job_run(job, _finish_job_run, "error", job["llm_usage"])
+            if trace is not None:
+                trace.end(error or (job.get("error") if job else None))
+                if tracing_helper.TRACE_EXPORT_PATH:
+                    try:
+                        await asyncio.get_running_loop().run_in_executor(None, tracing_helper.export, trace)
+                    except Exception as e:
+                        logger.warning("Could not export trace for job %s: %s", job_id, e)
+
+
+async def _analyze_devices_job_steps(job_id: str, devices: list[AnalyzeDevicesRequestItem]) -> None:
+    """Scrape per device (each has 3 sessions), merge results, then Bedrock per device; store results."""
     job = _analyze_devices_jobs.get(job_id)
     if not job or job.get("status") != "running":
         return
@@ -1318,23 +1709,33 @@ async def _run_analyze_devices_job(job_id: str, devices: list[AnalyzeDevicesRequ
     # Run scrape for all devices in parallel so each device's sessions get used immediately (iframes stay live).
     merged_results: dict[str, list[BrowserScrapeDevice]] = {src: [] for src in _BROWSER_SOURCES}
 
+    # Devices with a high-confidence KB estimate (instant_when_confident) are neither scraped nor re-priced.
+    instant: dict[int, AnalyzeDevicesResponseItem] = job.get("instant") or {}
+    # Devices sharing a search query (brand + model) share sessions; scrape each query once.
+    first_device_by_query: dict[str, int] = {}
+    for dev_idx, d in enumerate(devices):
+        if dev_idx not in instant:
+            first_device_by_query.setdefault(_device_search_query(d), dev_idx)
+
     async def scrape_one_device(dev_idx: int, d: AnalyzeDevicesRequestItem) -> dict[str, list[BrowserScrapeDevice]]:
         session_ids = session_ids_by_device[dev_idx]
         if len(session_ids) != NUM_BROWSER_SESSIONS:
             raise ValueError(f"Device {dev_idx + 1}: expected {NUM_BROWSER_SESSIONS} session ids")
-        query = " ".join(x for x in [d.brand, d.model] if x)
-        prompts = _browser_prompts_for_query(query)
-        return await _run_browser_scrape_tasks(client, prompts, session_ids)
+        prompts = _browser_prompts_for_query(_device_search_query(d))
+        with tracing_helper.span("scrape.device", device=dev_idx + 1, query=_device_search_query(d)):
+            return await _run_browser_scrape_tasks(client, prompts, session_ids)
 
     try:
-        device_tasks = [scrape_one_device(dev_idx, d) for dev_idx, d in enumerate(devices)]
+        scrape_device_idxs = list(first_device_by_query.values())
+        device_tasks = [scrape_one_device(dev_idx, devices[dev_idx]) for dev_idx in scrape_device_idxs]
         device_results_list = await asyncio.gather(*device_tasks, return_exceptions=True)
-        for dev_idx, result in enumerate(device_results_list):
+        for dev_idx, result in zip(scrape_device_idxs, device_results_list):
             if isinstance(result, Exception):
                 logger.exception("Analyze-devices job %s device %d scrape failed: %s", job_id, dev_idx + 1, result)
                 job["status"] = "error"
                 job["error"] = f"Device {dev_idx + 1} scrape failed: {result}"
                 return
+            await _record_listings(result, _device_search_query(devices[dev_idx]), run_id=job.get("run_id"))
             for src in _BROWSER_SOURCES:
                 merged_results[src].extend(result.get(src) or [])
     except Exception as e:
@@ -1349,6 +1750,7 @@ async def _run_analyze_devices_job(job_id: str, devices: list[AnalyzeDevicesRequ
         scrape_results[src] = [x.model_dump() if hasattr(x, "model_dump") else (x if isinstance(x, dict) else {}) for x in items]
 
     job["scrape_results"] = scrape_results
+    await _persist_job_run(job, _set_job_run_scrape_results, scrape_results)
 
     # Full scraped table for Bedrock: each row has Storage, Model, Ram, Color, Condition, Price, source
     scraped_for_bedrock = []
@@ -1360,61 +1762,273 @@ async def _run_analyze_devices_job(job_id: str, devices: list[AnalyzeDevicesRequ
                 row["source"] = src
             scraped_for_bedrock.append(row)
 
+    # Devices with the same config (incl. color for velocity) are priced once and fanned out.
+    priced: dict[tuple[str, ...], AnalyzeDevicesResponseItem] = {}
     results = []
     for idx, d in enumerate(devices, start=1):
-        # Fetch velocity signals (Amazon 'bought' tags and Flipkart ratings) and full items for UI.
-        amazon_bought_tags, flipkart_rating_tags, amazon_items, flipkart_items = await _fetch_velocity_signals_for_device(
-            model=d.model,
-            ram=d.ram_gb,
-            storage=d.storage_gb,
-            color=d.color,
-            limit=5,
-        )
+        key = _device_dedup_key(d)
+        reused = "instant" if idx - 1 in instant else "dedup" if key in priced else None
+        device_calls: list[dict[str, Any]] = []
+        with (
+            tracing_helper.span("price.device", device=idx, model=d.model, **({"reused": reused} if reused else {})),
+            llm_usage_helper.scope(device_calls, device_id=d.id),
+        ):
+            if idx - 1 in instant or key in priced:
+                results.append(
+                    instant[idx - 1] if idx - 1 in instant else priced[key].model_copy(update={"id": d.id, "llm_usage": None})
+                )
+                await _persist_job_run(job, _append_job_run_results, [_run_result_from_item(results[-1].model_dump())])
+                continue
+            # Fetch velocity signals (Amazon 'bought' tags and Flipkart ratings) and full items for UI.
+            with tracing_helper.span("velocity"):
+                amazon_bought_tags, flipkart_rating_tags, amazon_items, flipkart_items = await _fetch_velocity_signals_for_device(
+                    model=d.model,
+                    ram=d.ram_gb,
+                    storage=d.storage_gb,
+                    color=d.color,
+                    limit=5,
+                )
+
+            velocity_lines: list[str] = []
+            if amazon_bought_tags:
+                velocity_lines.append(
+                    "Amazon velocity (bought in past month tags): "
+                    + " | ".join(amazon_bought_tags[:5])
+                )
+            if flipkart_rating_tags:
+                velocity_lines.append(
+                    "Flipkart rating signals: " + " | ".join(flipkart_rating_tags[:5])
+                )
+
+            velocity_section = ""
+            if velocity_lines:
+                velocity_section = "\nVelocity signals:\n" + "\n".join(f"- {line}" for line in velocity_lines) + "\n"
 
-        velocity_lines: list[str] = []
-        if amazon_bought_tags:
-            velocity_lines.append(
-                "Amazon velocity (bought in past month tags): "
-                + " | ".join(amazon_bought_tags[:5])
+            query_string = (
+                f"Device Input:\nBrand: {d.brand}\nModel: {d.model}\nStorage: {d.storage_gb}GB\n"
+                f"RAM: {d.ram_gb}GB\nNetwork: {d.network_type}\nCondition: {d.condition_tier}\nWarranty: {d.warranty_months} months\n"
+                f"{velocity_section}"
             )
-        if flipkart_rating_tags:
-            velocity_lines.append(
-                "Flipkart rating signals: " + " | ".join(flipkart_rating_tags[:5])
+            encoded = urllib.parse.quote_plus(" ".join(x for x in [d.brand, d.model] if x))
+            device_source_urls = [
+                {"source": "ovantica", "url": f"https://ovantica.com/catalogsearch/result?q={urllib.parse.quote(d.model)}"},
+                {"source": "refitglobal", "url": f"https://refitglobal.com/search?q={encoded}"},
+                {"source": "cashify", "url": f"https://www.cashify.in/buy-refurbished-gadgets/all-gadgets/search?q={encoded}"},
+            ]
+            with tracing_helper.span("bedrock", listings=len(scraped_for_bedrock)):
+                price, explanation, flags, source_url, surl_list, data_found_in = _run_bedrock_only(
+                    idx, query_string, scraped_for_bedrock, device_source_urls
+                )
+            with tracing_helper.span("kb.correction"):
+                price, correction = await _apply_kb_correction(d.brand, d.model, d.condition_tier, price)
+            item = AnalyzeDevicesResponseItem(
+                id=d.id,
+                predicted_price=price,
+                explanation=(explanation or "") + _kb_correction_note(correction),
+                kb_correction=correction,
+                risk_flags=flags or [],
+                data_found_in=data_found_in or [],
+                source_url=source_url or "",
+                source_urls=[SourceUrl(**u) for u in surl_list] if surl_list else [],
+                amazon_bought_tags=amazon_bought_tags,
+                flipkart_rating_tags=flipkart_rating_tags,
+                amazon_velocity_items=amazon_items,
+                flipkart_velocity_items=flipkart_items,
+                llm_usage=llm_usage_helper.summarize(device_calls),
             )
+            priced[key] = item
+            results.append(item)
+            await _persist_job_run(job, _append_job_run_results, [_run_result_from_item(item.model_dump())])
+    job["dedup"] = {**dedup_helper.dedup_report(len(devices) - len(instant), len(priced)), "instant": len(instant)}
+    job["results"] = [r.model_dump() for r in results]
+    job["llm_usage"] = llm_usage_helper.summarize(job.get("llm_calls") or [], group_by=_RUN_LLM_USAGE_GROUPS)
+    await _persist_job_run(job, _finish_job_run, "completed", job["llm_usage"])
+    job["status"] = "finished"
+
+
+KB_CORRECTIONS_ENABLED = os.getenv("KB_CORRECTIONS_ENABLED", "1") == "1"
+
+
+async def _apply_kb_correction(
+    brand: str, model: str, condition_tier: str, price: Optional[str]
+) -> tuple[str, Optional[dict]]:
+    """
+    Shift a predicted price by the reviewers' average correction for this brand / model / condition
+    (a primary-key lookup). Returns (price, correction); correction is None when there are no reviews.
+    """
+    if not KB_CORRECTIONS_ENABLED:
+        return price or "", None
+    try:
+        correction = await _run_db(kb_corrections_helper.lookup, brand, model, condition_tier)
+    except Exception as e:
+        logger.warning("KB correction lookup failed for %s %s: %s", brand, model, e)
+        return price or "", None
+    if not correction or not correction["adjustment"] or not price:
+        return price or "", correction
+    try:
+        base = int(float(price))
+    except ValueError:
+        return price, correction
+    return str(base + correction["adjustment"]), {**correction, "base_price": base}
+
+
+def _kb_correction_note(correction: Optional[dict]) -> str:
+    if not correction or "base_price" not in correction:
+        return ""
+    adj = correction["adjustment"]
+    return (
+        f" Adjusted by {'+' if adj > 0 else '-'}₹{abs(adj):,} from ₹{correction['base_price']:,} "
+        f"based on {correction['samples']} reviewed price(s) for this model and condition."
+    )
 
-        velocity_section = ""
-        if velocity_lines:
-            velocity_section = "\nVelocity signals:\n" + "\n".join(f"- {line}" for line in velocity_lines) + "\n"
 
-        query_string = (
-            f"Device Input:\nBrand: {d.brand}\nModel: {d.model}\nStorage: {d.storage_gb}GB\n"
-            f"RAM: {d.ram_gb}GB\nNetwork: {d.network_type}\nCondition: {d.condition_tier}\nWarranty: {d.warranty_months} months\n"
-            f"{velocity_section}"
+async def _kb_estimate(brand: str, model: str, ram: str, storage: str, condition_tier: str, k: int = 5) -> dict[str, Any]:
+    """kNN estimate from approved KB prices; pulls rows written by other workers first when the index is stale."""
+    try:
+        await _run_db(kb_index_helper.index.refresh)
+    except Exception as e:
+        logger.warning("KB neighbour index refresh failed: %s", e)
+    return kb_index_helper.index.estimate(brand, model, ram, storage, condition_tier, k)
+
+
+async def _instant_estimate_items(devices: list[AnalyzeDevicesRequestItem]) -> dict[int, AnalyzeDevicesResponseItem]:
+    """Items for devices (by 0-based index) with a high-confidence KB estimate; the others need the full pipeline."""
+    items: dict[int, AnalyzeDevicesResponseItem] = {}
+    for i, d in enumerate(devices):
+        est = await _kb_estimate(d.brand, d.model, d.ram_gb, d.storage_gb, d.condition_tier)
+        metrics_helper.CACHE_REQUESTS.inc(cache="kb_instant", result="hit" if est["confidence"] == "high" else "miss")
+        if est["confidence"] != "high":
+            continue
+        matches = [n for n in est["neighbors"] if n["distance"] <= kb_index_helper.MATCH_DISTANCE]
+        items[i] = AnalyzeDevicesResponseItem(
+            id=d.id,
+            predicted_price=str(est["estimate"]),
+            explanation=(
+                f"Instant estimate: median of {len(matches)} human-approved price(s) for the same model, "
+                "configuration and condition. Market scrape and model analysis were skipped."
+            ),
+            risk_flags=[],
+            data_found_in=["Knowledge base"],
+            source_url="",
+            instant_estimate=est,
         )
-        encoded = urllib.parse.quote_plus(" ".join(x for x in [d.brand, d.model] if x))
-        device_source_urls = [
-            {"source": "ovantica", "url": f"https://ovantica.com/catalogsearch/result?q={urllib.parse.quote(d.model)}"},
-            {"source": "refitglobal", "url": f"https://refitglobal.com/search?q={encoded}"},
-            {"source": "cashify", "url": f"https://www.cashify.in/buy-refurbished-gadgets/all-gadgets/search?q={encoded}"},
-        ]
-        price, explanation, flags, source_url, surl_list, data_found_in = _run_bedrock_only(
-            idx, query_string, scraped_for_bedrock, device_source_urls
+    return items
+
+
+ANALYZE_CSV_OUTPUT_COLUMNS = ("predicted_price", "kb_adjustment", "data_found_in", "source_url", "source_urls")
+# Rows priced in parallel per /analyze-csv request (each row = 3 browser sessions + 1 Bedrock call).
+ANALYZE_CSV_CONCURRENCY = int(os.getenv("ANALYZE_CSV_CONCURRENCY", "4"))
+ANALYZE_CSV_MAX_CONCURRENCY = 16
+# Finished rows held back while waiting for an earlier, slower row (ordered output only).
+ANALYZE_CSV_REORDER_BUFFER = 64
+
+
+async def _process_bounded(
+    items: Iterable[Any],
+    worker: Callable[[int, Any], Awaitable[Any]],
+    concurrency: int,
+    ordered: bool = True,
+    max_buffered: int = ANALYZE_CSV_REORDER_BUFFER,
+) -> AsyncIterator[tuple[int, Any]]:
+    """
+    Run `worker(idx, item)` over `items` with at most `concurrency` calls in flight.
+    Items are pulled lazily from the iterable, so large inputs are never fully materialized.
+
+    Yields (idx, result) either in input order (ordered=True, using a bounded reorder buffer)
+    or as soon as each call completes (ordered=False). Pending work is cancelled if the
+    consumer stops iterating (e.g. client disconnect).
+    """
+    source = enumerate(items, start=1)
+    exhausted = False
+    pending: dict[asyncio.Task, int] = {}
+    finished: dict[int, Any] = {}
+    next_idx = 1
+
+    def _fill() -> None:
+        nonlocal exhausted
+        while not exhausted and len(pending) < concurrency and len(finished) < max_buffered:
+            try:
+                idx, item = next(source)
+            except StopIteration:
+                exhausted = True
+                return
+            pending[asyncio.create_task(worker(idx, item))] = idx
+
+    try:
+        _fill()
+        while pending:
+            done, _ = await asyncio.wait(pending.keys(), return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                finished[pending.pop(task)] = task.result()
+            if ordered:
+                while next_idx in finished:
+                    yield next_idx, finished.pop(next_idx)
+                    next_idx += 1
+            else:
+                for idx in sorted(finished):
+                    yield idx, finished.pop(idx)
+            _fill()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def _price_csv_row(idx: int, row: dict[str, Any]) -> dict[str, Any]:
+    """Price one CSV row; returns only the output columns."""
+    try:
+        predicted_price, explanation, risk_flags, source_url, source_urls, data_found_in = await _run_bedrock_analysis(
+            idx,
+            (row.get("brand") or "").strip(),
+            (row.get("model") or "").strip(),
+            (row.get("storage_gb") or "").strip(),
+            (row.get("ram_gb") or "").strip(),
+            (row.get("network_type") or "").strip(),
+            (row.get("condition_tier") or "").strip(),
+            (row.get("warranty_months") or "").strip(),
         )
-        results.append(AnalyzeDevicesResponseItem(
-            id=d.id,
-            predicted_price=price or "",
-            explanation=explanation or "",
-            risk_flags=flags or [],
-            data_found_in=data_found_in or [],
-            source_url=source_url or "",
-            source_urls=[SourceUrl(**u) for u in surl_list] if surl_list else [],
-            amazon_bought_tags=amazon_bought_tags,
-            flipkart_rating_tags=flipkart_rating_tags,
-            amazon_velocity_items=amazon_items,
-            flipkart_velocity_items=flipkart_items,
-        ))
-    job["results"] = [r.model_dump() for r in results]
-    job["status"] = "finished"
+    except Exception as e:
+        logger.exception("Row %d: analysis failed: %s", idx, e)
+        predicted_price, source_url, source_urls, data_found_in = "", "", [], []
+    predicted_price, correction = await _apply_kb_correction(
+        row.get("brand") or "", row.get("model") or "", row.get("condition_tier") or "", predicted_price
+    )
+
+    return {
+        "predicted_price": predicted_price,
+        "kb_adjustment": correction["adjustment"] if correction and "base_price" in correction else "",
+        "data_found_in": ", ".join(data_found_in) if data_found_in else "—",
+        "source_url": source_url,
+        "source_urls": json.dumps(source_urls) if source_urls else "[]",
+    }
+
+
+async def _analyze_csv_row(
+    idx: int,
+    row: dict[str, Any],
+    flight: Optional[dedup_helper.SingleFlight] = None,
+) -> dict[str, Any]:
+    """
+    Price one CSV row and fill in the output columns. With a `flight`, rows sharing a
+    normalized config (brand/model/storage/RAM/network/condition/warranty) are priced once
+    and the result is fanned out to every duplicate.
+    """
+    if flight is None:
+        outputs = await _price_csv_row(idx, row)
+    else:
+        outputs = await flight.run(dedup_helper.config_key(row), lambda: _price_csv_row(idx, row))
+    row.update(outputs)
+    return row
+
+
+def _csv_line(writer_buf: io.StringIO, writer: Any, row: Optional[dict] = None) -> str:
+    """Render a single CSV line (header when row is None) through a reusable buffer."""
+    writer_buf.seek(0)
+    writer_buf.truncate(0)
+    if row is None:
+        writer.writeheader()
+    else:
+        writer.writerow(row)
+    return writer_buf.getvalue()
 
 
 @app.post(
@@ -1422,83 +2036,302 @@ async def _run_analyze_devices_job(job_id: str, devices: list[AnalyzeDevicesRequ
     response_class=StreamingResponse,
     summary="Upload CSV and get back CSV with predicted_price column",
 )
-async def analyze_csv(file: UploadFile = File(...)) -> StreamingResponse:
+async def analyze_csv(
+    file: UploadFile = File(...),
+    concurrency: int = Query(
+        ANALYZE_CSV_CONCURRENCY,
+        ge=1,
+        le=ANALYZE_CSV_MAX_CONCURRENCY,
+        description="Max rows priced in parallel.",
+    ),
+    ordered: bool = Query(
+        True,
+        description="Emit rows in input order (true) or as soon as each row is priced (false).",
+    ),
+) -> StreamingResponse:
     """
     Accepts a CSV with at least these columns:
     - brand, model, storage_gb, ram_gb, network_type, condition_tier, warranty_months
 
     For each row:
-    - Scrapes external prices using `<brand> <model> <storage_gb>GB` as query
+    - Scrapes external prices using `<brand> <model>` as query
     - Calls Bedrock with a structured prompt to get a recommended price
     - Appends a `predicted_price` column
 
-    Returns a CSV (text/csv) with the original columns plus `predicted_price`.
+    Rows are read incrementally from the upload, priced with up to `concurrency` rows in flight,
+    and streamed back as CSV (text/csv) with the original columns plus `predicted_price`
+    as soon as they are ready.
     """
     try:
-        content = await file.read()
-        text = content.decode("utf-8")
+        text_stream = io.TextIOWrapper(file.file, encoding="utf-8", newline="")
+        reader = csv.DictReader(text_stream)
+        fieldnames = list(reader.fieldnames or [])
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Could not read CSV file: {e}") from e
 
-    logger.info("Received CSV file '%s' (%d bytes)", file.filename, len(text.encode("utf-8")))
-
-    input_buf = io.StringIO(text)
-    reader = csv.DictReader(input_buf)
-
-    fieldnames = reader.fieldnames or []
     if not fieldnames:
         raise HTTPException(status_code=400, detail="CSV has no header row.")
 
+    logger.info(
+        "Received CSV file '%s' (concurrency=%d, ordered=%s)", file.filename, concurrency, ordered
+    )
+
     # Ensure output columns exist.
-    if "predicted_price" not in fieldnames:
-        fieldnames.append("predicted_price")
-    if "data_found_in" not in fieldnames:
-        fieldnames.append("data_found_in")
-    if "source_url" not in fieldnames:
-        fieldnames.append("source_url")
-    if "source_urls" not in fieldnames:
-        fieldnames.append("source_urls")
-
-    output_buf = io.StringIO()
-    writer = csv.DictWriter(output_buf, fieldnames=fieldnames)
-    writer.writeheader()
-
-    for idx, row in enumerate(reader, start=1):
-        brand = (row.get("brand") or "").strip()
-        model = (row.get("model") or "").strip()
-        storage_gb = (row.get("storage_gb") or "").strip()
-        ram_gb = (row.get("ram_gb") or "").strip()
-        network_type = (row.get("network_type") or "").strip()
-        condition_tier = (row.get("condition_tier") or "").strip()
-        warranty_months = (row.get("warranty_months") or "").strip()
+    for col in ANALYZE_CSV_OUTPUT_COLUMNS:
+        if col not in fieldnames:
+            fieldnames.append(col)
+
+    async def _stream() -> AsyncIterator[str]:
+        line_buf = io.StringIO()
+        writer = csv.DictWriter(line_buf, fieldnames=fieldnames)
+        yield _csv_line(line_buf, writer)
+        flight = dedup_helper.SingleFlight()
+        worker = functools.partial(_analyze_csv_row, flight=flight)
+        count = 0
+        try:
+            async for _, row in _process_bounded(reader, worker, concurrency, ordered=ordered):
+                count += 1
+                yield _csv_line(line_buf, writer, row)
+        except UnicodeDecodeError as e:
+            logger.warning("CSV '%s': stopped after %d rows, invalid UTF-8: %s", file.filename, count, e)
+        finally:
+            # Don't let the wrapper close the upload's underlying file.
+            text_stream.detach()
+            logger.info("CSV '%s': streamed %d rows, dedup %s", file.filename, count, flight.report())
 
-        predicted_price, explanation, risk_flags, source_url, source_urls, data_found_in = await _run_bedrock_analysis(
-            idx,
-            brand,
-            model,
-            storage_gb,
-            ram_gb,
-            network_type,
-            condition_tier,
-            warranty_months,
+    return StreamingResponse(
+        _stream(),
+        media_type="text/csv",
+        headers={"Content-Disposition": 'attachment; filename="analyzed.csv"'},
+    )
+
+# --- Bulk pricing jobs (checkpointed per row in Postgres, resumable) ---
+
+# Rows claimed per round-trip by a bulk job runner; each chunk is priced with the job's concurrency.
+BULK_JOB_CHUNK_SIZE = int(os.getenv("BULK_JOB_CHUNK_SIZE", "50"))
+# A claimed row not checkpointed within this window is considered abandoned (crash/deploy) and re-claimed.
+BULK_JOB_ROW_LEASE_SECONDS = int(os.getenv("BULK_JOB_ROW_LEASE_SECONDS", "900"))
+# While only leased rows remain, a runner re-checks for expired leases at least this often.
+BULK_JOB_LEASE_POLL_SECONDS = float(os.getenv("BULK_JOB_LEASE_POLL_SECONDS", "30"))
+
+# Runner tasks owned by this process (job_id -> task), so a job is never run twice in one process.
+_bulk_job_tasks: dict[str, asyncio.Task] = {}
+
+
+async def _run_db(fn: Callable[..., Any], *args: Any) -> Any:
+    """Run a blocking `fn(db, *args)` with its own session in the default executor."""
+    def _call() -> Any:
+        db = SessionLocal()
+        try:
+            return fn(db, *args)
+        finally:
+            db.close()
+
+    return await asyncio.get_running_loop().run_in_executor(None, _call)
+
+
+async def _run_bulk_job(job_id: str, concurrency: int) -> None:
+    """Background task: claim pending rows chunk by chunk, price them and checkpoint each row as it finishes."""
+    # Rows sharing a config key are priced once per runner; a key already finished by an
+    # earlier run of this job (before a restart) is copied from its checkpointed row.
+    flight = dedup_helper.SingleFlight()
+
+    async def price_config(row_idx: int, record: dict[str, Any], key: str) -> dict[str, Any]:
+        prior = await _run_db(bulk_jobs_helper.find_done_output, job_id, key)
+        if prior is not None:
+            return prior
+        return await _price_csv_row(row_idx, dict(record))
+
+    async def price_row(_: int, claimed: tuple[int, dict[str, Any], str]) -> None:
+        row_idx, record, key = claimed
+        try:
+            output = await flight.run(key, lambda: price_config(row_idx, record, key))
+            await _run_db(bulk_jobs_helper.checkpoint_row, job_id, row_idx, output)
+        except Exception as e:
+            logger.exception("Bulk job %s row %d failed: %s", job_id, row_idx, e)
+            await _run_db(bulk_jobs_helper.checkpoint_row, job_id, row_idx, None, str(e))
+
+    try:
+        while True:
+            claimed = await _run_db(
+                bulk_jobs_helper.claim_rows, job_id, BULK_JOB_CHUNK_SIZE, BULK_JOB_ROW_LEASE_SECONDS
+            )
+            if not claimed:
+                # Rows still leased to a runner that died (crash / deploy) are claimable once the lease
+                # expires; wait for that instead of exiting and leaving the job 'running' with no runner.
+                wait = await _run_db(bulk_jobs_helper.next_claim_in, job_id, BULK_JOB_ROW_LEASE_SECONDS)
+                if wait is None:
+                    break
+                if wait > 0:
+                    logger.info("Bulk job %s: waiting %.0fs for expired row leases", job_id, wait)
+                await asyncio.sleep(min(wait + 1, BULK_JOB_LEASE_POLL_SECONDS))
+                continue
+            logger.info("Bulk job %s: claimed rows %d-%d", job_id, claimed[0][0], claimed[-1][0])
+            async for _ in _process_bounded(claimed, price_row, concurrency, ordered=False):
+                pass
+        if await _run_db(bulk_jobs_helper.finish_if_complete, job_id):
+            logger.info("Bulk job %s completed", job_id)
+    except Exception as e:
+        logger.exception("Bulk job %s runner failed: %s", job_id, e)
+    finally:
+        _bulk_job_tasks.pop(job_id, None)
+
+
+def _start_bulk_job_runner(job_id: str, concurrency: int) -> None:
+    if job_id in _bulk_job_tasks:
+        return
+    _bulk_job_tasks[job_id] = asyncio.create_task(_run_bulk_job(job_id, concurrency))
+
+
+def _list_running_bulk_jobs(db: Session) -> list[tuple[str, int]]:
+    return [(j.id, j.concurrency) for j in db.query(BulkJobModel).filter(BulkJobModel.status == "running")]
+
+
+async def _resume_running_bulk_jobs() -> None:
+    """Restart runners for jobs left 'running' by a previous process; finished rows are not redone."""
+    for job_id, concurrency in await _run_db(_list_running_bulk_jobs):
+        logger.info("Resuming bulk job %s", job_id)
+        _start_bulk_job_runner(job_id, concurrency)
+
+
+@app.post("/bulk-jobs")
+async def bulk_job_create(
+    file: UploadFile = File(...),
+    name: Optional[str] = Query(None, max_length=200),
+    input_format: Optional[Literal["csv", "ndjson"]] = Query(
+        None, alias="format", description="Upload format; detected from the filename when omitted."
+    ),
+    concurrency: int = Query(ANALYZE_CSV_CONCURRENCY, ge=1, le=ANALYZE_CSV_MAX_CONCURRENCY),
+) -> dict[str, Any]:
+    """
+    Create a bulk pricing job from a CSV or NDJSON upload of any size (same columns as /analyze-csv).
+    Rows are stored in Postgres and priced in chunks in the background; every finished row is
+    checkpointed, so the job resumes after a restart without redoing work.
+    Poll GET /bulk-jobs/{job_id} and download finished rows with GET /bulk-jobs/{job_id}/results.
+    """
+    fmt = input_format or bulk_jobs_helper.detect_format(file.filename, file.content_type)
+    job_id = str(uuid.uuid4())
+
+    def _ingest(db: Session) -> int:
+        fieldnames, records = bulk_jobs_helper.open_records(file.file, fmt)
+        for col in ANALYZE_CSV_OUTPUT_COLUMNS:
+            if col not in fieldnames:
+                fieldnames.append(col)
+        db.add(BulkJobModel(
+            id=job_id,
+            name=name,
+            status="running",
+            input_format=fmt,
+            fieldnames=fieldnames,
+            concurrency=concurrency,
+        ))
+        db.flush()
+        total, unique = bulk_jobs_helper.ingest_rows(db, job_id, records)
+        db.query(BulkJobModel).filter(BulkJobModel.id == job_id).update(
+            {"total_rows": total, "unique_configs": unique}
         )
+        db.commit()
+        return total, unique
 
-        row["predicted_price"] = predicted_price
-        row["data_found_in"] = ", ".join(data_found_in) if data_found_in else "—"
-        row["source_url"] = source_url
-        row["source_urls"] = json.dumps(source_urls) if source_urls else "[]"
-        writer.writerow(row)
+    try:
+        total, unique = await _run_db(_ingest)
+    except (bulk_jobs_helper.BulkInputError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Could not read upload: {e}") from e
+
+    logger.info(
+        "Bulk job %s: ingested %d rows (%d unique configs) from '%s' (%s)",
+        job_id, total, unique, file.filename, fmt,
+    )
+    _start_bulk_job_runner(job_id, concurrency)
+    return {
+        "job_id": job_id,
+        "total_rows": total,
+        "input_format": fmt,
+        "dedup": dedup_helper.dedup_report(total, unique),
+    }
+
+
+@app.get("/bulk-jobs/{job_id}")
+def bulk_job_status(job_id: str, db: Session = Depends(get_db)) -> dict[str, Any]:
+    """Progress of a bulk job. `cursor` is the latest value to pass to /results?after=."""
+    job = db.query(BulkJobModel).filter(BulkJobModel.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return bulk_jobs_helper.job_to_dict(job)
+
+
+@app.post("/bulk-jobs/{job_id}/resume")
+async def bulk_job_resume(job_id: str, retry_failed: bool = Query(False)) -> dict[str, Any]:
+    """Restart the runner for a job in this process (e.g. after a deploy). Optionally retry failed rows."""
+    def _prepare(db: Session) -> Optional[tuple[int, int]]:
+        job = db.query(BulkJobModel).filter(BulkJobModel.id == job_id).first()
+        if not job:
+            return None
+        requeued = bulk_jobs_helper.requeue_failed(db, job_id) if retry_failed else 0
+        if job.status != "running":
+            job.status = "running"
+            job.completed_at = None
+            db.commit()
+        return job.concurrency, requeued
+
+    prepared = await _run_db(_prepare)
+    if prepared is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    concurrency, requeued = prepared
+    _start_bulk_job_runner(job_id, concurrency)
+    return {"job_id": job_id, "status": "running", "requeued": requeued}
+
+
+@app.get("/bulk-jobs/{job_id}/results")
+def bulk_job_results(
+    job_id: str,
+    after: int = Query(0, ge=0, description="Cursor: only rows finished after this seq (use the last X-Next-Cursor)."),
+    limit: Optional[int] = Query(None, ge=1, le=100_000),
+    output_format: Literal["csv", "ndjson"] = Query("csv", alias="format"),
+    db: Session = Depends(get_db),
+) -> StreamingResponse:
+    """
+    Download finished rows incrementally, in completion order. Pass the previous response's
+    `X-Next-Cursor` header as `after` to fetch only rows finished since then.
+    """
+    job = db.query(BulkJobModel).filter(BulkJobModel.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    # Checkpoints take the job row lock in seq order, so every seq <= last_seq is already committed.
+    next_cursor = job.last_seq if limit is None else min(job.last_seq, after + limit)
+    next_cursor = max(next_cursor, after)
+    fieldnames = list(job.fieldnames or [])
+
+    def _stream() -> Iterable[str]:
+        stream_db = SessionLocal()
+        try:
+            rows = bulk_jobs_helper.iter_completed_rows(stream_db, job_id, after, next_cursor)
+            if output_format == "ndjson":
+                for r in rows:
+                    yield json.dumps({"row": r.row_idx, **(r.input or {}), **(r.output or {}), "error": r.error}, ensure_ascii=False) + "\n"
+                return
+            line_buf = io.StringIO()
+            writer = csv.DictWriter(line_buf, fieldnames=["row", *fieldnames, "error"], extrasaction="ignore")
+            yield _csv_line(line_buf, writer)
+            for r in rows:
+                yield _csv_line(line_buf, writer, {"row": r.row_idx, **(r.input or {}), **(r.output or {}), "error": r.error or ""})
+        finally:
+            stream_db.close()
 
-    output_buf.seek(0)
     return StreamingResponse(
-        output_buf,
-        media_type="text/csv",
-        headers={"Content-Disposition": 'attachment; filename="analyzed.csv"'},
+        _stream(),
+        media_type="application/x-ndjson" if output_format == "ndjson" else "text/csv",
+        headers={"X-Next-Cursor": str(next_cursor), "X-Job-Status": job.status},
     )
 
+
 @app.post("/analyze-devices/start")
-async def analyze_devices_start(req: AnalyzeDevicesRequest) -> dict[str, Any]:
-    """Start an async analyze-devices job. Returns job_id and live_urls_by_device (3 URLs per device). Poll GET /analyze-devices/status/{job_id} for results."""
+async def analyze_devices_start(req: AnalyzeDevicesStartRequest) -> dict[str, Any]:
+    """
+    Start an async analyze-devices job. Returns job_id and live_urls_by_device (3 URLs per device).
+    Poll GET /analyze-devices/status/{job_id} for results. With run_id / run_name, results are written
+    to that run as devices finish (also returned as run_id) instead of being uploaded by the client.
+    """
     client = _get_browser_use_client()
     if not client:
         raise HTTPException(
@@ -1506,20 +2339,14 @@ async def analyze_devices_start(req: AnalyzeDevicesRequest) -> dict[str, Any]:
             detail="Browser scraper not available. Set BROWSER_USE_API_KEY to enable.",
         )
     job_id = str(uuid.uuid4())
-    session_ids_by_device: list[list[str]] = []
-    live_urls_by_device: list[list[str]] = []
-    for _ in req.devices:
-        device_session_ids = []
-        device_live_urls = []
-        for _ in range(NUM_BROWSER_SESSIONS):
-            try:
-                session = await client.sessions.create()
-                device_session_ids.append(session.id)
-                device_live_urls.append(session.live_url)
-            except Exception as e:
-                raise HTTPException(status_code=502, detail=f"Failed to create browser session: {e}") from e
-        session_ids_by_device.append(device_session_ids)
-        live_urls_by_device.append(device_live_urls)
+    # Spans from here to the end of the job (session create, scrapes, velocity, Bedrock, DB writes).
+    trace = tracing_helper.Trace("analyze_devices.job", job_id=job_id, devices=len(req.devices))
+    with tracing_helper.activate(trace):
+        try:
+            run_id, instant, session_ids_by_device, live_urls_by_device = await _start_analyze_devices_job(req, client)
+        except BaseException as e:
+            trace.end(f"{type(e).__name__}: {e}")
+            raise
     _analyze_devices_jobs[job_id] = {
         "status": "running",
         "live_urls_by_device": live_urls_by_device,
@@ -1527,54 +2354,157 @@ async def analyze_devices_start(req: AnalyzeDevicesRequest) -> dict[str, Any]:
         "results": None,
         "scrape_results": None,
         "error": None,
+        "run_id": run_id,
+        "instant": instant,
+        "llm_calls": [],
+        "trace": trace,
     }
     asyncio.create_task(_run_analyze_devices_job(job_id, req.devices))
-    return {"job_id": job_id, "live_urls_by_device": live_urls_by_device}
+    out: dict[str, Any] = {"job_id": job_id, "live_urls_by_device": live_urls_by_device}
+    if run_id:
+        out["run_id"] = run_id
+    return out
+
+
+async def _start_analyze_devices_job(
+    req: AnalyzeDevicesStartRequest, client: Any
+) -> tuple[Optional[str], dict[int, AnalyzeDevicesResponseItem], list[list[str]], list[list[str]]]:
+    """
+    Create the job's instant estimates, browser sessions and run: (run_id, instant, session ids, live urls).
+    The run is inserted last, so a failed session create leaves no "processing" run behind to block a retry.
+    """
+    instant: dict[int, AnalyzeDevicesResponseItem] = {}
+    if req.instant_when_confident:
+        with tracing_helper.span("kb.instant_estimates"):
+            instant = await _instant_estimate_items(req.devices)
+    session_ids_by_device: list[list[str]] = []
+    live_urls_by_device: list[list[str]] = []
+    # Devices with the same search query reuse one set of sessions (the job scrapes each query once).
+    sessions_by_query: dict[str, tuple[list[str], list[str]]] = {}
+    for dev_idx, d in enumerate(req.devices):
+        if dev_idx in instant:
+            # Priced from KB history; no browser sessions needed.
+            session_ids_by_device.append([])
+            live_urls_by_device.append([])
+            continue
+        query = _device_search_query(d)
+        if query not in sessions_by_query:
+            device_session_ids = []
+            device_live_urls = []
+            with tracing_helper.span("sessions.create", device=dev_idx + 1, query=query):
+                for _ in range(NUM_BROWSER_SESSIONS):
+                    try:
+                        session = await _create_browser_session(client)
+                        device_session_ids.append(session.id)
+                        device_live_urls.append(session.live_url)
+                    except Exception as e:
+                        raise HTTPException(status_code=502, detail=f"Failed to create browser session: {e}") from e
+            sessions_by_query[query] = (device_session_ids, device_live_urls)
+        device_session_ids, device_live_urls = sessions_by_query[query]
+        session_ids_by_device.append(device_session_ids)
+        live_urls_by_device.append(device_live_urls)
+    run_id = None
+    if req.run_id or req.run_name:
+        run_id = req.run_id or str(uuid.uuid4())
+        run_name = req.run_name or f"Run {datetime.now(timezone.utc).strftime('%d %b %Y')}"
+        run_devices = req.run_devices if req.run_devices is not None else [_run_device_from_item(d) for d in req.devices]
+        with tracing_helper.span("db.write", op="create_job_run"):
+            created = await _run_db(_create_job_run, run_id, run_name, run_devices)
+        if not created:
+            raise HTTPException(status_code=409, detail=f"Run {run_id} already exists")
+        _invalidate_run_reads(run_id)
+    return run_id, instant, session_ids_by_device, live_urls_by_device
 
 
 @app.get("/analyze-devices/status/{job_id}")
-async def analyze_devices_status(job_id: str) -> dict[str, Any]:
-    """Get status of an analyze-devices job. When status is 'finished', includes results and scrape_results (3 tables by source)."""
+async def analyze_devices_status(
+    job_id: str,
+    include_results: Optional[bool] = Query(
+        None, description="Return results/scrape_results inline. Defaults to true unless the job persists to a run."
+    ),
+    timeline: bool = Query(
+        False, description="Include the job's spans (timeline) and the chain of spans it waited on (critical_path)."
+    ),
+) -> dict[str, Any]:
+    """
+    Get status of an analyze-devices job. When status is 'finished', includes results and scrape_results (3 tables by source).
+    With timeline=true, also the per-device spans (session create, source scrapes, velocity, Bedrock, DB writes).
+    llm_usage has the Bedrock tokens and estimated cost spent so far, by model, caller and device.
+    """
     job = _analyze_devices_jobs.get(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
     out = {"job_id": job_id, "status": job["status"]}
+    if job.get("run_id"):
+        out["run_id"] = job["run_id"]
+        if job.get("run_error"):
+            out["run_error"] = job["run_error"]
+    if include_results is None:
+        include_results = not job.get("run_id") or bool(job.get("run_error"))
     if job.get("live_urls_by_device"):
         out["live_urls_by_device"] = job["live_urls_by_device"]
     if job.get("error"):
         out["error"] = job["error"]
-    if job.get("results") is not None:
+    if include_results and job.get("results") is not None:
         out["results"] = job["results"]
-    if job.get("scrape_results") is not None:
+    if include_results and job.get("scrape_results") is not None:
         out["scrape_results"] = job["scrape_results"]
+    if job.get("dedup") is not None:
+        out["dedup"] = job["dedup"]
+    # Final totals once the job ends; while it runs, the calls made so far.
+    llm_usage = job.get("llm_usage") or llm_usage_helper.summarize(job.get("llm_calls") or [], group_by=_RUN_LLM_USAGE_GROUPS)
+    if llm_usage is not None:
+        out["llm_usage"] = llm_usage
+    trace = job.get("trace")
+    if timeline and trace is not None:
+        out["trace_id"] = trace.trace_id
+        out["timeline"] = trace.timeline()
+        out["critical_path"] = trace.critical_path()
+        if trace.dropped:
+            out["timeline_dropped_spans"] = trace.dropped
     return out
 
 
 @app.post("/analyze-devices", response_model=AnalyzeDevicesResponse)
 async def analyze_devices(req: AnalyzeDevicesRequest) -> AnalyzeDevicesResponse:
+    instant = await _instant_estimate_items(req.devices) if req.instant_when_confident else {}
+    # Devices with the same config are priced once; the result is fanned out to each device id.
+    priced: dict[tuple[str, ...], AnalyzeDevicesResponseItem] = {}
     results = []
+    llm_calls: list[dict[str, Any]] = []
     for idx, d in enumerate(req.devices, start=1):
-        amazon_bought_tags, flipkart_rating_tags, amazon_items, flipkart_items = await _fetch_velocity_signals_for_device(
-            model=d.model,
-            ram=d.ram_gb,
-            storage=d.storage_gb,
-            color=d.color,
-            limit=5,
-        )
-        price, explanation, flags, source_url, source_urls, data_found_in = await _run_bedrock_analysis(
-            idx,
-            d.brand,
-            d.model,
-            d.storage_gb,
-            d.ram_gb,
-            d.network_type,
-            d.condition_tier,
-            d.warranty_months,
-        )
-        results.append(AnalyzeDevicesResponseItem(
+        if idx - 1 in instant:
+            results.append(instant[idx - 1])
+            continue
+        key = _device_dedup_key(d)
+        if key in priced:
+            results.append(priced[key].model_copy(update={"id": d.id, "llm_usage": None}))
+            continue
+        device_calls: list[dict[str, Any]] = []
+        with llm_usage_helper.scope(llm_calls), llm_usage_helper.scope(device_calls, device_id=d.id):
+            amazon_bought_tags, flipkart_rating_tags, amazon_items, flipkart_items = await _fetch_velocity_signals_for_device(
+                model=d.model,
+                ram=d.ram_gb,
+                storage=d.storage_gb,
+                color=d.color,
+                limit=5,
+            )
+            price, explanation, flags, source_url, source_urls, data_found_in = await _run_bedrock_analysis(
+                idx,
+                d.brand,
+                d.model,
+                d.storage_gb,
+                d.ram_gb,
+                d.network_type,
+                d.condition_tier,
+                d.warranty_months,
+            )
+        price, correction = await _apply_kb_correction(d.brand, d.model, d.condition_tier, price)
+        item = AnalyzeDevicesResponseItem(
             id=d.id,
-            predicted_price=price or "",
-            explanation=explanation or "",
+            predicted_price=price,
+            explanation=(explanation or "") + _kb_correction_note(correction),
+            kb_correction=correction,
             risk_flags=flags or [],
             data_found_in=data_found_in or [],
             source_url=source_url or "",
@@ -1583,9 +2513,15 @@ async def analyze_devices(req: AnalyzeDevicesRequest) -> AnalyzeDevicesResponse:
             flipkart_rating_tags=flipkart_rating_tags,
             amazon_velocity_items=amazon_items,
             flipkart_velocity_items=flipkart_items,
-        ))
+            llm_usage=llm_usage_helper.summarize(device_calls),
+        )
+        priced[key] = item
+        results.append(item)
 
-    return AnalyzeDevicesResponse(results=results)
+    dedup = {**dedup_helper.dedup_report(len(req.devices) - len(instant), len(priced)), "instant": len(instant)}
+    logger.info("analyze-devices: %s", dedup)
+    llm_usage = llm_usage_helper.summarize(llm_calls, group_by=_RUN_LLM_USAGE_GROUPS)
+    return AnalyzeDevicesResponse(results=results, dedup=dedup, llm_usage=llm_usage)
 
 # --- Database Endpoints ---
 
@@ -1599,43 +2535,329 @@ class RunCreate(BaseModel):
     results: list[dict]
     scrapeResults: Optional[dict] = Field(None, alias="scrapeResults")  # Per-source tables: ovantica, refitglobal, cashify
     feedbackSubmitted: bool = Field(alias="feedbackSubmitted")
+    # Bedrock usage for the run; derived from the results' llmUsage when omitted.
+    llmUsage: Optional[dict] = Field(None, alias="llmUsage")
 
-@app.get("/runs")
-def get_runs(db: Session = Depends(get_db)):
-    runs = db.query(RunModel).order_by(RunModel.created_at.desc()).all()
-    # convert SQLAlchemy objects to dicts
-    return [{
+def _iso(dt: Optional[datetime]) -> Optional[str]:
+    return dt.isoformat() if dt else None
+
+
+async def _data_version(db: AsyncSession, name: str) -> int:
+    """Table-wide version kept by the data_versions triggers (bumped by every write statement)."""
+    version = await db.scalar(text("SELECT version FROM data_versions WHERE name = :n"), {"n": name})
+    return version or 0
+
+
+def _invalidate_run_reads(run_id: str) -> None:
+    read_cache_helper.cache.invalidate("runs:list:", f"runs:item:{run_id}:")
+
+
+def _run_to_dict(r: RunModel, scrape_results: bool = True) -> dict[str, Any]:
+    out = {
         "id": r.id,
         "name": r.name,
         "status": r.status,
-        "createdAt": r.created_at.isoformat() if r.created_at else None,
-        "completedAt": r.completed_at.isoformat() if r.completed_at else None,
+        "createdAt": _iso(r.created_at),
+        "completedAt": _iso(r.completed_at),
         "devices": r.devices,
         "results": r.results,
-        "scrapeResults": r.scrape_results if r.scrape_results else None,
-        "feedbackSubmitted": r.feedback_submitted
-    } for r in runs]
+        "feedbackSubmitted": r.feedback_submitted,
+        "version": r.version,
+        "llmUsage": r.llm_usage,
+    }
+    if scrape_results:
+        out["scrapeResults"] = r.scrape_results if r.scrape_results else None
+    return out
+
+
+RUNS_PAGE_MAX_LIMIT = 200
+
+# Summary projection: per-run counts/aggregates computed in Postgres so the JSONB blobs never leave the DB.
+_RESULT_ELEMENTS = "jsonb_array_elements(CASE WHEN jsonb_typeof(runs.results) = 'array' THEN runs.results ELSE '[]'::jsonb END) e"
+_RUN_SUMMARY_EXPRESSIONS = {
+    "deviceCount": "COALESCE(jsonb_array_length(CASE WHEN jsonb_typeof(runs.devices) = 'array' THEN runs.devices END), 0)",
+    "resultCount": "COALESCE(jsonb_array_length(CASE WHEN jsonb_typeof(runs.results) = 'array' THEN runs.results END), 0)",
+    "avgRecommendedPrice": (
+        "(SELECT round(avg((e->>'recommendedPrice')::numeric)) FROM " + _RESULT_ELEMENTS
+        + " WHERE jsonb_typeof(e->'recommendedPrice') = 'number')"
+    ),
+    "withDataCount": (
+        "(SELECT count(*) FROM " + _RESULT_ELEMENTS
+        + " WHERE jsonb_typeof(e->'dataFoundIn') = 'array' AND jsonb_array_length(e->'dataFoundIn') > 0)"
+    ),
+}
+# API field -> RunModel attribute for plain columns.
+_RUN_COLUMN_FIELDS = {
+    "id": "id",
+    "name": "name",
+    "status": "status",
+    "createdAt": "created_at",
+    "completedAt": "completed_at",
+    "feedbackSubmitted": "feedback_submitted",
+    "devices": "devices",
+    "results": "results",
+    "scrapeResults": "scrape_results",
+    "version": "version",
+    "llmUsage": "llm_usage",
+}
+_RUN_SUMMARY_FIELDS = ("id", "name", "status", "createdAt", "completedAt", "feedbackSubmitted", "version", *_RUN_SUMMARY_EXPRESSIONS)
+_RUN_FULL_FIELDS = tuple(_RUN_COLUMN_FIELDS)
+
+
+def _encode_runs_cursor(created_at: Optional[datetime], run_id: str) -> str:
+    raw = json.dumps([_iso(created_at), run_id])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def _decode_runs_cursor(cursor: str) -> tuple[datetime, str]:
+    try:
+        created_at, run_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(created_at), str(run_id)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from e
+
+
+@app.get("/runs")
+async def get_runs(
+    request: Request,
+    limit: Optional[int] = Query(
+        None, ge=1, le=RUNS_PAGE_MAX_LIMIT, description="Page size. Omit to return every run (legacy)."
+    ),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page."),
+    view: Literal["full", "summary"] = Query(
+        "full", description="'summary' returns counts (deviceCount, resultCount, ...) instead of JSONB blobs."
+    ),
+    fields: Optional[str] = Query(None, description="Comma-separated subset of fields to return."),
+    model: Optional[str] = Query(None, max_length=200, description="Only runs that include a device with this exact model."),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    List runs, newest first. Keyset-paginated on (created_at, id) when `limit` is set:
+    the cursor for the next page is returned in the `X-Next-Cursor` header (absent on the last page).
+    Only the columns needed for the requested view/fields are loaded; the rest stay deferred.
+    Encoded with orjson (or MessagePack on request) and compressed per Accept-Encoding; served from
+    the read cache while the `runs` data version is unchanged (ETag / If-None-Match -> 304).
+    """
+    allowed = _RUN_SUMMARY_FIELDS if view == "summary" else _RUN_FULL_FIELDS
+    if fields:
+        selected = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = [f for f in selected if f not in allowed]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields for view '{view}': {unknown}; allowed: {list(allowed)}")
+    else:
+        selected = list(allowed)
+
+    columns = [_RUN_COLUMN_FIELDS[f] for f in selected if f in _RUN_COLUMN_FIELDS]
+    # id/created_at are always loaded: they're the sort key and the cursor.
+    load_attrs = {"id", "created_at", *columns}
+    expressions = [f for f in selected if f in _RUN_SUMMARY_EXPRESSIONS]
+
+    async def load() -> tuple[list[dict[str, Any]], dict[str, str]]:
+        q = select(RunModel).options(load_only(*(getattr(RunModel, a) for a in load_attrs)))
+        for name in expressions:
+            q = q.add_columns(literal_column(_RUN_SUMMARY_EXPRESSIONS[name]).label(name))
+        if model:
+            q = q.where(RunModel.devices.contains([{"model": model}]))
+        if cursor:
+            cursor_created_at, cursor_id = _decode_runs_cursor(cursor)
+            q = q.where(tuple_(RunModel.created_at, RunModel.id) < tuple_(cursor_created_at, cursor_id))
+        q = q.order_by(RunModel.created_at.desc(), RunModel.id.desc())
+        if limit is not None:
+            q = q.limit(limit + 1)
+
+        # Rows are (RunModel, *expressions).
+        rows = (await db.execute(q)).all()
+        headers = {}
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1][0]
+            headers["X-Next-Cursor"] = _encode_runs_cursor(last.created_at, last.id)
+
+        items = []
+        for row in rows:
+            r = row[0]
+            item: dict[str, Any] = {}
+            for f in selected:
+                if f in _RUN_SUMMARY_EXPRESSIONS:
+                    value = row._mapping[f]
+                    item[f] = int(value) if value is not None else None
+                elif f == "scrapeResults":
+                    item[f] = r.scrape_results if r.scrape_results else None
+                else:
+                    value = getattr(r, _RUN_COLUMN_FIELDS[f])
+                    item[f] = _iso(value) if isinstance(value, datetime) else value
+            items.append(item)
+        return items, headers
+
+    async def version() -> int:
+        return await _data_version(db, "runs")
+
+    return await read_cache_helper.cache.respond(request, "runs:list:" + request.url.query, "runs", version, load)
 
 @app.get("/runs/{run_id}")
-def get_run(run_id: str, db: Session = Depends(get_db)):
-    run = db.query(RunModel).filter(RunModel.id == run_id).first()
-    if not run:
+async def get_run(
+    request: Request,
+    run_id: str,
+    scrape: Literal["full", "summary"] = Query(
+        "full",
+        description="'summary' omits scrapeResults and returns scrapeCounts per source; "
+        "page through listings with GET /runs/{run_id}/scrape/{source}.",
+    ),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Served from the read cache while the run's version is unchanged; answers 304 to a matching
+    If-None-Match (see read_cache_helper).
+    """
+    async def version() -> int:
+        v = await db.scalar(select(RunModel.version).where(RunModel.id == run_id))
+        if v is None:
+            raise HTTPException(status_code=404, detail="Run not found")
+        return v
+
+    async def load() -> tuple[dict[str, Any], dict[str, str]]:
+        if scrape == "full":
+            run = await db.get(RunModel, run_id)
+            if not run:
+                raise HTTPException(status_code=404, detail="Run not found")
+            return _run_to_dict(run), {}
+
+        counts_expr = literal_column(
+            "(SELECT COALESCE(jsonb_object_agg(k, CASE WHEN jsonb_typeof(v) = 'array' THEN jsonb_array_length(v) ELSE 0 END), '{}'::jsonb) "
+            "FROM jsonb_each(CASE WHEN jsonb_typeof(runs.scrape_results) = 'object' THEN runs.scrape_results ELSE '{}'::jsonb END) AS s(k, v))"
+        ).label("scrape_counts")
+        row = (
+            await db.execute(
+                select(RunModel, counts_expr)
+                .options(load_only(
+                    RunModel.id, RunModel.name, RunModel.status, RunModel.created_at, RunModel.completed_at,
+                    RunModel.devices, RunModel.results, RunModel.feedback_submitted, RunModel.version,
+                    RunModel.llm_usage,
+                ))
+                .where(RunModel.id == run_id)
+            )
+        ).first()
+        if not row:
+            raise HTTPException(status_code=404, detail="Run not found")
+        run, scrape_counts = row
+        # scrape_results is not loaded here (and cannot be lazy-loaded on an async session).
+        out = _run_to_dict(run, scrape_results=False)
+        out["scrapeCounts"] = scrape_counts or {}
+        return out, {}
+
+    return await read_cache_helper.cache.respond(
+        request, f"runs:item:{run_id}:{scrape}", f"run-{run_id}", version, load
+    )
+
+
+# Typed views of a scraped listing row (BrowserUse rows use Price/Storage/...; older scrapers used lowercase keys).
+_SCRAPE_ROW_PRICE = "substring(replace(COALESCE(e.row->>'Price', e.row->>'price', ''), ',', '') from '[0-9]+(?:[.][0-9]+)?')::numeric"
+_SCRAPE_ROW_STORAGE_GB = (
+    "(substring(COALESCE(e.row->>'Storage', e.row->>'storage', '') from '[0-9]+')::int"
+    " * CASE WHEN COALESCE(e.row->>'Storage', e.row->>'storage', '') ILIKE '%tb%' THEN 1024 ELSE 1 END)"
+)
+_SCRAPE_ROW_RAM_GB = "substring(COALESCE(e.row->>'Ram', e.row->>'ram', '') from '[0-9]+')::int"
+_SCRAPE_ROW_CONDITION = "COALESCE(e.row->>'Condition', e.row->>'condition', '')"
+_SCRAPE_ROW_MODEL = "COALESCE(e.row->>'Model', e.row->>'name', '')"
+_SCRAPE_SORT_EXPRESSIONS = {
+    "index": "e.ord",
+    "price": _SCRAPE_ROW_PRICE,
+    "storage": _SCRAPE_ROW_STORAGE_GB,
+    "ram": _SCRAPE_ROW_RAM_GB,
+    "condition": "lower(" + _SCRAPE_ROW_CONDITION + ")",
+    "model": "lower(" + _SCRAPE_ROW_MODEL + ")",
+}
+SCRAPE_PAGE_MAX_LIMIT = 500
+
+
+@app.get("/runs/{run_id}/scrape/{source}")
+async def get_run_scrape_page(
+    run_id: str,
+    source: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=SCRAPE_PAGE_MAX_LIMIT),
+    sort: Literal["index", "price", "storage", "ram", "condition", "model"] = Query("index"),
+    order: Literal["asc", "desc"] = Query("asc"),
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    storage_gb: Optional[int] = Query(None, ge=1, description="Exact storage in GB (1TB = 1024)."),
+    condition: Optional[str] = Query(None, max_length=50, description="Case-insensitive substring match."),
+    model: Optional[str] = Query(None, max_length=200, description="Case-insensitive substring match on the listing model."),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    One page of a run's scraped listings for a single source (ovantica, refitglobal, cashify),
+    filtered and sorted in Postgres over the JSONB array so only the requested rows are transferred.
+    Each item carries `_index`, its position in the stored table.
+    """
+    filters = []
+    params: dict[str, Any] = {"run_id": run_id, "source": source, "offset": offset, "limit": limit}
+    if min_price is not None:
+        filters.append(f"{_SCRAPE_ROW_PRICE} >= :min_price")
+        params["min_price"] = min_price
+    if max_price is not None:
+        filters.append(f"{_SCRAPE_ROW_PRICE} <= :max_price")
+        params["max_price"] = max_price
+    if storage_gb is not None:
+        filters.append(f"{_SCRAPE_ROW_STORAGE_GB} = :storage_gb")
+        params["storage_gb"] = storage_gb
+    if condition:
+        filters.append(f"{_SCRAPE_ROW_CONDITION} ILIKE :condition")
+        params["condition"] = f"%{condition.strip()}%"
+    if model:
+        filters.append(f"{_SCRAPE_ROW_MODEL} ILIKE :model")
+        params["model"] = f"%{model.strip()}%"
+    where = "".join(f" AND {f}" for f in filters)
+    # Sort expressions are whitelisted above, never taken from user input.
+    order_by = f"{_SCRAPE_SORT_EXPRESSIONS[sort]} {order.upper()} NULLS LAST, e.ord"
+
+    run_exists = await db.scalar(select(RunModel.id).where(RunModel.id == run_id))
+    if not run_exists:
         raise HTTPException(status_code=404, detail="Run not found")
+
+    rows = (await db.execute(
+        text(
+            "SELECT e.ord, e.row, count(*) OVER () AS total "
+            "FROM runs, jsonb_array_elements("
+            "  CASE WHEN jsonb_typeof(runs.scrape_results -> :source) = 'array' "
+            "  THEN runs.scrape_results -> :source ELSE '[]'::jsonb END"
+            ") WITH ORDINALITY AS e(row, ord) "
+            f"WHERE runs.id = :run_id{where} "
+            f"ORDER BY {order_by} OFFSET :offset LIMIT :limit"
+        ),
+        params,
+    )).all()
+    if rows:
+        total = rows[0].total
+    elif offset:
+        # Page past the end: count matches separately so clients still get the total.
+        total = (await db.execute(
+            text(
+                "SELECT count(*) FROM runs, jsonb_array_elements("
+                "  CASE WHEN jsonb_typeof(runs.scrape_results -> :source) = 'array' "
+                "  THEN runs.scrape_results -> :source ELSE '[]'::jsonb END"
+                ") WITH ORDINALITY AS e(row, ord) "
+                f"WHERE runs.id = :run_id{where}"
+            ),
+            params,
+        )).scalar_one()
+    else:
+        total = 0
     return {
-        "id": run.id,
-        "name": run.name,
-        "status": run.status,
-        "createdAt": run.created_at.isoformat() if run.created_at else None,
-        "completedAt": run.completed_at.isoformat() if run.completed_at else None,
-        "devices": run.devices,
-        "results": run.results,
-        "scrapeResults": run.scrape_results if run.scrape_results else None,
-        "feedbackSubmitted": run.feedback_submitted
+        "runId": run_id,
+        "source": source,
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+        "items": [{**(r.row if isinstance(r.row, dict) else {}), "_index": r.ord - 1} for r in rows],
     }
 
 @app.post("/runs")
-def create_run(run: RunCreate, db: Session = Depends(get_db)):
-    existing = db.query(RunModel).filter(RunModel.id == run.id).first()
+async def create_run(run: RunCreate, db: AsyncSession = Depends(get_async_db)):
+    llm_usage = run.llmUsage or llm_usage_helper.combine(
+        {str(r.get("deviceId")): r.get("llmUsage") for r in run.results if isinstance(r, dict)}
+    )
+    existing = await db.get(RunModel, run.id)
     if existing:
         existing.name = run.name
         existing.status = run.status
@@ -1646,31 +2868,134 @@ def create_run(run: RunCreate, db: Session = Depends(get_db)):
         if run.scrapeResults is not None:
             existing.scrape_results = run.scrapeResults
         existing.feedback_submitted = run.feedbackSubmitted
+        if llm_usage is not None:
+            existing.llm_usage = llm_usage
+        existing.version = RunModel.version + 1
     else:
         new_run = RunModel(
             id=run.id,
             name=run.name,
             status=run.status,
-            created_at=datetime.fromisoformat(run.createdAt.replace('Z', '+00:00')) if run.createdAt else None,
             completed_at=datetime.fromisoformat(run.completedAt.replace('Z', '+00:00')) if run.completedAt else None,
             devices=run.devices,
             results=run.results,
             scrape_results=run.scrapeResults if run.scrapeResults else None,
-            feedback_submitted=run.feedbackSubmitted
+            feedback_submitted=run.feedbackSubmitted,
+            llm_usage=llm_usage,
         )
+        # Leave created_at to the server default when missing so the (created_at, id) keyset never sees NULLs.
+        if run.createdAt:
+            new_run.created_at = datetime.fromisoformat(run.createdAt.replace('Z', '+00:00'))
         db.add(new_run)
-    db.commit()
+    await db.commit()
+    _invalidate_run_reads(run.id)
     return {"status": "ok"}
 
+class RunResultPatch(BaseModel):
+    """Replace one element of run.results, addressed by deviceId (appended if absent) or by index."""
+    deviceId: Optional[str] = Field(None, alias="deviceId")
+    index: Optional[int] = Field(None, ge=0)
+    result: dict
+
+    @model_validator(mode="after")
+    def _one_address(self):
+        if (self.deviceId is None) == (self.index is None):
+            raise ValueError("Provide exactly one of deviceId or index")
+        return self
+
+
+class RunPatch(BaseModel):
+    version: Optional[int] = Field(None, description="Expected current version; 409 if the run has moved on.")
+    name: Optional[str] = None
+    status: Optional[str] = None
+    completedAt: Optional[str] = Field(None, alias="completedAt")
+    feedbackSubmitted: Optional[bool] = Field(None, alias="feedbackSubmitted")
+    results: list[RunResultPatch] = Field(default_factory=list)
+    scrapeResults: Optional[dict[str, list]] = Field(None, alias="scrapeResults")  # Replaces only the given sources
+
+
+_RUN_RESULTS_ARRAY = "CASE WHEN jsonb_typeof(results) = 'array' THEN results ELSE '[]'::jsonb END"
+
+@app.patch("/runs/{run_id}")
+def patch_run(run_id: str, patch: RunPatch, db: Session = Depends(get_db)):
+    """
+    Partial run update: plain columns, single result elements and individual scrape sources are
+    rewritten in place with jsonb_set, so a save ships only what changed. Returns the new version.
+    """
+    # Lock the row and resolve deviceIds to array positions server-side (only ids leave the DB).
+    current = db.execute(
+        text(
+            "SELECT version, jsonb_array_length(" + _RUN_RESULTS_ARRAY + ") AS n, "
+            "(SELECT COALESCE(jsonb_object_agg(e.v->>'deviceId', e.ord - 1), '{}'::jsonb) "
+            " FROM jsonb_array_elements(" + _RUN_RESULTS_ARRAY + ") WITH ORDINALITY e(v, ord) "
+            " WHERE e.v ? 'deviceId') AS positions "
+            "FROM runs WHERE id = :id FOR UPDATE"
+        ),
+        {"id": run_id},
+    ).first()
+    if not current:
+        raise HTTPException(status_code=404, detail="Run not found")
+    if patch.version is not None and patch.version != current.version:
+        raise HTTPException(
+            status_code=409,
+            detail={"message": "Run was modified by another save", "version": current.version},
+        )
+
+    sets = ["version = version + 1"]
+    params: dict[str, Any] = {"id": run_id}
+    for field, column in (("name", "name"), ("status", "status"), ("feedbackSubmitted", "feedback_submitted")):
+        value = getattr(patch, field)
+        if value is not None:
+            sets.append(f"{column} = :{column}")
+            params[column] = value
+    if patch.completedAt:
+        sets.append("completed_at = :completed_at")
+        params["completed_at"] = datetime.fromisoformat(patch.completedAt.replace('Z', '+00:00'))
+
+    if patch.results:
+        expr = _RUN_RESULTS_ARRAY
+        positions = dict(current.positions or {})
+        length = current.n
+        for i, item in enumerate(patch.results):
+            pos = item.index if item.index is not None else positions.get(item.deviceId)
+            params[f"r{i}"] = json.dumps(item.result)
+            if pos is None:
+                expr = f"({expr} || jsonb_build_array(CAST(:r{i} AS JSONB)))"
+                positions[item.deviceId] = length
+                length += 1
+            elif pos >= length:
+                raise HTTPException(status_code=400, detail=f"Result index {pos} out of range ({length} results)")
+            else:
+                expr = f"jsonb_set({expr}, ARRAY[CAST(:p{i} AS TEXT)], CAST(:r{i} AS JSONB))"
+                params[f"p{i}"] = pos
+        sets.append(f"results = {expr}")
+
+    if patch.scrapeResults:
+        expr = "CASE WHEN jsonb_typeof(scrape_results) = 'object' THEN scrape_results ELSE '{}'::jsonb END"
+        for i, (source, rows) in enumerate(patch.scrapeResults.items()):
+            expr = f"jsonb_set({expr}, ARRAY[CAST(:s{i} AS TEXT)], CAST(:sr{i} AS JSONB))"
+            params[f"s{i}"] = source
+            params[f"sr{i}"] = json.dumps(rows)
+        sets.append(f"scrape_results = {expr}")
+
+    version = db.execute(
+        text("UPDATE runs SET " + ", ".join(sets) + " WHERE id = :id RETURNING version"), params
+    ).scalar_one()
+    db.commit()
+    _invalidate_run_reads(run_id)
+    return {"status": "ok", "version": version}
+
 @app.delete("/runs/{run_id}")
-def delete_run(run_id: str, db: Session = Depends(get_db)):
-    run = db.query(RunModel).filter(RunModel.id == run_id).first()
-    if run:
-        db.delete(run)
-        db.commit()
+async def delete_run(run_id: str, db: AsyncSession = Depends(get_async_db)):
+    await db.execute(delete(RunModel).where(RunModel.id == run_id))
+    await db.commit()
+    _invalidate_run_reads(run_id)
     return {"status": "ok"}
 
 
+# Rows per INSERT statement in POST /kb (one round-trip per batch).
+KB_INSERT_BATCH_SIZE = 500
+
 class KBEntryCreate(BaseModel):
     id: str
     brand: str
@@ -1681,6 +3006,8 @@ class KBEntryCreate(BaseModel):
     recommendedPrice: int = Field(alias="recommendedPrice")
     humanApprovedPrice: int = Field(alias="humanApprovedPrice")
     delta: int
+    # Price before the KB correction (kbCorrection.base_price); corrections learn from human - basePrice.
+    basePrice: Optional[int] = Field(None, alias="basePrice")
     velocityCategory: str = Field(alias="velocityCategory")
     humanVelocityOverride: Optional[str] = Field(None, alias="humanVelocityOverride")
     feedbackNote: Optional[str] = Field(None, alias="feedbackNote")
@@ -1688,9 +3015,19 @@ class KBEntryCreate(BaseModel):
     createdAt: str = Field(alias="createdAt")
 
 @app.get("/kb")
-def get_kb_entries(db: Session = Depends(get_db)):
-    entries = db.query(KnowledgeBaseEntryModel).order_by(KnowledgeBaseEntryModel.created_at.desc()).all()
-    return [{
+async def get_kb_entries(request: Request, db: AsyncSession = Depends(get_async_db)):
+    async def version() -> int:
+        return await _data_version(db, "knowledge_base")
+
+    async def load() -> tuple[list[dict[str, Any]], dict[str, str]]:
+        entries = await db.scalars(select(KnowledgeBaseEntryModel).order_by(KnowledgeBaseEntryModel.created_at.desc()))
+        return [_kb_entry_to_dict(e) for e in entries], {}
+
+    return await read_cache_helper.cache.respond(request, "kb:list", "kb", version, load)
+
+
+def _kb_entry_to_dict(e: KnowledgeBaseEntryModel) -> dict[str, Any]:
+    return {
         "id": e.id,
         "brand": e.brand,
         "model": e.model,
@@ -1700,35 +3037,133 @@ def get_kb_entries(db: Session = Depends(get_db)):
         "recommendedPrice": e.recommended_price,
         "humanApprovedPrice": e.human_approved_price,
         "delta": e.delta,
+        "basePrice": e.base_price,
         "velocityCategory": e.velocity_category,
         "humanVelocityOverride": e.human_velocity_override,
         "feedbackNote": e.feedback_note,
         "runId": e.run_id,
         "createdAt": e.created_at.isoformat() if e.created_at else None
-    } for e in entries]
+    }
 
 @app.post("/kb")
-def create_kb_entries(entries: list[KBEntryCreate], db: Session = Depends(get_db)):
-    for e in entries:
-        existing = db.query(KnowledgeBaseEntryModel).filter(KnowledgeBaseEntryModel.id == e.id).first()
-        if not existing:
-            new_entry = KnowledgeBaseEntryModel(
-                id=e.id,
-                brand=e.brand,
-                model=e.model,
-                ram=e.ram,
-                storage=e.storage,
-                condition_tier=e.conditionTier,
-                recommended_price=e.recommendedPrice,
-                human_approved_price=e.humanApprovedPrice,
-                delta=e.delta,
-                velocity_category=e.velocityCategory,
-                human_velocity_override=e.humanVelocityOverride,
-                feedback_note=e.feedbackNote,
-                run_id=e.runId,
-                created_at=datetime.fromisoformat(e.createdAt.replace('Z', '+00:00')) if e.createdAt else None
+async def create_kb_entries(entries: list[KBEntryCreate], db: AsyncSession = Depends(get_async_db)):
+    """
+    Insert entries in batches of KB_INSERT_BATCH_SIZE; ids that already exist are skipped.
+    New entries update the per brand / model / condition price corrections used when pricing
+    and are added to this process's neighbour index for instant estimates.
+    """
+    table = KnowledgeBaseEntryModel.__table__
+    new_rows = []
+    for start in range(0, len(entries), KB_INSERT_BATCH_SIZE):
+        rows = [
+            {
+                "id": e.id,
+                "brand": e.brand,
+                "model": e.model,
+                "ram": e.ram,
+                "storage": e.storage,
+                "condition_tier": e.conditionTier,
+                "recommended_price": e.recommendedPrice,
+                "human_approved_price": e.humanApprovedPrice,
+                "delta": e.delta,
+                "base_price": e.basePrice,
+                "velocity_category": e.velocityCategory,
+                "human_velocity_override": e.humanVelocityOverride,
+                "feedback_note": e.feedbackNote,
+                "run_id": e.runId,
+                "created_at": datetime.fromisoformat(e.createdAt.replace('Z', '+00:00')) if e.createdAt else func.now(),
+            }
+            for e in entries[start:start + KB_INSERT_BATCH_SIZE]
+        ]
+        stmt = (
+            pg_insert(table)
+            .values(rows)
+            .on_conflict_do_nothing(index_elements=["id"])
+            .returning(
+                table.c.id, table.c.brand, table.c.model, table.c.ram, table.c.storage, table.c.condition_tier,
+                table.c.human_approved_price, table.c.recommended_price, table.c.base_price, table.c.delta,
+                table.c.created_at,
             )
-            db.add(new_entry)
-    db.commit()
-    return {"status": "ok", "added": len(entries)}
+        )
+        inserted = (await db.execute(stmt)).all()
+        # Only newly inserted reviews feed the running corrections, in the same transaction.
+        await db.run_sync(
+            kb_corrections_helper.record_deltas,
+            [
+                (
+                    r.brand, r.model, r.condition_tier,
+                    kb_corrections_helper.review_delta(r.human_approved_price, r.recommended_price, r.base_price),
+                )
+                for r in inserted
+            ],
+        )
+        new_rows.extend(inserted)
+    await db.commit()
+    read_cache_helper.cache.invalidate("kb:")
+    kb_index_helper.index.add_rows(new_rows)
+    added = len(new_rows)
+    return {"status": "ok", "added": added, "skipped": len(entries) - added}
+
+
+class KBEstimateDevice(BaseModel):
+    id: Optional[str] = Field(None, max_length=100)
+    brand: str = Field("", max_length=100)
+    model: str = Field(..., min_length=1, max_length=200)
+    storage_gb: str = Field("", max_length=20)
+    ram_gb: str = Field("", max_length=20)
+    condition_tier: str = Field("", max_length=20)
+
+
+class KBEstimateRequest(BaseModel):
+    devices: list[KBEstimateDevice] = Field(..., min_length=1, max_length=ANALYZE_DEVICES_MAX_ITEMS)
+    k: int = Field(5, ge=1, le=50)
+
+
+@app.post("/kb/estimate")
+async def estimate_from_kb(req: KBEstimateRequest, db: AsyncSession = Depends(get_async_db)):
+    """
+    Instant price estimates from the k nearest human-approved KB prices (in-memory index, no scrape
+    or LLM call). Each result carries the neighbours with their distances and a confidence level.
+    """
+    await db.run_sync(kb_index_helper.index.refresh)
+    return {
+        "results": [
+            {"id": d.id, **kb_index_helper.index.estimate(d.brand, d.model, d.ram_gb, d.storage_gb, d.condition_tier, req.k)}
+            for d in req.devices
+        ],
+        "indexed": len(kb_index_helper.index),
+    }
+
+
+@app.get("/listings/latest")
+def get_latest_listings(
+    model: str = Query(..., min_length=1, max_length=200),
+    storage_gb: Optional[int] = Query(None, ge=1),
+    ram_gb: Optional[int] = Query(None, ge=1),
+    source: Optional[str] = Query(None, max_length=50),
+    max_age_days: Optional[float] = Query(None, gt=0, description="Ignore listings older than this."),
+    db: Session = Depends(get_db),
+):
+    """Most recent scraped price per (source, condition) for a device config, across all runs."""
+    return listings_helper.latest_prices(
+        db,
+        model,
+        storage_gb=storage_gb,
+        ram_gb=ram_gb,
+        source=source,
+        max_age=timedelta(days=max_age_days) if max_age_days else None,
+    )
+
+
+@app.get("/trends")
+def get_trends(
+    model: str = Query(..., min_length=1, max_length=200),
+    storage_gb: Optional[int] = Query(None, ge=0, description="0 = listings that did not state storage."),
+    ram_gb: Optional[int] = Query(None, ge=0, description="0 = listings that did not state RAM."),
+    source: Optional[str] = Query(None, max_length=50),
+    days: int = Query(90, ge=1, le=730),
+    db: Session = Depends(get_db),
+):
+    """Daily min / median / p90 / max listing price per source and config, from precomputed rollups."""
+    return trends_helper.get_trends(db, model, storage_gb=storage_gb, ram_gb=ram_gb, source=source, days=days)
 
@@ -1,8 +1,28 @@
+import functools
 import json
 import os
+import time
 from typing import Any, Dict, Optional
 
-import boto3
+import cassette_helper
+import fakes_helper
+import llm_usage_helper
+import metrics_helper
+
+
+@functools.lru_cache(maxsize=None)
+def _bedrock_client(region: str) -> Any:
+    # boto3 is imported on first use (it adds hundreds of ms to a cold import) and the client is
+    # reused: building one per call re-reads credentials and the service model every time.
+    if cassette_helper.replaying():
+        return cassette_helper.bedrock_runtime()
+    if fakes_helper.enabled("bedrock"):
+        client = fakes_helper.bedrock_runtime()
+    else:
+        import boto3
+
+        client = boto3.client("bedrock-runtime", region_name=region)
+    return cassette_helper.bedrock_runtime(client) if cassette_helper.recording() else client
 
 
 def analyze_with_bedrock(
@@ -14,18 +34,25 @@ def analyze_with_bedrock(
     region: Optional[str] = None,
     max_tokens: int = 800,
     temperature: float = 0.2,
+    caller: str = "",
 ) -> str:
     """
     Runs a short analysis of the scraped devices using AWS Bedrock.
 
     Credentials/region are resolved by boto3 (env vars, config files, IAM role, etc.).
     This implementation always uses invoke_model (no Converse API), as requested.
+    Token usage, latency and cost are recorded against the current llm_usage_helper scope,
+    labelled with `caller`.
     """
     # Treat Swagger's default "string" as unset.
     if model_id == "string":
         model_id = None
 
     model_id = model_id or os.getenv("BEDROCK_MODEL_ID") or os.getenv("AWS_BEDROCK_MODEL_ID")
+    if not model_id and cassette_helper.replaying():
+        model_id = cassette_helper.recorded_model_id()
+    if not model_id and fakes_helper.enabled("bedrock"):
+        model_id = fakes_helper.FAKE_BEDROCK_MODEL_ID
     if not model_id:
         raise RuntimeError(
             "Missing Bedrock model id. Set BEDROCK_MODEL_ID (or pass model_id in request)."
@@ -50,7 +77,7 @@ def analyze_with_bedrock(
         "Return a concise analysis in bullet points."
     )
 
-    client = boto3.client("bedrock-runtime", region_name=region)
+    client = _bedrock_client(region)
 
     # Use invoke_model with an Anthropic-compatible payload for Claude models.
     if model_id.startswith("anthropic."):
@@ -61,14 +88,21 @@ def analyze_with_bedrock(
             "system": system_prompt,
             "messages": [{"role": "user", "content": prompt}],
         }
-        resp = client.invoke_model(
-            modelId=model_id,
-            body=json.dumps(body, ensure_ascii=False).encode("utf-8"),
-            contentType="application/json",
-            accept="application/json",
-        )
-        raw = resp["body"].read()
+        start, outcome = time.perf_counter(), "error"
+        try:
+            resp = client.invoke_model(
+                modelId=model_id,
+                body=json.dumps(body, ensure_ascii=False).encode("utf-8"),
+                contentType="application/json",
+                accept="application/json",
+            )
+            raw = resp["body"].read()
+            outcome = "ok"
+        finally:
+            elapsed = time.perf_counter() - start
+            metrics_helper.BEDROCK_SECONDS.observe(elapsed, model=model_id, outcome=outcome)
         data = json.loads(raw)
+        llm_usage_helper.record(model_id, data.get("usage"), elapsed * 1000, caller=caller)
         # Anthropic responses typically contain: {"content":[{"type":"text","text":"..."}], ...}
         content = data.get("content") or []
         if content and isinstance(content, list) and isinstance(content[0], dict):
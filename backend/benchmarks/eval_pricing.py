@@ -0,0 +1,388 @@
+"""
+Pricing accuracy against latency and cost: replays approved knowledge-base entries through alternative strategies.
+
+    python benchmarks/eval_pricing.py [--limit 200] [--strategies recorded,llm,batched,rules,knn] [--out eval.json]
+
+Ground truth is knowledge_base.human_approved_price. Each entry is priced from cached listings, never by
+scraping: the listings its own run scraped, else the latest scrape of its brand + model within
+--listings-max-age-days. Entries without any are skipped, so every strategy is scored on the same devices.
+
+    recorded      recommended_price stored with the entry (what the pipeline said at the time)
+    llm           the job's pricing prompt (app._run_bedrock_only), one Bedrock call per device
+    batched       one Bedrock call for up to --batch-size devices priced from the same scrape, listings sent once
+    rules         local rules: median listing price for the storage / RAM, adjusted for condition (no LLM)
+    knn           the instant-estimate kNN over approved prices (kb_index_helper)
+    <base>+corr   <base> shifted by the reviewers' mean correction for brand / model / condition (kb_corrections_helper);
+                  not for recorded, whose stored price may already include the correction in effect at the time
+
+knn and the corrections only see entries created before the one being priced, so no entry is scored against
+itself. Corrections learn from the approved price minus the uncorrected base price, as the live pipeline does
+(kb_corrections_helper.review_delta). The report gives coverage, MAE, MAPE and the share within 5% of the approved price next to latency
+(p50 per device, and Bedrock time per device once batches are shared out), tokens and cost per device.
+Velocity signals are not cached and are left out of the prompts. Network and warranty are not in the KB
+and are sent as "unknown".
+
+Bedrock strategies call BEDROCK_MODEL_ID. Use FAKE_SERVICES=bedrock to check the harness offline, or
+CASSETTE_MODE=record / replay (cassette_helper) to score a recorded run again at no cost.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text  # noqa: E402
+
+import app  # noqa: E402
+import kb_corrections_helper  # noqa: E402
+import kb_index_helper  # noqa: E402
+import listings_helper  # noqa: E402
+import llm_usage_helper  # noqa: E402
+from bedrock_helper import analyze_with_bedrock  # noqa: E402
+from database import SessionLocal  # noqa: E402
+
+BASE_STRATEGIES = ("recorded", "llm", "batched", "rules", "knn")
+# Price change per condition step (like new / good / fair / poor) when no listing has the device's condition.
+RULES_CONDITION_STEP = 0.08
+
+BATCH_INSTRUCTIONS = (
+    "You are Budli's Pricing Intelligence AI.\n\n"
+    "You receive:\n"
+    "- Several devices, each starting with \"Device id:\" and its attributes (brand, model, storage, condition, warranty, RAM, network type)\n"
+    "- Scraped listings from Ovantica, ReFit Global, and/or Cashify, shared by all the devices. Each listing has: Storage, Model, Ram, Color, Condition, Price, source. Match each device to listings by config (storage, model, ram, color, condition).\n\n"
+    "Exactly map each device to the scraped data. Do NOT use medians, means, or averages.\n\n"
+    "Return ONLY a JSON array with one object per device, in the order given, with these fields:\n\n"
+    "1. id: the device id.\n"
+    "2. recommended_price: number or null. Use the price from a matching scraped listing when you find one (same/similar config). If no listing matches the device, set recommended_price to null.\n"
+    "3. explanation: string. When you have a match, briefly state which listing(s) you used. When there is no matching scraped data, set explanation to exactly: \"No data found.\"\n"
+    "4. risk_flags: array of strings (e.g. [\"No matching config\", \"Data sparse\"]). Include \"No matching data\" when recommended_price is null.\n\n"
+    "Rules:\n"
+    "- Only recommend a price that comes directly from a scraped listing that matches (or closely matches) the device.\n"
+    "- If no scraped listing matches the device, set recommended_price to null and explanation to \"No data found.\"\n"
+)
+
+
+@dataclass
+class Case:
+    id: str
+    brand: str
+    model: str
+    ram: str
+    storage: str
+    condition: str
+    approved: int
+    recorded: int
+    base_price: Optional[int]
+    run_id: Optional[str]
+    created_at: Optional[datetime]
+    listings: list[dict[str, Any]] = field(default_factory=list)
+
+    @property
+    def query(self) -> str:
+        return " ".join(x for x in [self.brand, self.model] if x)
+
+
+@dataclass
+class Priced:
+    price: Optional[float]
+    seconds: float = 0.0
+    calls: list[dict[str, Any]] = field(default_factory=list)
+    # Fraction of `calls` / `seconds` owed by this device (1 / batch size for batched calls).
+    share: float = 1.0
+
+
+def _number(value: Any) -> Optional[float]:
+    try:
+        return float(str(value).replace(",", "").replace("₹", "")) if value not in (None, "") else None
+    except ValueError:
+        return None
+
+
+# --- loading ---
+
+def _load_cases(db: Any, args: argparse.Namespace) -> tuple[list[Case], int]:
+    rows = db.execute(
+        text(
+            "SELECT id, brand, model, ram, storage, condition_tier, human_approved_price, recommended_price, base_price, run_id, created_at "
+            "FROM knowledge_base WHERE human_approved_price > 0" + (" AND created_at >= :since" if args.since else "")
+            + " ORDER BY created_at, id" + (" LIMIT :limit" if args.limit else "")
+        ),
+        {"since": args.since, "limit": args.limit},
+    ).all()
+    max_age = timedelta(days=args.listings_max_age_days)
+    cases, skipped = [], 0
+    for r in rows:
+        case = Case(r.id, r.brand or "", r.model, r.ram or "", r.storage or "", r.condition_tier or "",
+                    int(r.human_approved_price), int(r.recommended_price or 0), r.base_price, r.run_id, r.created_at)
+        case.listings = _listings_for(db, case, max_age)
+        if case.listings:
+            cases.append(case)
+        else:
+            skipped += 1
+    return cases, skipped
+
+
+def _listings_for(db: Any, case: Case, max_age: timedelta) -> list[dict[str, Any]]:
+    listings = listings_helper.for_run(db, case.run_id, case.query) if case.run_id else []
+    return listings or listings_helper.recent_for_query(db, case.query, max_age)
+
+
+# --- strategies ---
+
+def _device_fields(case: Case) -> str:
+    # Same shape as the job's query string (network and warranty are not recorded in the KB).
+    return (
+        f"Brand: {case.brand}\nModel: {case.model}\nStorage: {listings_helper.parse_gb(case.storage) or case.storage}GB\n"
+        f"RAM: {listings_helper.parse_gb(case.ram) or case.ram}GB\nNetwork: unknown\nCondition: {case.condition}\nWarranty: unknown months\n"
+    )
+
+
+def _bedrock_rows(listings: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Cached listings in the shape the job sends to Bedrock (BrowserScrapeDevice fields + source)."""
+    return [
+        {
+            "Storage": f"{r['storage_gb']}GB" if r["storage_gb"] else "",
+            "Model": r["model"] or "",
+            "Ram": f"{r['ram_gb']}GB" if r["ram_gb"] else "",
+            "Color": r["color"] or "",
+            "Condition": r["condition"] or "",
+            "Price": f"₹{r['price']:,}",
+            "source": r["source"],
+        }
+        for r in listings
+    ]
+
+
+def price_recorded(case: Case) -> Priced:
+    return Priced(case.recorded or None)
+
+
+def price_llm(case: Case) -> Priced:
+    calls: list[dict[str, Any]] = []
+    start = time.perf_counter()
+    with llm_usage_helper.scope(calls, device_id=case.id):
+        price, *_ = app._run_bedrock_only(0, "Device Input:\n" + _device_fields(case), _bedrock_rows(case.listings), [])
+    return Priced(_number(price), time.perf_counter() - start, calls)
+
+
+def _strip_fences(raw: str) -> str:
+    lines = raw.strip().split("\n")
+    if lines and lines[0].startswith("```"):
+        lines = lines[1:]
+    if lines and lines[-1].strip() == "```":
+        lines = lines[:-1]
+    return "\n".join(lines)
+
+
+def price_batch(batch: list[Case]) -> dict[str, Priced]:
+    calls: list[dict[str, Any]] = []
+    start = time.perf_counter()
+    answers: dict[str, Any] = {}
+    try:
+        with llm_usage_helper.scope(calls, device_id="batch"):
+            raw = analyze_with_bedrock(
+                devices=_bedrock_rows(batch[0].listings),
+                query="\n".join(f"Device id: {c.id}\n{_device_fields(c)}" for c in batch),
+                instructions=BATCH_INSTRUCTIONS,
+                max_tokens=200 + 150 * len(batch),
+                temperature=0.1,
+                caller="pricing_batch",
+            )
+        parsed = json.loads(_strip_fences(raw))
+        answers = {str(a.get("id")): a.get("recommended_price") for a in parsed if isinstance(a, dict)}
+    except Exception as e:
+        print(f"batch of {len(batch)} ({batch[0].query}) failed: {e}", file=sys.stderr)
+    seconds = time.perf_counter() - start
+    return {c.id: Priced(_number(answers.get(c.id)), seconds, calls, 1 / len(batch)) for c in batch}
+
+
+def price_rules(case: Case) -> Priced:
+    """Median listing price for the device's storage (and RAM when listed), condition-adjusted."""
+    start = time.perf_counter()
+    storage, ram = listings_helper.parse_gb(case.storage), listings_helper.parse_gb(case.ram)
+    pool = [r for r in case.listings if r["price"] and (storage is None or r["storage_gb"] == storage)]
+    pool = [r for r in pool if ram is not None and r["ram_gb"] == ram] or pool
+    if not pool:
+        return Priced(None, time.perf_counter() - start)
+    rank = kb_index_helper.condition_rank(case.condition)
+    same = [r["price"] for r in pool if rank is not None and kb_index_helper.condition_rank(r["condition"]) == rank]
+    if same:
+        price = statistics.median(same)
+    elif rank is None:
+        price = statistics.median(r["price"] for r in pool)
+    else:
+        ranked = [(r["price"], kb_index_helper.condition_rank(r["condition"])) for r in pool]
+        adjusted = [p * (1 + RULES_CONDITION_STEP * (lr - rank)) for p, lr in ranked if lr is not None]
+        price = statistics.median(adjusted or [p for p, _ in ranked])
+    return Priced(round(price), time.perf_counter() - start)
+
+
+def _walk_kb(cases: list[Case], bases: dict[str, dict[str, Priced]]) -> dict[str, dict[str, Priced]]:
+    """knn and the +corr variants, walking entries in created_at order so each sees only earlier reviews."""
+    index = kb_index_helper.KBNeighborIndex()
+    deltas: dict[tuple[str, str, str], list[float]] = {}
+    out: dict[str, dict[str, Priced]] = {"knn": {}, **{f"{name}+corr": {} for name in bases}}
+    for case in sorted(cases, key=lambda c: (c.created_at or datetime.min.replace(tzinfo=timezone.utc), c.id)):
+        start = time.perf_counter()
+        est = index.estimate(case.brand, case.model, case.ram, case.storage, case.condition)
+        out["knn"][case.id] = Priced(est["estimate"], time.perf_counter() - start)
+
+        brand, model, condition = kb_corrections_helper.correction_key(case.brand, case.model, case.condition)
+        # Like kb_corrections_helper.lookup: the exact brand first, then reviews saved without one.
+        history = deltas.get((brand, model, condition)) or deltas.get(("", model, condition)) or []
+        shift = kb_corrections_helper.adjustment(len(history), statistics.fmean(history)) if history else 0
+        for name, priced in bases.items():
+            base = priced.get(case.id)
+            if base is not None:
+                out[f"{name}+corr"][case.id] = Priced(
+                    base.price + shift if base.price is not None else None, base.seconds, base.calls, base.share
+                )
+
+        index.add_rows([_KBRow(case)])
+        deltas.setdefault((brand, model, condition), []).append(
+            kb_corrections_helper.review_delta(case.approved, case.recorded, case.base_price)
+        )
+    return out
+
+
+class _KBRow:
+    def __init__(self, case: Case) -> None:
+        self.id, self.brand, self.model, self.ram, self.storage = case.id, case.brand, case.model, case.ram, case.storage
+        self.condition_tier, self.human_approved_price, self.created_at = case.condition, case.approved, case.created_at
+
+
+# --- scoring ---
+
+def _percentile(values: list[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, round(q / 100 * len(values) + 0.5) - 1))]
+
+
+def score(cases: list[Case], priced: dict[str, Priced]) -> dict[str, Any]:
+    errors, apes, waits, shared_seconds = [], [], [], 0.0
+    tokens_in = tokens_out = cost = 0.0
+    for case in cases:
+        p = priced.get(case.id)
+        if p is None:
+            continue
+        waits.append(p.seconds * 1000)
+        shared_seconds += p.seconds * p.share
+        tokens_in += sum(c["input_tokens"] + c["cache_creation_input_tokens"] + c["cache_read_input_tokens"] for c in p.calls) * p.share
+        tokens_out += sum(c["output_tokens"] for c in p.calls) * p.share
+        cost += sum(c["cost_usd"] for c in p.calls) * p.share
+        if p.price is not None:
+            errors.append(abs(p.price - case.approved))
+            apes.append(abs(p.price - case.approved) / case.approved)
+    n = len(cases)
+    return {
+        "devices": n,
+        "priced": len(errors),
+        "coverage": round(len(errors) / n, 4) if n else None,
+        "mae": round(statistics.fmean(errors), 1) if errors else None,
+        "mape_pct": round(statistics.fmean(apes) * 100, 2) if apes else None,
+        "median_ape_pct": round(statistics.median(apes) * 100, 2) if apes else None,
+        "within_5pct": round(sum(a <= 0.05 for a in apes) / len(apes), 4) if apes else None,
+        "latency_ms_p50": round(_percentile(waits, 50), 1) if waits else None,
+        "latency_ms_p95": round(_percentile(waits, 95), 1) if waits else None,
+        "ms_per_device": round(shared_seconds * 1000 / n, 1) if n else None,
+        "input_tokens_per_device": round(tokens_in / n, 1) if n else None,
+        "output_tokens_per_device": round(tokens_out / n, 1) if n else None,
+        "cost_usd_per_device": round(cost / n, 6) if n else None,
+    }
+
+
+def _run_parallel(fn: Callable[[Any], Any], items: list[Any], concurrency: int) -> list[Any]:
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(fn, items))
+
+
+def _fmt(v: Any, spec: str) -> str:
+    return "-" if v is None else format(v, spec)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--limit", type=int, help="evaluate at most this many entries (oldest first)")
+    parser.add_argument("--since", type=datetime.fromisoformat, help="only entries created at or after this ISO date")
+    parser.add_argument("--strategies", default=",".join(BASE_STRATEGIES), help="comma-separated subset of " + ",".join(BASE_STRATEGIES))
+    parser.add_argument("--batch-size", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=4, help="Bedrock calls in flight")
+    parser.add_argument("--listings-max-age-days", type=float, default=30)
+    parser.add_argument("--out", help="write the summary (and per-device prices) as JSON")
+    args = parser.parse_args()
+    strategies = [s.strip() for s in args.strategies.split(",") if s.strip()]
+    unknown = set(strategies) - set(BASE_STRATEGIES)
+    if unknown:
+        parser.error(f"unknown strategies: {', '.join(sorted(unknown))}")
+
+    db = SessionLocal()
+    try:
+        cases, skipped = _load_cases(db, args)
+    finally:
+        db.close()
+    print(f"{len(cases)} KB entries with cached listings ({skipped} skipped without)")
+    if not cases:
+        return 1
+
+    bases: dict[str, dict[str, Priced]] = {}
+    if "recorded" in strategies:
+        bases["recorded"] = {c.id: price_recorded(c) for c in cases}
+    if "rules" in strategies:
+        bases["rules"] = {c.id: price_rules(c) for c in cases}
+    if "llm" in strategies:
+        bases["llm"] = dict(zip((c.id for c in cases), _run_parallel(price_llm, cases, args.concurrency)))
+    if "batched" in strategies:
+        # A batch shares one listings table, so it only holds devices priced from the same scrape.
+        groups: dict[tuple, list[Case]] = {}
+        for c in cases:
+            scrape = tuple(sorted({(r["source"], r["run_id"] or "", r["scraped_at"] or "") for r in c.listings}))
+            groups.setdefault((listings_helper.canonical_model(c.query), scrape), []).append(c)
+        batches = [g[i:i + args.batch_size] for g in groups.values() for i in range(0, len(g), args.batch_size)]
+        bases["batched"] = {k: v for part in _run_parallel(price_batch, batches, args.concurrency) for k, v in part.items()}
+    # recorded may already carry a correction, so correcting it again would count that correction twice.
+    derived = _walk_kb(cases, {name: priced for name, priced in bases.items() if name != "recorded"})
+    results = {**bases, **({"knn": derived["knn"]} if "knn" in strategies else {}),
+               **{k: v for k, v in derived.items() if k.endswith("+corr")}}
+
+    summary = {name: score(cases, priced) for name, priced in results.items()}
+    print(f"\n{'strategy':16} {'cover':>6} {'MAE ₹':>8} {'MAPE %':>7} {'≤5%':>6} {'p50 ms':>8} {'ms/dev':>8} "
+          f"{'in tok':>7} {'out tok':>7} {'$/device':>9}")
+    for name, s in summary.items():
+        print(
+            f"{name:16} {_fmt(s['coverage'], '6.1%')} {_fmt(s['mae'], '8.0f')} {_fmt(s['mape_pct'], '7.2f')} "
+            f"{_fmt(s['within_5pct'], '6.1%')} {_fmt(s['latency_ms_p50'], '8.1f')} {_fmt(s['ms_per_device'], '8.1f')} "
+            f"{_fmt(s['input_tokens_per_device'], '7.0f')} {_fmt(s['output_tokens_per_device'], '7.0f')} {_fmt(s['cost_usd_per_device'], '9.5f')}"
+        )
+
+    if args.out:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({
+                "meta": {
+                    "commit": commit, "at": datetime.now(timezone.utc).isoformat(),
+                    "model_id": os.getenv("BEDROCK_MODEL_ID"), "devices": len(cases), "skipped": skipped,
+                    "args": {k: v for k, v in vars(args).items() if k != "out"},
+                },
+                "strategies": summary,
+                "devices": [
+                    {"id": c.id, "model": c.model, "storage": c.storage, "condition": c.condition, "approved": c.approved,
+                     "prices": {name: priced[c.id].price for name, priced in results.items() if c.id in priced}}
+                    for c in cases
+                ],
+            }, f, indent=1, default=str)
+        print(f"\nwrote {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,526 @@
+"""
+Load test for the job and data endpoints against the API running with offline fakes.
+
+    python benchmarks/loadtest.py --duration 60 --rates analyze=0.5,csv=0.2,runs=20,kb=10 --out lt.json
+    python benchmarks/loadtest.py --url http://localhost:8000 --compare lt-main.json
+
+Starts `uvicorn app:app` with FAKE_SERVICES=all (fakes_helper; pass knobs with --fake-env, e.g.
+FAKE_BEDROCK_ERROR_RATE=0.02) unless --url points at a running instance. The test writes synthetic runs and
+approved KB prices, which feed the KB corrections and instant estimates, so it needs a scratch database named
+explicitly with --database-url (or LOADTEST_DATABASE_URL); DATABASE_URL is never used. The started server runs
+on it; with --url it must be the database that server uses. When the test ends, the runs and KB entries it
+wrote (ids and names starting with its lt-<timestamp> tag), those runs' listings and the run-less listings
+scraped since it started (/analyze-csv) are deleted and the KB
+corrections and trend rollups rebuilt, unless --keep-data. Each scenario gets open-loop Poisson arrivals at its rate (per second), so a slow server
+builds a backlog instead of slowing the offered load:
+
+    analyze  POST /analyze-devices/start (--devices per job, written to a run), then status polls until done
+    csv      POST /analyze-csv with --csv-rows rows
+    runs     GET /runs (70%), GET /runs/{id} (20%), POST /runs (10%)
+    kb       GET /kb (85%), POST /kb/estimate (10%), POST /kb (5%)
+
+Reports per endpoint throughput, p50/p95/p99 latency and error rate, plus the server's event-loop lag
+and resident memory (from /metrics) and the load generator's own loop lag (if that is high, the
+client is the bottleneck). --out saves everything as JSON; --compare prints the change against a
+previous result.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Optional
+
+import httpx
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_MODELS = [("Apple", "iPhone 13"), ("Apple", "iPhone 12"), ("Apple", "iPhone 14 Plus"), ("Samsung", "Galaxy S21 FE"),
+           ("OnePlus", "9R"), ("Google", "Pixel 7"), ("Xiaomi", "Redmi Note 12 Pro")]
+_CONDITIONS = ["Excellent", "Good", "Fair"]
+
+
+def _percentile(sorted_values: list[float], q: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, max(0, round(q / 100 * len(sorted_values) + 0.5) - 1))]
+
+
+class Recorder:
+    def __init__(self) -> None:
+        self.samples: dict[str, list[tuple[float, bool]]] = {}
+        self.errors: dict[str, dict[str, int]] = {}
+
+    def add(self, endpoint: str, seconds: float, ok: bool, error: str = "") -> None:
+        self.samples.setdefault(endpoint, []).append((seconds, ok))
+        if not ok:
+            counts = self.errors.setdefault(endpoint, {})
+            counts[error or "error"] = counts.get(error or "error", 0) + 1
+
+    def summary(self, elapsed: float) -> dict[str, Any]:
+        out = {}
+        for endpoint, samples in sorted(self.samples.items()):
+            ok_ms = sorted(s * 1000 for s, ok in samples if ok)
+            errors = sum(1 for _, ok in samples if not ok)
+            out[endpoint] = {
+                "requests": len(samples),
+                "errors": errors,
+                "error_rate": round(errors / len(samples), 4),
+                "throughput_rps": round((len(samples) - errors) / elapsed, 3),
+                "latency_ms": {
+                    "p50": _round(_percentile(ok_ms, 50)),
+                    "p95": _round(_percentile(ok_ms, 95)),
+                    "p99": _round(_percentile(ok_ms, 99)),
+                    "max": _round(ok_ms[-1] if ok_ms else None),
+                    "mean": _round(sum(ok_ms) / len(ok_ms) if ok_ms else None),
+                },
+                **({"error_kinds": self.errors[endpoint]} if endpoint in self.errors else {}),
+            }
+        return out
+
+
+def _round(v: Optional[float]) -> Optional[float]:
+    return round(v, 1) if v is not None else None
+
+
+async def _timed(rec: Recorder, endpoint: str, request: Awaitable[httpx.Response], ok_status: tuple[int, ...] = (200,)) -> Optional[httpx.Response]:
+    start = time.perf_counter()
+    try:
+        resp = await request
+    except Exception as e:
+        rec.add(endpoint, time.perf_counter() - start, False, type(e).__name__)
+        return None
+    ok = resp.status_code in ok_status
+    rec.add(endpoint, time.perf_counter() - start, ok, "" if ok else f"HTTP {resp.status_code}")
+    return resp if ok else None
+
+
+def _device(rng: random.Random, i: int) -> dict[str, str]:
+    brand, model = rng.choice(_MODELS)
+    return {
+        "id": f"d{i}", "brand": brand, "model": model, "storage_gb": rng.choice(["64", "128", "256"]),
+        "ram_gb": rng.choice(["4", "6", "8"]), "network_type": "5G", "condition_tier": rng.choice(_CONDITIONS),
+        "warranty_months": "6", "color": rng.choice(["Black", "Blue", "White"]),
+    }
+
+
+class Scenarios:
+    def __init__(self, client: httpx.AsyncClient, rec: Recorder, args: argparse.Namespace, tag: str) -> None:
+        self.client, self.rec, self.args, self.tag = client, rec, args, tag
+        self.rng = random.Random(args.seed)
+        self.run_ids: list[str] = []
+
+    async def seed(self) -> None:
+        """A few runs and KB entries so the read paths have data."""
+        now = datetime.now(timezone.utc).isoformat()
+        for i in range(self.args.seed_runs):
+            await self._post_run(f"{self.tag}-seed-{i}", now)
+        entries = []
+        for i in range(self.args.seed_kb):
+            brand, model = self.rng.choice(_MODELS)
+            price = self.rng.randrange(9000, 60000, 100)
+            entries.append(self._kb_entry(f"{self.tag}-kb-{i}", brand, model, price, now))
+        resp = await self.client.post("/kb", json=entries)
+        resp.raise_for_status()
+
+    def _kb_entry(self, entry_id: str, brand: str, model: str, price: int, now: str) -> dict[str, Any]:
+        delta = self.rng.randrange(-2000, 2000, 100)
+        return {
+            "id": entry_id, "brand": brand, "model": model, "ram": "6GB", "storage": self.rng.choice(["128GB", "256GB"]),
+            "conditionTier": self.rng.choice(_CONDITIONS), "recommendedPrice": price, "humanApprovedPrice": price + delta,
+            "delta": delta, "velocityCategory": "medium", "runId": f"{self.tag}-seed-0", "createdAt": now,
+        }
+
+    async def _post_run(self, run_id: str, now: str, endpoint: Optional[str] = None) -> None:
+        devices = [_device(self.rng, i) for i in range(10)]
+        body = {
+            "id": run_id, "name": f"load test {run_id}", "status": "completed", "createdAt": now, "completedAt": now,
+            "devices": devices, "feedbackSubmitted": False,
+            "results": [{"deviceId": d["id"], "recommendedPrice": self.rng.randrange(9000, 60000, 100), "dataFoundIn": ["Cashify"],
+                         "pricingExplanation": "load test", "riskFlags": [], "marketSignals": []} for d in devices],
+        }
+        if endpoint:
+            await _timed(self.rec, endpoint, self.client.post("/runs", json=body))
+        else:
+            (await self.client.post("/runs", json=body)).raise_for_status()
+        self.run_ids.append(run_id)
+
+    async def analyze(self) -> None:
+        devices = [_device(self.rng, i) for i in range(self.args.devices)]
+        start = time.perf_counter()
+        resp = await _timed(
+            self.rec, "POST /analyze-devices/start",
+            self.client.post("/analyze-devices/start", json={"devices": devices, "run_name": f"{self.tag} job"}),
+        )
+        if resp is None:
+            self.rec.add("analyze job (start to finished)", time.perf_counter() - start, False, "start failed")
+            return
+        job_id = resp.json()["job_id"]
+        while True:
+            await asyncio.sleep(self.args.poll_interval)
+            resp = await _timed(
+                self.rec, "GET /analyze-devices/status",
+                self.client.get(f"/analyze-devices/status/{job_id}", params={"include_results": "false"}),
+            )
+            status = resp.json().get("status") if resp is not None else None
+            if status == "finished":
+                self.rec.add("analyze job (start to finished)", time.perf_counter() - start, True)
+                return
+            if status == "error" or time.perf_counter() - start > self.args.job_timeout:
+                self.rec.add("analyze job (start to finished)", time.perf_counter() - start, False, status or "timeout")
+                return
+
+    async def csv(self) -> None:
+        lines = ["brand,model,storage_gb,ram_gb,network_type,condition_tier,warranty_months,color"]
+        for i in range(self.args.csv_rows):
+            d = _device(self.rng, i)
+            lines.append(",".join(d[k] for k in ("brand", "model", "storage_gb", "ram_gb", "network_type", "condition_tier", "warranty_months", "color")))
+        await _timed(
+            self.rec, "POST /analyze-csv",
+            self.client.post("/analyze-csv", files={"file": ("load.csv", "\n".join(lines) + "\n", "text/csv")}),
+        )
+
+    async def runs(self) -> None:
+        roll = self.rng.random()
+        if roll < 0.7 or not self.run_ids:
+            await _timed(self.rec, "GET /runs", self.client.get("/runs", params={"limit": 20}))
+        elif roll < 0.9:
+            await _timed(self.rec, "GET /runs/{id}", self.client.get(f"/runs/{self.rng.choice(self.run_ids)}"))
+        else:
+            await self._post_run(f"{self.tag}-{uuid.uuid4().hex[:12]}", datetime.now(timezone.utc).isoformat(), "POST /runs")
+
+    async def kb(self) -> None:
+        roll = self.rng.random()
+        if roll < 0.85:
+            await _timed(self.rec, "GET /kb", self.client.get("/kb"))
+        elif roll < 0.95:
+            devices = [{"brand": b, "model": m, "storage_gb": "128", "ram_gb": "6", "condition_tier": "Good"}
+                       for b, m in self.rng.sample(_MODELS, 3)]
+            await _timed(self.rec, "POST /kb/estimate", self.client.post("/kb/estimate", json={"devices": devices}))
+        else:
+            brand, model = self.rng.choice(_MODELS)
+            entry = self._kb_entry(f"{self.tag}-{uuid.uuid4().hex[:12]}", brand, model, self.rng.randrange(9000, 60000, 100),
+                                   datetime.now(timezone.utc).isoformat())
+            await _timed(self.rec, "POST /kb", self.client.post("/kb", json=[entry]))
+
+
+# --- server-side numbers from /metrics ---
+
+_SAMPLE = re.compile(r'^(\w+)(?:\{([^}]*)\})? (\S+)$')
+
+
+def _parse_metrics(text: str) -> dict[str, list[tuple[dict[str, str], float]]]:
+    out: dict[str, list[tuple[dict[str, str], float]]] = {}
+    for line in text.splitlines():
+        m = _SAMPLE.match(line)
+        if m:
+            labels = dict(re.findall(r'(\w+)="([^"]*)"', m.group(2) or ""))
+            out.setdefault(m.group(1), []).append((labels, float(m.group(3))))
+    return out
+
+
+def _lag_buckets(metrics: dict[str, list]) -> tuple[list[tuple[float, float]], float, float]:
+    buckets = [(float(l["le"]), v) for l, v in metrics.get("budli_event_loop_lag_seconds_bucket", [])]
+    total = sum(v for _, v in metrics.get("budli_event_loop_lag_seconds_sum", []))
+    count = sum(v for _, v in metrics.get("budli_event_loop_lag_seconds_count", []))
+    return sorted(buckets), total, count
+
+
+def _lag_summary(before: dict, after: dict) -> Optional[dict[str, Any]]:
+    """Lag over the test window from the histogram delta; quantiles are bucket upper bounds."""
+    b0, s0, c0 = _lag_buckets(before)
+    b1, s1, c1 = _lag_buckets(after)
+    count = c1 - c0
+    if not b1 or count <= 0:
+        return None
+    start = dict(b0)
+    delta = [(le, v - start.get(le, 0)) for le, v in b1]
+
+    def quantile(q: float) -> Optional[float]:
+        for le, cumulative in delta:
+            if cumulative >= q * count:
+                return le * 1000 if le != float("inf") else None
+        return None
+
+    return {"samples": int(count), "mean_ms": round((s1 - s0) / count * 1000, 2), "p50_le_ms": quantile(0.5),
+            "p99_le_ms": quantile(0.99), "over_100ms": int(count - dict(delta).get(0.1, 0))}
+
+
+def _rss(metrics: dict) -> Optional[float]:
+    values = metrics.get("budli_process_resident_memory_bytes")
+    return values[0][1] if values else None
+
+
+async def _sample_server(client: httpx.AsyncClient, rss: list[float], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        try:
+            value = _rss(_parse_metrics((await client.get("/metrics")).text))
+            if value is not None:
+                rss.append(value)
+        except httpx.HTTPError:
+            pass
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=1.0)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def _client_lag(lags: list[float], stop: asyncio.Event, interval: float = 0.05) -> None:
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lags.append(max(loop.time() - start - interval, 0.0))
+
+
+async def _arrivals(rate: float, fn: Callable[[], Awaitable[None]], until: float, tasks: set, rng: random.Random) -> None:
+    while True:
+        await asyncio.sleep(rng.expovariate(rate))
+        if time.monotonic() >= until:
+            return
+        task = asyncio.create_task(fn())
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+
+async def run(args: argparse.Namespace, base_url: str, tag: str) -> dict[str, Any]:
+    rec = Recorder()
+    limits = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.request_timeout, limits=limits) as client:
+        started_at = datetime.now(timezone.utc)
+        scenarios = Scenarios(client, rec, args, tag)
+        await scenarios.seed()
+        metrics_before = _parse_metrics((await client.get("/metrics")).text)
+
+        stop = asyncio.Event()
+        rss: list[float] = []
+        client_lags: list[float] = []
+        background = [asyncio.create_task(_sample_server(client, rss, stop)), asyncio.create_task(_client_lag(client_lags, stop))]
+        tasks: set = set()
+        started = time.monotonic()
+        until = started + args.duration
+        arrival_rng = random.Random(args.seed + 1)
+        fns = {"analyze": scenarios.analyze, "csv": scenarios.csv, "runs": scenarios.runs, "kb": scenarios.kb}
+        await asyncio.gather(*(_arrivals(rate, fns[name], until, tasks, arrival_rng) for name, rate in args.rates.items() if rate > 0))
+        # Let requests already sent finish (jobs can outlast the arrival window).
+        if tasks:
+            done, pending = await asyncio.wait(set(tasks), timeout=args.drain)
+            for task in pending:
+                task.cancel()
+            if pending:
+                print(f"{len(pending)} requests / jobs still running after --drain {args.drain}s were cancelled", file=sys.stderr)
+        elapsed = time.monotonic() - started
+        stop.set()
+        await asyncio.gather(*background)
+        metrics_after = _parse_metrics((await client.get("/metrics")).text)
+
+    client_lags.sort()
+    rss_mb = [v / 2**20 for v in rss]
+    return {
+        "meta": {
+            "commit": _git("rev-parse", "--short", "HEAD"),
+            "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+            "started_at": started_at.isoformat(),
+            "elapsed_s": round(elapsed, 1),
+            "python": platform.python_version(),
+            "args": {k: v for k, v in vars(args).items() if k not in ("out", "compare", "database_url")},
+        },
+        "endpoints": rec.summary(elapsed),
+        "server": {
+            "event_loop_lag": _lag_summary(metrics_before, metrics_after),
+            "rss_mb": {
+                "start": round(rss_mb[0], 1), "peak": round(max(rss_mb), 1), "end": round(rss_mb[-1], 1),
+                "growth": round(rss_mb[-1] - rss_mb[0], 1),
+            } if rss_mb else None,
+        },
+        "client": {"event_loop_lag_ms": {"p50": _round(_percentile(client_lags, 50) * 1000), "p99": _round(_percentile(client_lags, 99) * 1000),
+                                         "max": _round(client_lags[-1] * 1000)} if client_lags else None},
+    }
+
+
+def _git(*argv: str) -> str:
+    try:
+        return subprocess.run(["git", *argv], capture_output=True, text=True, cwd=BACKEND, timeout=30).stdout.strip()
+    except Exception:
+        return ""
+
+
+def _print_report(result: dict[str, Any], baseline: Optional[dict[str, Any]] = None) -> None:
+    print(f"\n{'endpoint':34} {'reqs':>6} {'err%':>6} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for endpoint, s in result["endpoints"].items():
+        lat = s["latency_ms"]
+        print(f"{endpoint:34} {s['requests']:6} {s['error_rate'] * 100:6.1f} {s['throughput_rps']:8.2f} "
+              f"{_fmt(lat['p50']):>9} {_fmt(lat['p95']):>9} {_fmt(lat['p99']):>9}")
+        if baseline and endpoint in baseline.get("endpoints", {}):
+            b = baseline["endpoints"][endpoint]
+            print(f"{'  vs baseline':34} {'':6} {(s['error_rate'] - b['error_rate']) * 100:+6.1f} "
+                  f"{_pct(s['throughput_rps'], b['throughput_rps']):>8} {_pct(lat['p50'], b['latency_ms']['p50']):>9} "
+                  f"{_pct(lat['p95'], b['latency_ms']['p95']):>9} {_pct(lat['p99'], b['latency_ms']['p99']):>9}")
+        for kind, n in (s.get("error_kinds") or {}).items():
+            print(f"    {n} x {kind}")
+    server, client = result["server"], result["client"]
+    print(f"\nserver event-loop lag: {server['event_loop_lag']}")
+    print(f"server RSS (MiB):      {server['rss_mb']}")
+    print(f"client event-loop lag: {client['event_loop_lag_ms']}")
+    if baseline:
+        print(f"baseline: {baseline['meta'].get('commit')} ({baseline['meta'].get('started_at')}); "
+              f"server RSS growth then {(baseline['server'].get('rss_mb') or {}).get('growth')} MiB")
+
+
+def _fmt(v: Optional[float]) -> str:
+    return "-" if v is None else f"{v:.1f}"
+
+
+def _pct(new: Optional[float], old: Optional[float]) -> str:
+    if new is None or not old:
+        return "-"
+    return f"{(new - old) / old * 100:+.0f}%"
+
+
+def _rates(value: str) -> dict[str, float]:
+    rates = {}
+    for part in value.split(","):
+        name, _, rate = part.partition("=")
+        if name.strip() not in ("analyze", "csv", "runs", "kb"):
+            raise argparse.ArgumentTypeError(f"unknown scenario {name!r} (analyze, csv, runs, kb)")
+        rates[name.strip()] = float(rate)
+    return rates
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _cleanup(database_url: str, tag: str, since: datetime) -> dict[str, int]:
+    """Delete the runs, their listings and the KB entries this test wrote, then rebuild what they fed."""
+    # database reads DATABASE_URL (and .env) at import; point it at the scratch database first.
+    os.environ["DATABASE_URL"] = database_url
+    sys.path.insert(0, BACKEND)
+    from sqlalchemy import text
+
+    import kb_corrections_helper
+    import trends_helper
+    from database import get_engine
+
+    pattern = {"ids": f"{tag}-%", "names": f"{tag} %"}
+    with get_engine().begin() as conn:
+        runs = conn.execute(
+            text("SELECT id FROM runs WHERE id LIKE :ids OR name LIKE :names"), pattern
+        ).scalars().all()
+        removed = {
+            "runs": len(runs),
+            "listings": conn.execute(
+                text("DELETE FROM listings WHERE run_id = ANY(:runs) OR (run_id IS NULL AND scraped_at >= :since)"),
+                {"runs": runs, "since": since},
+            ).rowcount,
+            "kb": conn.execute(text("DELETE FROM knowledge_base WHERE id LIKE :ids"), pattern).rowcount,
+        }
+        conn.execute(text("DELETE FROM runs WHERE id = ANY(:runs)"), {"runs": runs})
+        kb_corrections_helper.rebuild(conn)
+        conn.execute(text("DELETE FROM listing_daily_stats"))
+        trends_helper.rebuild_rollups(conn)
+    return removed
+
+
+def _start_server(args: argparse.Namespace) -> tuple[subprocess.Popen, str, str]:
+    port = _free_port()
+    env = {
+        **os.environ, "DATABASE_URL": args.database_url, "FAKE_SERVICES": "all",
+        "FAKE_LATENCY_SCALE": str(args.latency_scale),
+    }
+    for item in args.fake_env:
+        key, _, value = item.partition("=")
+        env[key] = value
+    log_path = os.path.join(tempfile.gettempdir(), f"budli-loadtest-{port}.log")
+    log = open(log_path, "w")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"server exited with {proc.returncode}; see {log_path}")
+        try:
+            if httpx.get(url + "/health", timeout=2).status_code == 200:
+                return proc, url, log_path
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    proc.terminate()
+    raise SystemExit(f"server did not become healthy within 60s; see {log_path}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="target a running instance instead of starting one with the fakes")
+    parser.add_argument("--database-url", default=os.getenv("LOADTEST_DATABASE_URL"),
+                        help="scratch database the test writes to (default LOADTEST_DATABASE_URL); required")
+    parser.add_argument("--keep-data", action="store_true", help="leave the test's runs and KB entries in the database")
+    parser.add_argument("--duration", type=float, default=60, help="seconds of arrivals")
+    parser.add_argument("--rates", type=_rates, default=_rates("analyze=0.5,csv=0.2,runs=20,kb=10"),
+                        help="arrivals per second per scenario (analyze, csv, runs, kb)")
+    parser.add_argument("--devices", type=int, default=3, help="devices per analyze job")
+    parser.add_argument("--csv-rows", type=int, default=10)
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="seconds between job status polls")
+    parser.add_argument("--job-timeout", type=float, default=600)
+    parser.add_argument("--drain", type=float, default=120, help="seconds to wait for in-flight work after the arrival window")
+    parser.add_argument("--request-timeout", type=float, default=300)
+    parser.add_argument("--max-connections", type=int, default=500)
+    parser.add_argument("--latency-scale", type=float, default=0.05, help="FAKE_LATENCY_SCALE for the started server")
+    parser.add_argument("--fake-env", action="append", default=[], metavar="KEY=VALUE", help="extra env for the started server")
+    parser.add_argument("--seed", type=int, default=48)
+    parser.add_argument("--seed-runs", type=int, default=20)
+    parser.add_argument("--seed-kb", type=int, default=200)
+    parser.add_argument("--out", help="write the result JSON here")
+    parser.add_argument("--compare", help="previous result JSON to compare against")
+    args = parser.parse_args()
+    if not args.database_url:
+        parser.error(
+            "needs a scratch database: --database-url or LOADTEST_DATABASE_URL (the test writes runs and approved "
+            "KB prices that would skew KB corrections and instant estimates)"
+        )
+
+    since = datetime.now(timezone.utc)
+    tag = f"lt-{since:%Y%m%d%H%M%S}"
+    proc = None
+    if args.url:
+        base_url = args.url.rstrip("/")
+    else:
+        proc, base_url, log_path = _start_server(args)
+        print(f"server {base_url} (FAKE_SERVICES=all, FAKE_LATENCY_SCALE={args.latency_scale}); log: {log_path}")
+    try:
+        result = asyncio.run(run(args, base_url, tag))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=30)
+        if not args.keep_data:
+            removed = _cleanup(args.database_url, tag, since)
+            print(f"removed {tag} data: {removed['runs']} runs, {removed['listings']} listings, {removed['kb']} KB entries")
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    _print_report(result, baseline)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=1)
+        print(f"\nwrote {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""
+Throughput, memory and correctness of the listing extractors against recorded pages (no network).
+
+    python benchmarks/parsers.py [--repeat 30] [--only amazon] [--check] [--update-golden]
+
+Each extractor's parser runs on its fixture in benchmarks/fixtures (Ovantica, ReFit, Amazon and
+Flipkart search HTML; a Cashify search API response) and is timed (pages/s, items/s) and measured
+with tracemalloc (peak and retained bytes per page). Its output is compared field by field with
+<fixture>.golden.json; any difference exits 1. After an intended parser change, refresh the
+goldens with --update-golden and review the diff. --check only compares (no timing).
+"""
+import argparse
+import gc
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+import script  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+# Large enough that every result on a fixture page is parsed (the API default is 5 / 10).
+VELOCITY_LIMIT = 50
+
+# name -> (extractor it backs, fixture, parser over the fixture's text)
+EXTRACTORS: dict[str, tuple[str, str, Callable[[str], list[dict[str, Any]]]]] = {
+    "ovantica": ("script.scrape_device_data", "ovantica_search.html", script.parse_ovantica_search),
+    "refit": ("script.scrape_refit_data", "refit_search.html", script.parse_refit_search),
+    "cashify": ("script.scrape_cashify_data", "cashify_search.json", lambda text: script.map_cashify_results(json.loads(text))),
+    "amazon": ("app._scrape_amazon_search_bs4", "amazon_search.html", lambda text: app._parse_amazon_search_html(text, VELOCITY_LIMIT)),
+    "flipkart": ("app._scrape_flipkart_search_bs4", "flipkart_search.html", lambda text: app._parse_flipkart_search_html(text, VELOCITY_LIMIT)),
+}
+
+
+def _golden_path(fixture: str) -> str:
+    return os.path.join(FIXTURES, os.path.splitext(fixture)[0] + ".golden.json")
+
+
+def _diff(expected: list[dict[str, Any]], actual: list[dict[str, Any]], max_lines: int = 10) -> list[str]:
+    out = []
+    if len(expected) != len(actual):
+        out.append(f"{len(actual)} items, expected {len(expected)}")
+    for i, (e, a) in enumerate(zip(expected, actual)):
+        for key in sorted(set(e) | set(a)):
+            if e.get(key) != a.get(key):
+                out.append(f"item {i} {key}: {a.get(key)!r}, expected {e.get(key)!r}")
+    return out[:max_lines] + ([f"... {len(out) - max_lines} more"] if len(out) > max_lines else [])
+
+
+def _measure(parse: Callable[[str], list], text: str, repeat: int) -> dict[str, float]:
+    parse(text)  # warm up (imports, selector compilation)
+    samples = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        parse(text)
+        samples.append(time.perf_counter() - t)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        parse(text)
+        _, peak = tracemalloc.get_traced_memory()
+        # BeautifulSoup trees are reference cycles: collect them so only real retention is left.
+        gc.collect()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    # Still held after the parse returns and garbage is collected (anything a parser leaks or caches).
+    retained = sum(s.size_diff for s in after.compare_to(before, "filename") if s.size_diff > 0)
+    return {"seconds": statistics.median(samples), "peak_bytes": peak, "retained_bytes": retained}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--only", choices=sorted(EXTRACTORS), action="append", help="run only these extractors")
+    parser.add_argument("--check", action="store_true", help="compare with the goldens only, no timing")
+    parser.add_argument("--update-golden", action="store_true", help="rewrite the golden outputs from the current parsers")
+    args = parser.parse_args()
+
+    failures = 0
+    if not args.check:
+        print(f"{'extractor':32} {'KiB':>6} {'items':>5} {'ms/page':>8} {'pages/s':>8} {'items/s':>9} {'peak KiB':>9} {'kept KiB':>9}  golden")
+    for name in args.only or EXTRACTORS:
+        extractor, fixture, parse = EXTRACTORS[name]
+        with open(os.path.join(FIXTURES, fixture), encoding="utf-8") as f:
+            text = f.read()
+        items = parse(text)
+
+        golden_path = _golden_path(fixture)
+        if args.update_golden:
+            with open(golden_path, "w", encoding="utf-8") as f:
+                json.dump(items, f, ensure_ascii=False, indent=1)
+                f.write("\n")
+            status, problems = "written", []
+        elif not os.path.exists(golden_path):
+            status, problems = "MISSING", [f"no {os.path.basename(golden_path)}; run with --update-golden"]
+        else:
+            with open(golden_path, encoding="utf-8") as f:
+                problems = _diff(json.load(f), items)
+            status = "ok" if not problems else "MISMATCH"
+        failures += bool(problems)
+
+        if args.check:
+            print(f"{extractor:32} {len(items):5} items  {status}")
+        else:
+            m = _measure(parse, text, args.repeat)
+            print(
+                f"{extractor:32} {len(text.encode('utf-8')) / 1024:6.0f} {len(items):5} {m['seconds'] * 1000:8.2f} "
+                f"{1 / m['seconds']:8.1f} {len(items) / m['seconds']:9.0f} {m['peak_bytes'] / 1024:9.0f} "
+                f"{m['retained_bytes'] / 1024:9.0f}  {status}"
+            )
+        for line in problems:
+            print(f"    {line}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+"""
+Record an analyze-devices job's external calls into a cassette, then re-run the job offline from it.
+
+    python benchmarks/replay_job.py record --devices devices.json --cassette job.jsonl
+    python benchmarks/replay_job.py replay --cassette job.jsonl [--timing original] [--repeat 3]
+
+record runs the job in-process (POST /analyze-devices/start, then status polls) with CASSETTE_MODE=record,
+so every Bedrock call, BrowserUse session / run, velocity HTTP fetch and Playwright scrape is saved with
+its response and duration (cassette_helper), followed by a "job" note with the devices, results and wall
+time. replay runs the same devices with CASSETTE_MODE=replay (no network): it prints the wall time against
+the recorded one and diffs the results field by field with the recorded results. It exits 1 on any
+difference or on a call that has no recording. "loose" matches are Bedrock prompts that changed only in
+their listings JSON; "reused" are calls made more often than recorded.
+
+devices.json is a list of /analyze-devices/start devices (or {"devices": [...]}). DATABASE_URL is needed as
+for the app; KB corrections and instant estimates read it, so replay against the same data.
+
+The job writes to that database like any job: a run and the scraped listings (with their trend rollups).
+Every job here runs under a throwaway run named "replay <timestamp> <n>", which is deleted together with its
+listings after the job (and after the diff when replaying), and the touched rollups are recomputed, so
+--repeat N leaves nothing behind. Pass --keep-runs to keep them for inspection.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+# Differ between runs of the same job by construction (latencies, ids).
+VOLATILE_FIELDS = {"llm_usage", "latency_ms"}
+
+
+def _run_job(
+    client: Any, devices: list[dict], run_name: str, poll_interval: float, timeout: float
+) -> tuple[dict[str, Any], float]:
+    start = time.perf_counter()
+    resp = client.post("/analyze-devices/start", json={"devices": devices, "run_name": run_name})
+    resp.raise_for_status()
+    job_id = resp.json()["job_id"]
+    while True:
+        status = client.get(f"/analyze-devices/status/{job_id}", params={"include_results": "true"}).json()
+        if status["status"] in ("finished", "error"):
+            return status, time.perf_counter() - start
+        if time.perf_counter() - start > timeout:
+            raise SystemExit(f"job {job_id} still {status['status']} after {timeout}s")
+        time.sleep(poll_interval)
+
+
+def _discard_run(client: Any, run_id: Optional[str]) -> None:
+    """Delete a job's run and the listings it scraped, and recompute the trend rollups they were part of."""
+    if not run_id:
+        return
+    import listings_helper
+    import trends_helper
+    from database import SessionLocal
+    from sqlalchemy import text
+
+    db = SessionLocal()
+    try:
+        rows = db.execute(
+            text("DELETE FROM listings WHERE run_id = :run_id RETURNING " + ", ".join(listings_helper.COPY_COLUMNS)),
+            {"run_id": run_id},
+        ).all()
+        trends_helper.refresh_for_listings(db, [tuple(r) for r in rows], removed=True)
+        db.commit()
+    finally:
+        db.close()
+    client.delete(f"/runs/{run_id}").raise_for_status()
+
+
+def _outputs(status: dict[str, Any]) -> dict[str, Any]:
+    return {k: status.get(k) for k in ("status", "error", "results", "scrape_results")}
+
+
+def _diff(expected: Any, actual: Any, path: str = "") -> list[str]:
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        out = []
+        for key in sorted(set(expected) | set(actual)):
+            if key not in VOLATILE_FIELDS:
+                out += _diff(expected.get(key), actual.get(key), f"{path}.{key}" if path else key)
+        return out
+    if isinstance(expected, list) and isinstance(actual, list):
+        out = [f"{path}: {len(actual)} items, expected {len(expected)}"] if len(expected) != len(actual) else []
+        for i, (e, a) in enumerate(zip(expected, actual)):
+            out += _diff(e, a, f"{path}[{i}]")
+        return out
+    return [] if expected == actual else [f"{path}: {actual!r}, expected {expected!r}"]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("mode", choices=("record", "replay"))
+    parser.add_argument("--cassette", required=True)
+    parser.add_argument("--devices", help="devices JSON (record)")
+    parser.add_argument("--timing", default="fast", help="replay pacing: fast, original, or a factor of the recorded durations")
+    parser.add_argument("--repeat", type=int, default=1, help="replay the job this many times")
+    parser.add_argument("--poll-interval", type=float, default=0.05)
+    parser.add_argument("--timeout", type=float, default=1800)
+    parser.add_argument("--max-diff-lines", type=int, default=20)
+    parser.add_argument("--keep-runs", action="store_true", help="keep the jobs' runs and listings in the database")
+    args = parser.parse_args()
+
+    if args.mode == "record":
+        if not args.devices:
+            parser.error("record needs --devices")
+        with open(args.devices, encoding="utf-8") as f:
+            devices = json.load(f)
+        devices = devices["devices"] if isinstance(devices, dict) else devices
+    elif not os.path.exists(args.cassette):
+        parser.error(f"{args.cassette} does not exist")
+
+    # cassette_helper reads these at import, so they are set before the app is imported.
+    os.environ["CASSETTE_MODE"] = args.mode
+    os.environ["CASSETTE_PATH"] = args.cassette
+    os.environ["CASSETTE_TIMING"] = args.timing
+    from fastapi.testclient import TestClient
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)  # one line per status poll otherwise
+
+    import app
+    import cassette_helper
+
+    cassette = cassette_helper.cassette()
+    if args.mode == "replay":
+        jobs = cassette.notes("job")
+        if not jobs:
+            raise SystemExit(f"{args.cassette} has no recorded job")
+        recorded = jobs[-1]
+        devices = recorded["devices"]
+
+    tag = f"replay {datetime.now(timezone.utc):%Y%m%d%H%M%S}"
+    failures = 0
+    with TestClient(app.app) as client:
+        if args.mode == "record":
+            status, elapsed = _run_job(client, devices, f"{tag} 1", args.poll_interval, args.timeout)
+            if not args.keep_runs:
+                _discard_run(client, status.get("run_id"))
+            cassette.append({
+                "kind": "job", "recorded_at": datetime.now(timezone.utc).isoformat(), "devices": devices,
+                "elapsed_s": round(elapsed, 3), "outputs": _outputs(status),
+            })
+            print(f"recorded {len(devices)} devices in {elapsed:.2f}s (status {status['status']}): {cassette.stats}")
+            return 0
+
+        for i in range(args.repeat):
+            if i:
+                cassette.rewind()
+            status, elapsed = _run_job(client, devices, f"{tag} {i + 1}", args.poll_interval, args.timeout)
+            problems = _diff(recorded["outputs"], _outputs(status))
+            if not args.keep_runs:
+                _discard_run(client, status.get("run_id"))
+            missed = sum(c.get("missed", 0) for c in cassette.stats.values())
+            failures += bool(problems) + bool(missed)
+            print(
+                f"replay {i + 1}: {elapsed:.2f}s (recorded {recorded['elapsed_s']:.2f}s, timing={args.timing}), "
+                f"{'outputs match' if not problems else f'{len(problems)} differences'}; calls {cassette.stats}"
+            )
+            for line in problems[: args.max_diff_lines]:
+                print(f"    {line}")
+            if len(problems) > args.max_diff_lines:
+                print(f"    ... {len(problems) - args.max_diff_lines} more")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""
+Encode time and bytes on the wire for a realistic 50-device run (GET /runs/{id} payload).
+
+    python benchmarks/serialization.py [--devices 50] [--rows 25] [--repeat 20]
+
+Compares FastAPI's default path (jsonable_encoder + JSONResponse), orjson and MessagePack, then
+gzip and brotli on the orjson body at the levels responses_helper uses. Optional encoders that are
+not installed are skipped. No database or network needed.
+"""
+import argparse
+import gzip
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import responses_helper  # noqa: E402
+
+_MODELS = ["iPhone 13", "iPhone 12", "Galaxy S21 FE", "OnePlus 9R", "Pixel 7", "Redmi Note 12 Pro", "iPhone 14 Plus"]
+_SOURCES = {"ovantica": "Ovantica (Search)", "refitglobal": "ReFit Global (Search)", "cashify": "Cashify (Search)"}
+
+
+def build_run(devices: int = 50, rows_per_source: int = 25, seed: int = 7) -> dict[str, Any]:
+    """A completed run shaped like the client's Run: devices, results with signals, scrape tables."""
+    rnd = random.Random(seed)
+    now = datetime(2026, 1, 15, tzinfo=timezone.utc)
+    device_list, results = [], []
+    for i in range(devices):
+        model = rnd.choice(_MODELS)
+        storage, ram = rnd.choice(["64GB", "128GB", "256GB"]), rnd.choice(["4GB", "6GB", "8GB"])
+        device_id = f"dev-{i:03d}-{rnd.getrandbits(32):08x}"
+        device_list.append({"id": device_id, "storage": storage, "model": model, "ram": ram, "color": "Blue", "condition": rnd.choice(["superb", "good", "fair"])})
+        price = rnd.randrange(9000, 60000, 100)
+        results.append({
+            "deviceId": device_id,
+            "recommendedPrice": price,
+            "priceLow": round(price * 0.92 / 100) * 100,
+            "priceHigh": round(price * 1.08 / 100) * 100,
+            "dataFoundIn": ["Ovantica", "ReFit Global", "Cashify"],
+            "pricingExplanation": (
+                f"Based on {rnd.randint(8, 40)} comparable refurbished listings for {model} {storage}, the median "
+                f"price in Good condition is ₹{price:,}. Superb units list 6-9% higher; fair units 10-14% lower."
+            ),
+            "riskFlags": rnd.sample(["Low sample size", "Wide price spread", "Older listings"], rnd.randint(0, 2)),
+            "marketSignals": [
+                {"source": label, "price": price, "condition": "Scraped Search Query",
+                 "url": f"https://{src}.example/search?q={model.replace(' ', '+')}", "scrapedAt": now.isoformat()}
+                for src, label in _SOURCES.items()
+            ],
+            "sourceUrl": f"https://ovantica.example/search?q={model.replace(' ', '+')}",
+            "amazonVelocityItems": [
+                {"title": f"Apple {model} ({storage}) - Blue", "link": "https://www.amazon.in/dp/B0" + str(rnd.getrandbits(40)),
+                 "rating": "4.5 out of 5 stars", "reviews": f"{rnd.randint(100, 90000):,}", "bought": "1K+ bought in past month"}
+                for _ in range(5)
+            ],
+            "flipkartVelocityItems": [
+                {"title": f"{model} ({storage})", "link": "https://www.flipkart.com/p/itm" + str(rnd.getrandbits(40)),
+                 "price": f"₹{price + rnd.randint(-2000, 4000):,}", "rating": f"4.{rnd.randint(0, 9)}"}
+                for _ in range(5)
+            ],
+            "kbCorrection": None,
+        })
+    scrape_results = {
+        src: [
+            {"Storage": rnd.choice(["64GB", "128GB", "256GB"]), "Model": rnd.choice(_MODELS), "Ram": rnd.choice(["4GB", "6GB", "8GB"]),
+             "Color": rnd.choice(["Blue", "Black", "Midnight", "Starlight"]), "Condition": rnd.choice(["Superb", "Good", "Fair"]),
+             "Price": f"₹{rnd.randrange(9000, 60000, 1):,}"}
+            for _ in range(devices * rows_per_source)
+        ]
+        for src in _SOURCES
+    }
+    return {
+        "id": "bench-run",
+        "name": "Benchmark run",
+        "status": "completed",
+        "createdAt": (now - timedelta(hours=1)).isoformat(),
+        "completedAt": now.isoformat(),
+        "devices": device_list,
+        "results": results,
+        "feedbackSubmitted": False,
+        "version": 3,
+        "scrapeResults": scrape_results,
+    }
+
+
+def _time(fn: Callable[[], bytes], repeat: int) -> tuple[float, bytes]:
+    samples, out = [], b""
+    for _ in range(repeat):
+        t = time.perf_counter()
+        out = fn()
+        samples.append((time.perf_counter() - t) * 1000)
+    return statistics.median(samples), out
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--devices", type=int, default=50)
+    parser.add_argument("--rows", type=int, default=25, help="scraped listings per device per source")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    run = build_run(args.devices, args.rows)
+    encoders: list[tuple[str, Callable[[], bytes]]] = []
+    try:
+        from fastapi.encoders import jsonable_encoder
+        from starlette.responses import JSONResponse
+
+        encoders.append(("fastapi default (jsonable_encoder + json)", lambda: JSONResponse(jsonable_encoder(run)).body))
+    except ImportError:
+        pass
+    encoders.append(("stdlib json", lambda: json.dumps(run, ensure_ascii=False, separators=(",", ":")).encode("utf-8")))
+    if responses_helper.orjson is not None:
+        encoders.append(("orjson", lambda: responses_helper.dumps_json(run)))
+    msgpack = responses_helper._optional("msgpack")
+    if msgpack is not None:
+        encoders.append(("msgpack", lambda: msgpack.packb(run)))
+
+    print(f"run: {args.devices} devices, {sum(len(v) for v in run['scrapeResults'].values())} scraped rows\n")
+    print(f"{'encoding':45} {'ms':>8} {'bytes':>11}")
+    body = b""
+    for name, fn in encoders:
+        ms, out = _time(fn, args.repeat)
+        print(f"{name:45} {ms:8.2f} {len(out):11,}")
+        if name == "orjson" or not body:
+            body = out
+
+    compressors: list[tuple[str, Callable[[], bytes]]] = [
+        (f"gzip level {responses_helper.GZIP_LEVEL}", lambda: gzip.compress(body, compresslevel=responses_helper.GZIP_LEVEL)),
+    ]
+    brotli = responses_helper._optional("brotli")
+    if brotli is not None:
+        compressors.append((f"brotli quality {responses_helper.BROTLI_QUALITY}", lambda: brotli.compress(body, quality=responses_helper.BROTLI_QUALITY)))
+    print(f"\ncompression of the JSON body ({len(body):,} bytes)")
+    for name, fn in compressors:
+        ms, out = _time(fn, max(args.repeat // 4, 3))
+        print(f"{name:45} {ms:8.2f} {len(out):11,}  ({len(out) / len(body):.1%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,287 @@
+import csv
+import io
+import json
+from typing import Any, BinaryIO, Iterator, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+import dedup_helper
+from models import BulkJobModel, BulkJobRowModel
+
+# Rows inserted per round-trip while ingesting an upload.
+INGEST_BATCH_SIZE = 1000
+
+
+class BulkInputError(ValueError):
+    """Raised when an uploaded bulk file cannot be parsed."""
+
+
+def detect_format(filename: Optional[str], content_type: Optional[str]) -> str:
+    """Guess 'csv' or 'ndjson' from the upload's filename / content type."""
+    name = (filename or "").lower()
+    ctype = (content_type or "").lower()
+    if name.endswith((".ndjson", ".jsonl")) or "ndjson" in ctype or "jsonl" in ctype:
+        return "ndjson"
+    return "csv"
+
+
+def open_records(fileobj: BinaryIO, input_format: str) -> tuple[list[str], Iterator[dict[str, Any]]]:
+    """
+    Return (fieldnames, records) for an uploaded file. Records are parsed lazily so
+    arbitrarily large uploads are never held in memory at once.
+    For NDJSON, fieldnames are collected from the first record (later records may add keys).
+    """
+    stream = io.TextIOWrapper(fileobj, encoding="utf-8", newline="")
+    if input_format == "csv":
+        reader = csv.DictReader(stream)
+        fieldnames = list(reader.fieldnames or [])
+        if not fieldnames:
+            raise BulkInputError("CSV has no header row.")
+        return fieldnames, (dict(r) for r in reader)
+
+    def _ndjson() -> Iterator[dict[str, Any]]:
+        for line_no, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise BulkInputError(f"Line {line_no}: invalid JSON ({e})") from e
+            if not isinstance(record, dict):
+                raise BulkInputError(f"Line {line_no}: expected a JSON object")
+            yield {k: "" if v is None else str(v) for k, v in record.items()}
+
+    records = _ndjson()
+    try:
+        first = next(records)
+    except StopIteration:
+        raise BulkInputError("NDJSON file has no records.")
+
+    def _chain() -> Iterator[dict[str, Any]]:
+        yield first
+        yield from records
+
+    return list(first.keys()), _chain()
+
+
+def ingest_rows(db: Session, job_id: str, records: Iterator[dict[str, Any]]) -> tuple[int, int]:
+    """
+    Insert records as pending rows in batches of INGEST_BATCH_SIZE, tagging each with its
+    normalized config key. Returns (row count, distinct config count).
+    """
+    table = BulkJobRowModel.__table__
+    batch: list[dict[str, Any]] = []
+    keys: set[str] = set()
+    total = 0
+    for record in records:
+        total += 1
+        key = dedup_helper.config_key_str(record)
+        keys.add(key)
+        batch.append({
+            "job_id": job_id,
+            "row_idx": total,
+            "status": "pending",
+            "input": record,
+            "config_key": key,
+            "attempts": 0,
+        })
+        if len(batch) >= INGEST_BATCH_SIZE:
+            db.execute(table.insert(), batch)
+            batch = []
+    if batch:
+        db.execute(table.insert(), batch)
+    return total, len(keys)
+
+
+def claim_rows(db: Session, job_id: str, limit: int, lease_seconds: int) -> list[tuple[int, dict[str, Any], str]]:
+    """
+    Atomically claim up to `limit` pending rows (plus in-progress rows whose lease expired,
+    e.g. after a crash) and mark them in_progress. Safe to call from several workers.
+    """
+    rows = db.execute(
+        text(
+            """
+            UPDATE bulk_job_rows r
+            SET status = 'in_progress', claimed_at = now(), attempts = r.attempts + 1
+            FROM (
+                SELECT job_id, row_idx FROM bulk_job_rows
+                WHERE job_id = :job_id
+                  AND (status = 'pending'
+                       OR (status = 'in_progress' AND claimed_at < now() - make_interval(secs => :lease)))
+                ORDER BY row_idx
+                LIMIT :limit
+                FOR UPDATE SKIP LOCKED
+            ) c
+            WHERE r.job_id = c.job_id AND r.row_idx = c.row_idx
+            RETURNING r.row_idx, r.input, r.config_key
+            """
+        ),
+        {"job_id": job_id, "limit": limit, "lease": lease_seconds},
+    ).all()
+    db.commit()
+    return sorted((r.row_idx, r.input, r.config_key or "") for r in rows)
+
+
+def find_done_output(db: Session, job_id: str, config_key: str) -> Optional[dict[str, Any]]:
+    """Output of an already-priced row with the same config key in this job, if any."""
+    return db.execute(
+        text(
+            "SELECT output FROM bulk_job_rows "
+            "WHERE job_id = :job_id AND config_key = :config_key AND status = 'done' LIMIT 1"
+        ),
+        {"job_id": job_id, "config_key": config_key},
+    ).scalar()
+
+
+def checkpoint_row(
+    db: Session,
+    job_id: str,
+    row_idx: int,
+    output: Optional[dict[str, Any]],
+    error: Optional[str] = None,
+) -> bool:
+    """
+    Durably record one finished row. Only a row still in_progress is recorded, so a row whose
+    lease expired and was claimed again is counted (and given a `seq`) once; the later checkpoint
+    is a no-op. The job counters are bumped in the same statement, and the job row's lock serializes
+    checkpoints so `seq` follows commit order. Returns False when the row was already finished.
+    """
+    seq = db.execute(
+        text(
+            """
+            WITH finished AS (
+                UPDATE bulk_job_rows
+                SET status = :status, output = CAST(:output AS JSONB), error = :error, completed_at = now()
+                WHERE job_id = :job_id AND row_idx = :row_idx AND status = 'in_progress'
+                RETURNING row_idx
+            )
+            UPDATE bulk_jobs
+            SET done_rows = done_rows + 1,
+                failed_rows = failed_rows + CASE WHEN :failed THEN 1 ELSE 0 END,
+                last_seq = last_seq + 1,
+                updated_at = now()
+            WHERE id = :job_id AND EXISTS (SELECT 1 FROM finished)
+            RETURNING last_seq
+            """
+        ),
+        {
+            "job_id": job_id,
+            "row_idx": row_idx,
+            "status": "error" if error is not None else "done",
+            "output": json.dumps(output) if output is not None else None,
+            "error": error,
+            "failed": error is not None,
+        },
+    ).scalar()
+    if seq is not None:
+        db.execute(
+            text("UPDATE bulk_job_rows SET seq = :seq WHERE job_id = :job_id AND row_idx = :row_idx"),
+            {"job_id": job_id, "row_idx": row_idx, "seq": seq},
+        )
+    db.commit()
+    return seq is not None
+
+
+def next_claim_in(db: Session, job_id: str, lease_seconds: int) -> Optional[float]:
+    """
+    Seconds until claim_rows can return a row of this running job again: 0 while rows are pending,
+    else until the earliest in-progress lease expires (rows left by a crashed or redeployed runner).
+    None when the job has no unfinished rows or is no longer running.
+    """
+    row = db.execute(
+        text(
+            """
+            SELECT count(*) FILTER (WHERE r.status = 'pending') AS pending,
+                   count(*) AS unfinished,
+                   EXTRACT(EPOCH FROM min(r.claimed_at) FILTER (WHERE r.status = 'in_progress')
+                                      + make_interval(secs => :lease) - now()) AS wait
+            FROM bulk_job_rows r
+            JOIN bulk_jobs j ON j.id = r.job_id AND j.status = 'running'
+            WHERE r.job_id = :job_id AND r.status IN ('pending', 'in_progress')
+            """
+        ),
+        {"job_id": job_id, "lease": lease_seconds},
+    ).one()
+    if not row.unfinished:
+        return None
+    if row.pending:
+        return 0.0
+    return max(0.0, float(row.wait or 0))
+
+
+def finish_if_complete(db: Session, job_id: str) -> bool:
+    """Mark the job completed once no pending/in-progress rows remain. Returns True if completed."""
+    remaining = db.execute(
+        text(
+            "SELECT count(*) FROM bulk_job_rows "
+            "WHERE job_id = :job_id AND status IN ('pending', 'in_progress')"
+        ),
+        {"job_id": job_id},
+    ).scalar_one()
+    if remaining:
+        return False
+    db.execute(
+        text(
+            "UPDATE bulk_jobs SET status = 'completed', completed_at = now(), updated_at = now() "
+            "WHERE id = :job_id AND status = 'running'"
+        ),
+        {"job_id": job_id},
+    )
+    db.commit()
+    return True
+
+
+def requeue_failed(db: Session, job_id: str) -> int:
+    """Move failed rows back to pending so a resumed job retries them. Returns the row count."""
+    moved = db.execute(
+        text(
+            "UPDATE bulk_job_rows SET status = 'pending', error = NULL, seq = NULL, completed_at = NULL "
+            "WHERE job_id = :job_id AND status = 'error'"
+        ),
+        {"job_id": job_id},
+    ).rowcount
+    if moved:
+        db.execute(
+            text(
+                "UPDATE bulk_jobs SET done_rows = done_rows - :n, failed_rows = failed_rows - :n "
+                "WHERE id = :job_id"
+            ),
+            {"job_id": job_id, "n": moved},
+        )
+    db.commit()
+    return moved
+
+
+def iter_completed_rows(db: Session, job_id: str, after_seq: int, upto_seq: int) -> Iterator[BulkJobRowModel]:
+    """Finished rows (done or error) with after_seq < seq <= upto_seq, in completion order."""
+    return (
+        db.query(BulkJobRowModel)
+        .filter(
+            BulkJobRowModel.job_id == job_id,
+            BulkJobRowModel.seq > after_seq,
+            BulkJobRowModel.seq <= upto_seq,
+        )
+        .order_by(BulkJobRowModel.seq)
+        .yield_per(500)
+    )
+
+
+def job_to_dict(job: BulkJobModel) -> dict[str, Any]:
+    return {
+        "job_id": job.id,
+        "name": job.name,
+        "status": job.status,
+        "input_format": job.input_format,
+        "total_rows": job.total_rows,
+        "done_rows": job.done_rows,
+        "failed_rows": job.failed_rows,
+        "cursor": job.last_seq,
+        "dedup": dedup_helper.dedup_report(job.total_rows or 0, job.unique_configs or 0),
+        "concurrency": job.concurrency,
+        "error": job.error,
+        "createdAt": job.created_at.isoformat() if job.created_at else None,
+        "updatedAt": job.updated_at.isoformat() if job.updated_at else None,
+        "completedAt": job.completed_at.isoformat() if job.completed_at else None,
+    }
@@ -0,0 +1,412 @@
+import asyncio
+import functools
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from types import SimpleNamespace
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger("budli-api")
+
+# record: every Bedrock call, BrowserUse session / run, velocity HTTP fetch and Playwright scrape is appended
+# to CASSETTE_PATH (JSON lines) with its response or error and how long it took. replay: the same calls are
+# answered from the cassette instead (no network), so a job can be re-run on exactly the recorded inputs.
+MODE = os.getenv("CASSETTE_MODE", "").strip().lower()
+PATH = os.getenv("CASSETTE_PATH", "cassette.jsonl")
+# Replay pacing: fast (no waiting), original (each call takes as long as it did when recorded), or a factor.
+TIMING = os.getenv("CASSETTE_TIMING", "fast").strip().lower()
+
+
+class CassetteMiss(Exception):
+    """Replay found no recorded interaction for a call."""
+
+
+class ReplayedError(Exception):
+    """A recorded call failed; replay raises this (or botocore's ClientError for Bedrock) in its place."""
+
+
+def _digest(*parts: Any) -> str:
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()[:32]
+
+
+def _timing_factor() -> float:
+    if TIMING in ("", "fast"):
+        return 0.0
+    if TIMING == "original":
+        return 1.0
+    return float(TIMING)
+
+
+def _error(e: BaseException) -> dict[str, Any]:
+    response = getattr(e, "response", None)
+    code = response.get("Error", {}).get("Code") if isinstance(response, dict) else None
+    return {"type": type(e).__name__, "message": str(e)[:2000], "code": code, "operation": getattr(e, "operation_name", None)}
+
+
+def _replayed_error(error: dict[str, Any]) -> Exception:
+    if error.get("code"):
+        try:
+            from botocore.exceptions import ClientError
+        except ImportError:
+            pass
+        else:
+            return ClientError({"Error": {"Code": error["code"], "Message": error["message"]}}, error.get("operation") or "InvokeModel")
+    return ReplayedError(f"{error['type']}: {error['message']}")
+
+
+class Cassette:
+    """
+    Interactions keyed per kind by an exact request digest and a looser one (for Bedrock: the prompt
+    without the listings JSON). Replay hands each recording out once, exact matches first, in recorded
+    order; a call with nothing left reuses the last recording for its loose key.
+    """
+
+    def __init__(self, path: str, mode: str) -> None:
+        self.path, self.mode = path, mode
+        self.entries: list[dict[str, Any]] = []
+        self.stats: dict[str, dict[str, int]] = {}
+        self._lock = threading.Lock()
+        self._exact: dict[tuple[str, str], deque] = {}
+        self._loose: dict[tuple[str, str], deque] = {}
+        self._last: dict[tuple[str, str], int] = {}
+        self._used: set[int] = set()
+        if mode == "replay":
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        self._index(json.loads(line))
+            logger.warning("Replaying external calls from cassette %s (%d interactions, timing=%s)", path, len(self.entries), TIMING)
+        else:
+            logger.warning("Recording external calls to cassette %s", path)
+
+    def rewind(self) -> None:
+        """Make every recording available again and clear the counts (to replay the same job once more)."""
+        with self._lock:
+            entries, self.entries = self.entries, []
+            self._exact, self._loose, self._last, self._used = {}, {}, {}, set()
+            self.stats = {}
+            for entry in entries:
+                self._index(entry)
+
+    def _index(self, entry: dict[str, Any]) -> None:
+        i = len(self.entries)
+        self.entries.append(entry)
+        kind = entry.get("kind")
+        if "exact" not in entry:
+            return  # notes (e.g. a recorded job's inputs and outputs)
+        self._exact.setdefault((kind, entry["exact"]), deque()).append(i)
+        self._loose.setdefault((kind, entry["loose"]), deque()).append(i)
+        self._last[(kind, entry["loose"])] = i
+
+    def _count(self, kind: str, outcome: str) -> None:
+        counts = self.stats.setdefault(kind, {})
+        counts[outcome] = counts.get(outcome, 0) + 1
+
+    def append(self, entry: dict[str, Any]) -> None:
+        line = json.dumps(entry, ensure_ascii=False, default=str)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+            if "exact" in entry:
+                self._count(entry["kind"], "recorded")
+
+    def record(
+        self, kind: str, exact: str, loose: str, request: Any, elapsed: float,
+        response: Any = None, error: Optional[BaseException] = None,
+    ) -> None:
+        entry = {"kind": kind, "exact": exact, "loose": loose, "request": request, "elapsed_ms": round(elapsed * 1000, 1)}
+        if error is not None:
+            entry["error"] = _error(error)
+        else:
+            entry["response"] = response
+        self.append(entry)
+
+    def take(self, kind: str, exact: str, loose: str, describe: str = "") -> dict[str, Any]:
+        with self._lock:
+            for outcome, queues, key in (("exact", self._exact, exact), ("loose", self._loose, loose)):
+                queue = queues.get((kind, key))
+                while queue and queue[0] in self._used:
+                    queue.popleft()
+                if queue:
+                    i = queue.popleft()
+                    self._used.add(i)
+                    self._count(kind, outcome)
+                    return self.entries[i]
+            i = self._last.get((kind, loose))
+            self._count(kind, "reused" if i is not None else "missed")
+        if i is None:
+            raise CassetteMiss(f"No recorded {kind} call for {describe or exact}")
+        return self.entries[i]
+
+    def notes(self, kind: str) -> list[dict[str, Any]]:
+        return [e for e in self.entries if e.get("kind") == kind and "exact" not in e]
+
+
+_cassette: Optional[Cassette] = None
+_cassette_lock = threading.Lock()
+
+
+def _get() -> Optional[Cassette]:
+    global _cassette
+    if MODE not in ("record", "replay"):
+        return None
+    with _cassette_lock:
+        if _cassette is None:
+            _cassette = Cassette(PATH, MODE)
+        return _cassette
+
+
+def recording() -> bool:
+    return MODE == "record"
+
+
+def replaying() -> bool:
+    return MODE == "replay"
+
+
+def cassette() -> Optional[Cassette]:
+    return _get()
+
+
+def stats() -> dict[str, Any]:
+    """Recorded / exact / loose / reused / missed calls per kind (for /health)."""
+    c = _get()
+    return {"mode": MODE, "path": PATH, "timing": TIMING if replaying() else None, **({"calls": c.stats} if c else {})}
+
+
+def _pause(entry: dict[str, Any]) -> None:
+    factor = _timing_factor()
+    if factor:
+        time.sleep(entry.get("elapsed_ms", 0) / 1000 * factor)
+
+
+async def _apause(entry: dict[str, Any]) -> None:
+    factor = _timing_factor()
+    if factor:
+        await asyncio.sleep(entry.get("elapsed_ms", 0) / 1000 * factor)
+
+
+# --- Bedrock ---
+
+def _bedrock_keys(model_id: str, body: Any) -> tuple[str, str, Any]:
+    text = body.decode("utf-8") if isinstance(body, (bytes, bytearray)) else str(body)
+    exact = _digest(model_id, text)
+    try:
+        request = json.loads(text)
+        prompt = request["messages"][0]["content"]
+    except (ValueError, KeyError, IndexError, TypeError):
+        return exact, exact, text
+    # The query part of the prompt, without the listings: still matches when the listings sent change.
+    head = prompt.split("\nDevices (JSON):")[0] if isinstance(prompt, str) else prompt
+    return exact, _digest(model_id, request.get("system"), head), request
+
+
+class RecordingBedrockRuntime:
+    def __init__(self, client: Any, cassette_: Cassette) -> None:
+        self._client, self._cassette = client, cassette_
+
+    def invoke_model(self, modelId: str, body: Any, **kwargs: Any) -> dict[str, Any]:
+        exact, loose, request = _bedrock_keys(modelId, body)
+        start = time.perf_counter()
+        try:
+            resp = self._client.invoke_model(modelId=modelId, body=body, **kwargs)
+            raw = resp["body"].read()
+        except Exception as e:
+            self._cassette.record("bedrock", exact, loose, {"modelId": modelId, "body": request}, time.perf_counter() - start, error=e)
+            raise
+        self._cassette.record(
+            "bedrock", exact, loose, {"modelId": modelId, "body": request}, time.perf_counter() - start,
+            response={"body": raw.decode("utf-8"), "contentType": resp.get("contentType")},
+        )
+        return {**resp, "body": io.BytesIO(raw)}
+
+
+class ReplayBedrockRuntime:
+    def __init__(self, cassette_: Cassette) -> None:
+        self._cassette = cassette_
+
+    def invoke_model(self, modelId: str, body: Any, **_: Any) -> dict[str, Any]:
+        exact, loose, _request = _bedrock_keys(modelId, body)
+        entry = self._cassette.take("bedrock", exact, loose, f"{modelId} prompt {loose}")
+        _pause(entry)
+        if "error" in entry:
+            raise _replayed_error(entry["error"])
+        response = entry["response"]
+        return {"body": io.BytesIO(response["body"].encode("utf-8")), "contentType": response.get("contentType")}
+
+
+def bedrock_runtime(client: Any = None) -> Any:
+    """The replaying client, or `client` wrapped to record its calls."""
+    c = _get()
+    return ReplayBedrockRuntime(c) if c.mode == "replay" else RecordingBedrockRuntime(client, c)
+
+
+def recorded_model_id() -> Optional[str]:
+    """Model id of the first recorded Bedrock call (replay works without BEDROCK_MODEL_ID)."""
+    c = _get()
+    for e in c.entries if c else []:
+        if e.get("kind") == "bedrock":
+            return e["request"]["modelId"]
+    return None
+
+
+# --- BrowserUse ---
+
+def _schema_name(output_schema: Any) -> Optional[str]:
+    return getattr(output_schema, "__name__", None)
+
+
+class _RecordingSessions:
+    def __init__(self, sessions: Any, cassette_: Cassette) -> None:
+        self._sessions, self._cassette = sessions, cassette_
+
+    async def create(self, **kwargs: Any) -> Any:
+        start = time.perf_counter()
+        try:
+            session = await self._sessions.create(**kwargs)
+        except Exception as e:
+            self._cassette.record("browseruse.session", "create", "create", {}, time.perf_counter() - start, error=e)
+            raise
+        self._cassette.record(
+            "browseruse.session", "create", "create", {}, time.perf_counter() - start,
+            response={"id": str(session.id), "live_url": getattr(session, "live_url", None)},
+        )
+        return session
+
+
+class RecordingBrowserUse:
+    def __init__(self, client: Any, cassette_: Cassette) -> None:
+        self._client, self._cassette = client, cassette_
+        self.sessions = _RecordingSessions(client.sessions, cassette_)
+
+    async def run(self, prompt: str, session_id: Optional[str] = None, output_schema: Any = None, **kwargs: Any) -> Any:
+        key = _digest(prompt, _schema_name(output_schema))
+        request = {"prompt": prompt, "output_schema": _schema_name(output_schema)}
+        start = time.perf_counter()
+        try:
+            result = await self._client.run(prompt, session_id=session_id, output_schema=output_schema, **kwargs)
+        except Exception as e:
+            self._cassette.record("browseruse.run", key, key, request, time.perf_counter() - start, error=e)
+            raise
+        output = result.output
+        if hasattr(output, "model_dump"):
+            output = output.model_dump(mode="json")
+        elif isinstance(output, SimpleNamespace):
+            output = vars(output)
+        self._cassette.record("browseruse.run", key, key, request, time.perf_counter() - start, response={"output": output})
+        return result
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
+
+
+class _ReplaySessions:
+    def __init__(self, cassette_: Cassette) -> None:
+        self._cassette = cassette_
+
+    async def create(self, **_: Any) -> Any:
+        entry = self._cassette.take("browseruse.session", "create", "create", "sessions.create()")
+        await _apause(entry)
+        if "error" in entry:
+            raise _replayed_error(entry["error"])
+        return SimpleNamespace(**entry["response"])
+
+
+class ReplayBrowserUse:
+    def __init__(self, cassette_: Cassette) -> None:
+        self._cassette = cassette_
+        self.sessions = _ReplaySessions(cassette_)
+
+    async def run(self, prompt: str, session_id: Optional[str] = None, output_schema: Any = None, **_: Any) -> Any:
+        key = _digest(prompt, _schema_name(output_schema))
+        entry = self._cassette.take("browseruse.run", key, key, prompt[:120])
+        await _apause(entry)
+        if "error" in entry:
+            raise _replayed_error(entry["error"])
+        output = entry["response"]["output"]
+        if output_schema is not None and output is not None:
+            output = output_schema.model_validate(output)
+        return SimpleNamespace(id=str(uuid.uuid4()), session_id=session_id, output=output)
+
+
+def browser_use(client: Any = None) -> Any:
+    """The replaying client, or `client` wrapped to record its calls."""
+    c = _get()
+    return ReplayBrowserUse(c) if c.mode == "replay" else RecordingBrowserUse(client, c)
+
+
+# --- velocity scrapers ---
+
+class _Response:
+    def __init__(self, url: str, status_code: int, text: str) -> None:
+        self.url, self.status_code, self.text = url, status_code, text
+
+    @property
+    def content(self) -> bytes:
+        return self.text.encode("utf-8")
+
+    def json(self) -> Any:
+        return json.loads(self.text)
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            raise ReplayedError(f"HTTP {self.status_code} for {self.url}")
+
+
+def http_get(get: Callable[..., Any], url: str, **kwargs: Any) -> Any:
+    """get(url, **kwargs) (requests / curl_cffi), recorded or replayed when a cassette is active."""
+    c = _get()
+    if c is None:
+        return get(url, **kwargs)
+    key = _digest("GET", url)
+    if c.mode == "replay":
+        entry = c.take("http", key, key, f"GET {url}")
+        _pause(entry)
+        if "error" in entry:
+            raise _replayed_error(entry["error"])
+        return _Response(url, entry["response"]["status_code"], entry["response"]["text"])
+    start = time.perf_counter()
+    try:
+        res = get(url, **kwargs)
+    except Exception as e:
+        c.record("http", key, key, {"method": "GET", "url": url}, time.perf_counter() - start, error=e)
+        raise
+    c.record("http", key, key, {"method": "GET", "url": url}, time.perf_counter() - start,
+             response={"status_code": res.status_code, "text": res.text})
+    return res
+
+
+def recorded(kind: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Record / replay a whole (sync) function's JSON-serializable result by its arguments, e.g. a Playwright scrape."""
+
+    def decorate(fn: Callable[..., Any]) -> Callable[..., Any]:
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            c = _get()
+            if c is None:
+                return fn(*args, **kwargs)
+            key = _digest(args, kwargs)
+            if c.mode == "replay":
+                entry = c.take(kind, key, key, f"{fn.__name__}{args}")
+                _pause(entry)
+                if "error" in entry:
+                    raise _replayed_error(entry["error"])
+                return entry["response"]
+            start = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                c.record(kind, key, key, {"args": args, "kwargs": kwargs}, time.perf_counter() - start, error=e)
+                raise
+            c.record(kind, key, key, {"args": args, "kwargs": kwargs}, time.perf_counter() - start, response=result)
+            return result
+
+        return wrapper
+
+    return decorate
@@ -0,0 +1,118 @@
+import asyncio
+import re
+from typing import Any, Awaitable, Callable, Hashable, Iterable, Mapping, Optional
+
+# Row fields that feed the pricing prompt; rows equal on all of them get the same price.
+CONFIG_KEY_FIELDS = (
+    "brand",
+    "model",
+    "storage_gb",
+    "ram_gb",
+    "network_type",
+    "condition_tier",
+    "warranty_months",
+)
+
+
+def _norm_text(value: Any) -> str:
+    return re.sub(r"\s+", " ", str(value or "")).strip().lower()
+
+
+def _norm_gb(value: Any) -> str:
+    # "128", "128GB", "128 gb" -> "128"
+    return re.sub(r"\s*gb$", "", _norm_text(value))
+
+
+def _norm_int(value: Any) -> str:
+    text = _norm_text(value)
+    try:
+        return str(int(float(text)))
+    except ValueError:
+        return text
+
+
+def config_key(row: Mapping[str, Any]) -> tuple[str, ...]:
+    """Normalized config key for a device row (CSV row / NDJSON record / request item dict)."""
+    return (
+        _norm_text(row.get("brand")),
+        _norm_text(row.get("model")),
+        _norm_gb(row.get("storage_gb")),
+        _norm_gb(row.get("ram_gb")),
+        _norm_text(row.get("network_type")),
+        _norm_text(row.get("condition_tier")),
+        _norm_int(row.get("warranty_months")),
+    )
+
+
+def config_key_str(row: Mapping[str, Any]) -> str:
+    """config_key joined into a single string (for storage in a DB column)."""
+    return "|".join(config_key(row))
+
+
+def dedup_report(total: int, unique: int) -> dict[str, Any]:
+    """Rows vs distinct configs; `ratio` is rows per priced config (1.0 = no duplicates)."""
+    return {
+        "rows": total,
+        "unique_configs": unique,
+        "duplicates": total - unique,
+        "ratio": round(total / unique, 3) if unique else 1.0,
+    }
+
+
+def group_rows(rows: Iterable[Mapping[str, Any]]) -> dict[tuple[str, ...], list[int]]:
+    """Map each distinct config key to the (0-based) positions of the rows that share it."""
+    groups: dict[tuple[str, ...], list[int]] = {}
+    for i, row in enumerate(rows):
+        groups.setdefault(config_key(row), []).append(i)
+    return groups
+
+
+class SingleFlight:
+    """
+    Async memo keyed by config: the first caller for a key runs the work, concurrent and later
+    callers with the same key await / reuse that result. Tracks counts for a dedup report.
+    A failed call is not cached, so the next caller for that key retries.
+    """
+
+    def __init__(self) -> None:
+        self._futures: dict[Hashable, asyncio.Future] = {}
+        self.total = 0
+
+    @property
+    def unique(self) -> int:
+        return len(self._futures)
+
+    def report(self) -> dict[str, Any]:
+        return dedup_report(self.total, self.unique)
+
+    def seed(self, key: Hashable, result: Any) -> None:
+        """Pre-populate a key with a known result (e.g. from an earlier run)."""
+        fut = asyncio.get_running_loop().create_future()
+        fut.set_result(result)
+        self._futures[key] = fut
+
+    def peek(self, key: Hashable) -> Optional[asyncio.Future]:
+        return self._futures.get(key)
+
+    async def run(self, key: Hashable, work: Callable[[], Awaitable[Any]]) -> Any:
+        self.total += 1
+        fut = self._futures.get(key)
+        if fut is not None:
+            # shield: a cancelled follower must not cancel the leader's shared result.
+            return await asyncio.shield(fut)
+        fut = asyncio.get_running_loop().create_future()
+        self._futures[key] = fut
+        try:
+            result = await work()
+        except asyncio.CancelledError:
+            self._futures.pop(key, None)
+            fut.cancel()
+            raise
+        except Exception as e:
+            self._futures.pop(key, None)
+            fut.set_exception(e)
+            # Mark retrieved so a failure nobody else awaited doesn't log "exception never retrieved".
+            fut.exception()
+            raise
+        fut.set_result(result)
+        return result
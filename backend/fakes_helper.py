@@ -0,0 +1,402 @@
+import asyncio
+import hashlib
+import io
+import json
+import logging
+import math
+import os
+import random
+import re
+import statistics
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Iterator, Optional
+
+logger = logging.getLogger("budli-api")
+
+# Comma-separated services to replace with the in-process fakes below: bedrock, browseruse, velocity (or all).
+# For offline load and concurrency testing only; nothing here talks to the network.
+FAKE_SERVICES = {s.strip().lower() for s in os.getenv("FAKE_SERVICES", "").split(",") if s.strip()}
+# Multiplies every injected latency (e.g. 0.01 runs a 30 s BrowserUse task in 0.3 s).
+LATENCY_SCALE = float(os.getenv("FAKE_LATENCY_SCALE", "1"))
+# Seeds latency / error draws; generated content is always derived from the request.
+SEED = os.getenv("FAKES_SEED")
+# Used when BEDROCK_MODEL_ID is unset and Bedrock is faked (priced like the real model in llm_usage_helper).
+FAKE_BEDROCK_MODEL_ID = "anthropic.claude-3-5-haiku-20241022-v1:0"
+
+_warned: set[str] = set()
+
+
+def enabled(service: str) -> bool:
+    on = service in FAKE_SERVICES or "all" in FAKE_SERVICES
+    if on and service not in _warned:
+        _warned.add(service)
+        logger.warning("Using the fake %s client (FAKE_SERVICES=%s)", service, ",".join(sorted(FAKE_SERVICES)))
+    return on
+
+
+class FakeServiceError(Exception):
+    """An injected failure of a faked service."""
+
+
+class FakeThrottlingError(FakeServiceError):
+    """An injected throttle (rate limit or concurrency cap exceeded)."""
+
+
+@dataclass
+class Knobs:
+    """Latency is lognormal with the given median and p95 (constant when p95 <= median)."""
+
+    latency_ms: float
+    latency_p95_ms: float
+    error_rate: float = 0.0
+    throttle_rate: float = 0.0
+    max_concurrency: int = 0  # calls in flight beyond this are throttled; 0 = unlimited
+
+    @classmethod
+    def from_env(cls, name: str, latency_ms: float, latency_p95_ms: float) -> "Knobs":
+        prefix = f"FAKE_{name}_"
+        return cls(
+            latency_ms=float(os.getenv(prefix + "LATENCY_MS", latency_ms)),
+            latency_p95_ms=float(os.getenv(prefix + "LATENCY_P95_MS", latency_p95_ms)),
+            error_rate=float(os.getenv(prefix + "ERROR_RATE", "0")),
+            throttle_rate=float(os.getenv(prefix + "THROTTLE_RATE", "0")),
+            max_concurrency=int(os.getenv(prefix + "MAX_CONCURRENCY", "0")),
+        )
+
+
+class _Injector:
+    """Latency, errors and throttling for one faked operation. Safe to share across threads."""
+
+    def __init__(self, name: str, knobs: Knobs) -> None:
+        self.name = name
+        self.knobs = knobs
+        self._rng = random.Random(f"{SEED}:{name}" if SEED is not None else None)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.stats = {"calls": 0, "errors": 0, "throttled": 0, "max_in_flight": 0}
+
+    def _latency_s(self) -> float:
+        k = self.knobs
+        if k.latency_ms <= 0:
+            return 0.0
+        sigma = math.log(k.latency_p95_ms / k.latency_ms) / 1.645 if k.latency_p95_ms > k.latency_ms else 0.0
+        return k.latency_ms * math.exp(sigma * self._rng.gauss(0, 1)) / 1000 * LATENCY_SCALE
+
+    def _admit(self) -> tuple[float, Optional[FakeServiceError]]:
+        """Draw this call's latency and outcome; throttled calls are rejected at once (no slot taken)."""
+        k = self.knobs
+        with self._lock:
+            self.stats["calls"] += 1
+            if (k.max_concurrency and self._in_flight >= k.max_concurrency) or self._rng.random() < k.throttle_rate:
+                self.stats["throttled"] += 1
+                raise FakeThrottlingError(f"{self.name}: throttled (injected)")
+            self._in_flight += 1
+            self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self._in_flight)
+            latency = self._latency_s()
+            error = None
+            if self._rng.random() < k.error_rate:
+                self.stats["errors"] += 1
+                error = FakeServiceError(f"{self.name}: failed (injected)")
+        return latency, error
+
+    def _release(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+    @contextmanager
+    def call(self) -> Iterator[None]:
+        latency, error = self._admit()
+        try:
+            time.sleep(latency)
+            if error:
+                raise error
+            yield
+        finally:
+            self._release()
+
+    @asynccontextmanager
+    async def acall(self) -> AsyncIterator[None]:
+        latency, error = self._admit()
+        try:
+            await asyncio.sleep(latency)
+            if error:
+                raise error
+            yield
+        finally:
+            self._release()
+
+
+def _stable_rng(*parts: Any) -> random.Random:
+    # Content depends only on the request, so repeated runs price the same devices the same way.
+    return random.Random(hashlib.sha256("|".join(map(str, parts)).encode("utf-8")).hexdigest())
+
+
+def _base_price(text: str) -> int:
+    return _stable_rng("price", text.lower()).randrange(9000, 70000, 100)
+
+
+def _rupees(n: int) -> str:
+    # Indian digit grouping, as the sites show it: 1,23,456
+    s = str(n)
+    head, tail = s[:-3], s[-3:]
+    groups = []
+    while len(head) > 2:
+        groups.insert(0, head[-2:])
+        head = head[:-2]
+    return ",".join(([head] if head else []) + groups + [tail])
+
+
+def _price_value(raw: Any) -> Optional[int]:
+    digits = re.sub(r"[^\d.]", "", str(raw or "")).split(".")[0]
+    return int(digits) if digits else None
+
+
+# --- Bedrock (bedrock-runtime invoke_model) ---
+
+class FakeBedrockRuntime:
+    """
+    invoke_model() for Anthropic messages bodies. Answers the prompts this app sends with schema-valid
+    output: a pricing JSON object (recommended_price from the listings in the prompt), one per device for
+    batched pricing prompts, a JSON array for the marketplace filters, bullet text otherwise; with a usage
+    block sized from the prompt.
+    """
+
+    def __init__(self, knobs: Optional[Knobs] = None) -> None:
+        self.injector = _Injector("bedrock", knobs or Knobs.from_env("BEDROCK", 1500, 4000))
+
+    def invoke_model(self, modelId: str, body: bytes, contentType: str = "", accept: str = "") -> dict[str, Any]:
+        try:
+            with self.injector.call():
+                request = json.loads(body)
+        except FakeServiceError as e:
+            raise _bedrock_client_error(e) from None
+        system = request.get("system") or ""
+        prompt = "".join(
+            m["content"] if isinstance(m.get("content"), str) else json.dumps(m.get("content"))
+            for m in request.get("messages") or []
+        )
+        if "strict filter" in system:
+            text = json.dumps(_filter_answer(prompt), ensure_ascii=False)
+        elif "one object per device" in system:
+            text = json.dumps(_batch_pricing_answer(prompt), ensure_ascii=False)
+        elif "recommended_price" in system:
+            text = json.dumps(_pricing_answer(prompt), ensure_ascii=False)
+        else:
+            text = "- Fake analysis: listings look consistent; no anomalies flagged."
+        out = {
+            "id": "msg_fake_" + uuid.uuid4().hex[:16],
+            "type": "message",
+            "role": "assistant",
+            "model": modelId,
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": "end_turn",
+            "usage": {"input_tokens": (len(system) + len(prompt)) // 4, "output_tokens": max(len(text) // 4, 1)},
+        }
+        return {"body": io.BytesIO(json.dumps(out, ensure_ascii=False).encode("utf-8")), "contentType": "application/json"}
+
+
+def _bedrock_client_error(e: FakeServiceError) -> Exception:
+    # Raise what boto3 raises, so callers' error handling sees the real exception type.
+    try:
+        from botocore.exceptions import ClientError
+    except ImportError:
+        return e
+    code, status = ("ThrottlingException", 429) if isinstance(e, FakeThrottlingError) else ("ServiceUnavailableException", 503)
+    return ClientError({"Error": {"Code": code, "Message": str(e)}, "ResponseMetadata": {"HTTPStatusCode": status}}, "InvokeModel")
+
+
+def _prompt_section(prompt: str, start: str, end: str) -> str:
+    i = prompt.find(start)
+    if i < 0:
+        return ""
+    i += len(start)
+    j = prompt.find(end, i)
+    return prompt[i:j if j >= 0 else None]
+
+
+def _prompt_devices(prompt: str) -> list[dict]:
+    try:
+        devices = json.loads(_prompt_section(prompt, "Devices (JSON):\n", "\n\nReturn a concise analysis"))
+    except ValueError:
+        return []
+    return [d for d in devices if isinstance(d, dict)] if isinstance(devices, list) else []
+
+
+def _prompt_field(prompt: str, name: str) -> str:
+    m = re.search(rf"^-? ?{name}: *(.*)$", prompt, re.MULTILINE)
+    return m.group(1).strip() if m else ""
+
+
+def _pricing_answer(prompt: str) -> dict[str, Any]:
+    model = _prompt_field(prompt, "Model")
+    storage = re.sub(r"\D", "", _prompt_field(prompt, "Storage"))
+    prices, matched = [], []
+    for d in _prompt_devices(prompt):
+        price = _price_value(d.get("Price") or d.get("price"))
+        if price is None:
+            continue
+        prices.append(price)
+        name = str(d.get("Model") or d.get("name") or "")
+        if model.lower() in name.lower() and (not storage or storage in str(d.get("Storage") or d.get("storage") or name)):
+            matched.append(price)
+    if not prices:
+        return {"recommended_price": None, "explanation": "No data found.", "risk_flags": ["No matching data"]}
+    pool = matched or prices
+    flags = [] if matched else ["No matching config"]
+    if len(pool) < 3:
+        flags.append("Data sparse")
+    return {
+        "recommended_price": int(statistics.median_low(pool)),
+        "explanation": f"Matched {len(pool)} of {len(prices)} scraped listings for {model or 'the device'}.",
+        "risk_flags": flags,
+    }
+
+
+def _batch_pricing_answer(prompt: str) -> list[dict[str, Any]]:
+    # Batched pricing prompts list the devices as "Device id: <id>" blocks ahead of the shared listings.
+    listings = prompt[prompt.find("Devices (JSON):\n"):]
+    blocks = re.split(r"^Device id: *", _prompt_section(prompt, "Query:\n", "\nDevices (JSON):"), flags=re.MULTILINE)
+    out = []
+    for block in blocks[1:]:
+        device_id, _, fields = block.partition("\n")
+        out.append({"id": device_id.strip(), **_pricing_answer(fields + "\n" + listings)})
+    return out
+
+
+_ACCESSORY_WORDS = ("case", "cover", "glass", "protector", "charger", "cable", "adapter", "stand", "holder", "strap")
+
+
+def _filter_answer(prompt: str) -> list[dict]:
+    model = _prompt_field(prompt, "Model").lower()
+    return [
+        d for d in _prompt_devices(prompt)
+        if model in str(d.get("title") or "").lower() and not any(w in str(d.get("title")).lower() for w in _ACCESSORY_WORDS)
+    ]
+
+
+# --- BrowserUse (AsyncBrowserUse) ---
+
+_SOURCE_DOMAINS = {"ovantica.com": "ovantica", "refitglobal.com": "refitglobal", "cashify.in": "cashify"}
+
+
+class _FakeSessions:
+    def __init__(self, injector: _Injector) -> None:
+        self._injector = injector
+
+    async def create(self) -> Any:
+        async with self._injector.acall():
+            session_id = str(uuid.uuid4())
+            return SimpleNamespace(id=session_id, live_url=f"https://live.fake-browser-use.local/{session_id}")
+
+
+class FakeAsyncBrowserUse:
+    """
+    sessions.create() and run(prompt, session_id=, output_schema=) like AsyncBrowserUse. run() returns
+    listings for the query in the prompt (same query and source -> same listings), validated into
+    output_schema.
+    """
+
+    def __init__(self, session_knobs: Optional[Knobs] = None, run_knobs: Optional[Knobs] = None) -> None:
+        self.session_injector = _Injector("browseruse.session", session_knobs or Knobs.from_env("BROWSERUSE_SESSION", 800, 2500))
+        self.run_injector = _Injector("browseruse.run", run_knobs or Knobs.from_env("BROWSERUSE_RUN", 30000, 90000))
+        self.sessions = _FakeSessions(self.session_injector)
+
+    async def run(self, prompt: str, session_id: Optional[str] = None, output_schema: Any = None, **_: Any) -> Any:
+        async with self.run_injector.acall():
+            m = re.search(r"second hand (.+?) with the different configs", prompt)
+            query = m.group(1) if m else prompt[:80]
+            source = next((s for domain, s in _SOURCE_DOMAINS.items() if domain in prompt), "unknown")
+            items = _listings(query, source)
+        output = output_schema.model_validate({"items": items}) if output_schema is not None else SimpleNamespace(items=items)
+        return SimpleNamespace(id=str(uuid.uuid4()), session_id=session_id, output=output)
+
+
+def _listings(query: str, source: str) -> list[dict[str, str]]:
+    rng = _stable_rng("listings", query.lower(), source)
+    base = _base_price(query)
+    model = re.sub(r"^(apple|samsung|oneplus|xiaomi|google|vivo|oppo|realme|motorola)\s+", "", query, flags=re.IGNORECASE)
+    rows = []
+    for _ in range(rng.randint(3, 12)):
+        storage, condition = rng.choice([64, 128, 256, 512]), rng.choice(["Superb", "Good", "Fair"])
+        factor = {64: 0.9, 128: 1.0, 256: 1.12, 512: 1.3}[storage] * {"Superb": 1.08, "Good": 1.0, "Fair": 0.88}[condition]
+        rows.append({
+            "Storage": f"{storage}GB",
+            "Model": model,
+            "Ram": f"{rng.choice([4, 6, 8])}GB",
+            "Color": rng.choice(["Black", "Blue", "White", "Green"]),
+            "Condition": condition,
+            "Price": "₹" + _rupees(int(base * factor * rng.uniform(0.95, 1.05)) // 100 * 100),
+        })
+    return rows
+
+
+# --- Velocity (Amazon / Flipkart search pages) ---
+
+def velocity_items(site: str, model: str, ram: str, storage: str, color: str, limit: int) -> list[dict[str, Optional[str]]]:
+    """Marketplace search results for the config (plus an accessory listing the filters should drop)."""
+    with _velocity_injector().call():
+        rng = _stable_rng("velocity", site, model.lower(), ram, storage, color)
+        price = _base_price(model) + 20000
+        items: list[dict[str, Optional[str]]] = []
+        for i in range(limit):
+            title = f"Spigen Back Cover Case for {model}" if i == 2 else f"{model} ({storage}, {ram} RAM) - {color}"
+            pid = "".join(rng.choice("ABCDEFGHJKLMNPQRSTUVWXYZ0123456789") for _ in range(10))
+            if site == "amazon":
+                items.append({
+                    "title": title,
+                    "link": f"https://www.amazon.in/dp/{pid}",
+                    "rating": f"4.{rng.randint(0, 7)} out of 5 stars",
+                    "reviews": _rupees(rng.randint(50, 90000)),
+                    "bought": f"{rng.choice(['100+', '500+', '1K+', '2K+'])} bought in past month" if rng.random() < 0.7 else None,
+                })
+            else:
+                items.append({
+                    "title": title,
+                    "link": f"https://www.flipkart.com/p/itm{pid.lower()}",
+                    "price": "₹" + _rupees(price + rng.randrange(-3000, 3000, 100)),
+                    "rating": f"4.{rng.randint(0, 7)} ★ | {_rupees(rng.randint(500, 300000))} Ratings & {_rupees(rng.randint(50, 12000))} Reviews",
+                })
+        return items
+
+
+_instances: dict[str, Any] = {}
+_instances_lock = threading.Lock()
+
+
+def _shared(name: str, factory: Any) -> Any:
+    with _instances_lock:
+        if name not in _instances:
+            _instances[name] = factory()
+        return _instances[name]
+
+
+def bedrock_runtime() -> FakeBedrockRuntime:
+    return _shared("bedrock", FakeBedrockRuntime)
+
+
+def browser_use() -> FakeAsyncBrowserUse:
+    return _shared("browseruse", FakeAsyncBrowserUse)
+
+
+def _velocity_injector() -> _Injector:
+    return _shared("velocity", lambda: _Injector("velocity", Knobs.from_env("VELOCITY", 1200, 4000)))
+
+
+def stats() -> dict[str, Any]:
+    """Calls, injected errors / throttles and peak concurrency per fake in use (for /health)."""
+    with _instances_lock:
+        instances = dict(_instances)
+    injectors: list[_Injector] = []
+    for obj in instances.values():
+        if isinstance(obj, _Injector):
+            injectors.append(obj)
+        elif isinstance(obj, FakeAsyncBrowserUse):
+            injectors += [obj.session_injector, obj.run_injector]
+        else:
+            injectors.append(obj.injector)
+    return {i.name: dict(i.stats) for i in injectors}
@@ -0,0 +1,75 @@
+"""
+Cold-start import budget for the API.
+
+    python import_budget.py                      # report the cost of `import app`, per package
+    python import_budget.py --budget-ms 1500     # also fail when the total exceeds the budget
+    python import_budget.py --module migrations --top 10
+
+Imports the module in fresh interpreters with `python -X importtime` (best of --repeat runs), sums
+each package's own import time and prints the most expensive ones. Exits 1 when the total is over
+budget (--budget-ms, or IMPORT_BUDGET_MS) or when one of LAZY_PACKAGES got imported eagerly.
+No database is needed: nothing connects at import time.
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+from typing import Optional
+
+# Heavy dependencies that must only be imported on first use (inside the function that needs them).
+LAZY_PACKAGES = ("playwright", "bs4", "lxml", "curl_cffi", "boto3", "botocore", "requests", "browser_use_sdk")
+
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)")
+
+
+def measure(module: str) -> tuple[int, dict[str, int]]:
+    """(total µs for `import module`, own µs per top-level package) from one fresh interpreter."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    total = 0
+    by_package: dict[str, int] = {}
+    for line in proc.stderr.splitlines():
+        m = _LINE.match(line)
+        if not m:
+            continue
+        self_us, cumulative_us, indent, name = int(m.group(1)), int(m.group(2)), m.group(3), m.group(4)
+        package = name.split(".")[0]
+        by_package[package] = by_package.get(package, 0) + self_us
+        if name == module and len(indent) == 1:
+            total = cumulative_us
+    return total, by_package
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app")
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", "0")) or None)
+    parser.add_argument("--repeat", type=int, default=3, help="runs; the fastest is reported (less noise)")
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    total, by_package = min((measure(args.module) for _ in range(max(args.repeat, 1))), key=lambda r: r[0])
+    print(f"import {args.module}: {total / 1000:.1f} ms")
+    for package, us in sorted(by_package.items(), key=lambda kv: -kv[1])[: args.top]:
+        print(f"  {us / 1000:8.1f} ms  {package}")
+
+    failed = False
+    eager = [p for p in LAZY_PACKAGES if p in by_package]
+    if eager:
+        print(f"FAIL  imported eagerly (should be lazy): {', '.join(eager)}")
+        failed = True
+    if args.budget_ms is not None and total / 1000 > args.budget_ms:
+        print(f"FAIL  {total / 1000:.1f} ms is over the {args.budget_ms:.0f} ms budget")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+import math
+import os
+import re
+from typing import Any, Iterable, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from listings_helper import canonical_model
+
+# A correction is applied only after this many reviews of the same brand / model / condition.
+MIN_SAMPLES = int(os.getenv("KB_CORRECTION_MIN_SAMPLES", "3"))
+# Shrinks the mean delta towards 0 as if PRIOR extra reviews had delta 0: adjustment = mean * n / (n + PRIOR).
+PRIOR = float(os.getenv("KB_CORRECTION_PRIOR", "2"))
+
+
+def _norm(value: Any) -> str:
+    return re.sub(r"\s+", " ", str(value or "")).strip().lower()
+
+
+def correction_key(brand: Any, model: Any, condition_tier: Any) -> tuple[str, str, str]:
+    """(brand, model, condition) as stored in kb_corrections: lower-cased, model canonicalised."""
+    return _norm(brand), canonical_model(model), _norm(condition_tier)
+
+
+def adjustment(samples: int, mean_delta: float) -> int:
+    """Price shift for a key with `samples` reviews averaging `mean_delta`: shrunk towards 0, none below MIN_SAMPLES."""
+    return round(mean_delta * samples / (samples + PRIOR)) if samples >= MIN_SAMPLES else 0
+
+
+def review_delta(human_approved: Any, recommended: Any, base_price: Any = None) -> float:
+    """
+    What a review says about the uncorrected price: human-approved minus base_price, the price before any
+    correction was applied (recommended_price when none was). Measuring against the already-corrected
+    recommendation would only see the leftover error and pull the mean back towards 0.
+    """
+    return float(human_approved) - float(base_price if base_price is not None else recommended)
+
+
+def _batch_stats(deltas: list[float]) -> tuple[int, float, float]:
+    """Welford: (n, mean, M2) of one batch, where M2 is the sum of squared deviations from the mean."""
+    n, mean, m2 = 0, 0.0, 0.0
+    for x in deltas:
+        n += 1
+        d = x - mean
+        mean += d / n
+        m2 += d * (x - mean)
+    return n, mean, m2
+
+
+def record_deltas(db: Session, entries: Iterable[tuple[Any, Any, Any, float]]) -> int:
+    """
+    Fold (brand, model, condition_tier, delta) reviews into kb_corrections, delta from review_delta. Each key's batch is
+    summarised with Welford and merged into the stored (n, mean, M2) with Chan's parallel update,
+    so a review is O(1) regardless of history. Does not commit. Returns the number of keys touched.
+    """
+    by_key: dict[tuple[str, str, str], list[float]] = {}
+    for brand, model, condition_tier, delta in entries:
+        by_key.setdefault(correction_key(brand, model, condition_tier), []).append(float(delta))
+    if not by_key:
+        return 0
+    rows = []
+    for (brand, model, condition_tier), deltas in by_key.items():
+        n, mean, m2 = _batch_stats(deltas)
+        rows.append({"brand": brand, "model": model, "condition_tier": condition_tier, "n": n, "mean": mean, "m2": m2})
+    db.execute(
+        text(
+            """
+            INSERT INTO kb_corrections AS c (brand, model, condition_tier, samples, mean_delta, m2_delta)
+            VALUES (:brand, :model, :condition_tier, :n, :mean, :m2)
+            ON CONFLICT (model, condition_tier, brand) DO UPDATE SET
+                samples = c.samples + EXCLUDED.samples,
+                mean_delta = c.mean_delta
+                    + (EXCLUDED.mean_delta - c.mean_delta) * EXCLUDED.samples / (c.samples + EXCLUDED.samples),
+                m2_delta = c.m2_delta + EXCLUDED.m2_delta
+                    + (EXCLUDED.mean_delta - c.mean_delta) ^ 2 * c.samples * EXCLUDED.samples
+                      / (c.samples + EXCLUDED.samples),
+                updated_at = now()
+            """
+        ),
+        rows,
+    )
+    return len(rows)
+
+
+def rebuild(conn: Connection) -> None:
+    """Recompute every correction from knowledge_base (backfill / repair)."""
+    conn.execute(text("DELETE FROM kb_corrections"))
+    reviews = conn.execute(
+        text(
+            "SELECT brand, model, condition_tier, human_approved_price - COALESCE(base_price, recommended_price) AS delta "
+            "FROM knowledge_base ORDER BY created_at"
+        )
+    ).all()
+    by_key: dict[tuple[str, str, str], list[float]] = {}
+    for r in reviews:
+        by_key.setdefault(correction_key(r.brand, r.model, r.condition_tier), []).append(float(r.delta))
+    if not by_key:
+        return
+    rows = []
+    for (brand, model, condition_tier), deltas in by_key.items():
+        n, mean, m2 = _batch_stats(deltas)
+        rows.append({"brand": brand, "model": model, "condition_tier": condition_tier, "n": n, "mean": mean, "m2": m2})
+    conn.execute(
+        text(
+            "INSERT INTO kb_corrections (brand, model, condition_tier, samples, mean_delta, m2_delta) "
+            "VALUES (:brand, :model, :condition_tier, :n, :mean, :m2)"
+        ),
+        rows,
+    )
+
+
+def lookup(db: Session, brand: Any, model: Any, condition_tier: Any) -> Optional[dict[str, Any]]:
+    """
+    Correction for a device by primary key: the exact brand first, then the brand-less key
+    (reviews saved from the UI carry no brand). None when there are no reviews.
+    """
+    brand_key, model_key, condition_key = correction_key(brand, model, condition_tier)
+    row = db.execute(
+        text(
+            "SELECT brand, samples, mean_delta, m2_delta FROM kb_corrections "
+            "WHERE model = :model AND condition_tier = :condition_tier AND brand IN (:brand, '') "
+            "ORDER BY brand DESC LIMIT 1"
+        ),
+        {"brand": brand_key, "model": model_key, "condition_tier": condition_key},
+    ).first()
+    if not row:
+        return None
+    n = row.samples
+    return {
+        "key": f"{row.brand}|{model_key}|{condition_key}",
+        "samples": n,
+        "mean_delta": round(row.mean_delta, 2),
+        "stddev_delta": round(math.sqrt(row.m2_delta / (n - 1)), 2) if n > 1 else None,
+        "adjustment": adjustment(n, row.mean_delta),
+    }
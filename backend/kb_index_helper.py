@@ -0,0 +1,214 @@
+import heapq
+import math
+import os
+import re
+import statistics
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Iterable, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from listings_helper import canonical_model, parse_gb
+
+# Rows created by other workers are picked up at most this many seconds late.
+REFRESH_SECONDS = float(os.getenv("KB_INDEX_REFRESH_SECONDS", "30"))
+# Entries carry client-supplied createdAt, so one written elsewhere may sort before the watermark;
+# a periodic full reload catches those.
+FULL_RELOAD_SECONDS = float(os.getenv("KB_INDEX_FULL_RELOAD_SECONDS", "900"))
+# "high" confidence: at least MIN_MATCHES neighbours within MATCH_DISTANCE whose prices agree within MAX_SPREAD.
+MIN_MATCHES = int(os.getenv("KB_INSTANT_MIN_MATCHES", "2"))
+MATCH_DISTANCE = float(os.getenv("KB_INSTANT_MATCH_DISTANCE", "0.25"))
+MAX_SPREAD = float(os.getenv("KB_INSTANT_MAX_SPREAD", "0.05"))
+
+_CONDITION_RANK = {
+    "superb": 0, "excellent": 0, "like new": 0, "mint": 0,
+    "very good": 1, "good": 1,
+    "fair": 2, "average": 2,
+    "poor": 3, "bad": 3,
+}
+
+# Distance weights. An identical config approved today is at distance 0.
+_W_MODEL = 4.0  # times (1 - token Jaccard) of canonical model names
+_W_BRAND = 0.5  # both brands known and different
+_W_STORAGE = 1.0  # per doubling
+_W_RAM = 0.5  # per doubling
+_W_MISSING = 0.5  # storage / RAM unknown on either side
+_W_CONDITION = 1.0  # per condition rank step (unknown or unranked mismatch counts as 1)
+_W_AGE = 0.5  # per 180 days, capped at 1
+_AGE_SCALE_DAYS = 180.0
+
+
+@dataclass(frozen=True)
+class _Entry:
+    id: str
+    brand: str
+    model: str
+    tokens: frozenset
+    storage_gb: Optional[int]
+    ram_gb: Optional[int]
+    condition: str
+    price: int
+    created_at: Optional[datetime]
+
+
+def _norm(value: Any) -> str:
+    return re.sub(r"\s+", " ", str(value or "")).strip().lower()
+
+
+def condition_rank(condition_tier: Any) -> Optional[int]:
+    """0 (like new) .. 3 (poor) for known condition names, else None."""
+    return _CONDITION_RANK.get(_norm(condition_tier))
+
+
+def _entry(id: str, brand: Any, model: Any, ram: Any, storage: Any, condition_tier: Any,
+           price: Any, created_at: Optional[datetime]) -> _Entry:
+    canon = canonical_model(model)
+    return _Entry(
+        id=id,
+        brand=_norm(brand),
+        model=canon,
+        tokens=frozenset(canon.split()),
+        storage_gb=parse_gb(storage),
+        ram_gb=parse_gb(ram),
+        condition=_norm(condition_tier),
+        price=int(price),
+        created_at=created_at,
+    )
+
+
+def _size_distance(a: Optional[int], b: Optional[int], weight: float) -> float:
+    if not a or not b:
+        return _W_MISSING
+    return abs(math.log2(a / b)) * weight
+
+
+def _distance(q: _Entry, e: _Entry, now: datetime) -> float:
+    union = q.tokens | e.tokens
+    d = _W_MODEL * (1 - len(q.tokens & e.tokens) / len(union)) if union else _W_MODEL
+    if q.brand and e.brand and q.brand != e.brand:
+        d += _W_BRAND
+    d += _size_distance(q.storage_gb, e.storage_gb, _W_STORAGE)
+    d += _size_distance(q.ram_gb, e.ram_gb, _W_RAM)
+    if q.condition != e.condition:
+        qr, er = _CONDITION_RANK.get(q.condition), _CONDITION_RANK.get(e.condition)
+        d += _W_CONDITION * (abs(qr - er) if qr is not None and er is not None else 1)
+    if e.created_at is not None:
+        age_days = max((now - e.created_at).total_seconds() / 86400, 0.0)
+        d += _W_AGE * min(age_days / _AGE_SCALE_DAYS, 1.0)
+    return d
+
+
+class KBNeighborIndex:
+    """
+    In-process index of human-approved prices for k-nearest-neighbour estimates. Entries are
+    bucketed by model token (an inverted index), so a query only scores entries sharing a token
+    with its model. Writes in this process are added immediately (add_rows); rows written by other
+    workers are pulled incrementally by created_at every REFRESH_SECONDS.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._entries: dict[str, _Entry] = {}
+        self._by_token: dict[str, set[str]] = {}
+        self._watermark: Optional[datetime] = None
+        self._loaded = False
+        self._last_refresh = 0.0
+        self._last_full_load = 0.0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _add(self, e: _Entry) -> None:
+        old = self._entries.get(e.id)
+        if old is not None:
+            for t in old.tokens:
+                self._by_token.get(t, set()).discard(e.id)
+        self._entries[e.id] = e
+        for t in e.tokens:
+            self._by_token.setdefault(t, set()).add(e.id)
+        if e.created_at is not None and (self._watermark is None or e.created_at > self._watermark):
+            self._watermark = e.created_at
+
+    def add_rows(self, rows: Iterable[Any]) -> None:
+        """Add knowledge_base rows (objects with id, brand, model, ram, storage, condition_tier,
+        human_approved_price, created_at)."""
+        with self._lock:
+            for r in rows:
+                self._add(_entry(r.id, r.brand, r.model, r.ram, r.storage, r.condition_tier,
+                                 r.human_approved_price, r.created_at))
+
+    def refresh(self, db: Session, force: bool = False) -> int:
+        """
+        Load entries created since the newest one indexed; everything on the first call and every
+        FULL_RELOAD_SECONDS. No-op within REFRESH_SECONDS of the last refresh unless forced. Returns rows read.
+        """
+        now = time.monotonic()
+        if not force and self._loaded and now - self._last_refresh < REFRESH_SECONDS:
+            return 0
+        full = not self._loaded or now - self._last_full_load >= FULL_RELOAD_SECONDS
+        since = None if full else self._watermark
+        rows = db.execute(
+            text(
+                "SELECT id, brand, model, ram, storage, condition_tier, human_approved_price, created_at "
+                "FROM knowledge_base" + (" WHERE created_at >= :since" if since else "")
+            ),
+            {"since": since} if since else {},
+        ).all()
+        self.add_rows(rows)
+        self._loaded = True
+        self._last_refresh = now
+        if full:
+            self._last_full_load = now
+        return len(rows)
+
+    def nearest(self, brand: Any, model: Any, ram: Any, storage: Any, condition_tier: Any,
+                k: int = 5) -> list[tuple[float, _Entry]]:
+        q = _entry("", brand, model, ram, storage, condition_tier, 0, None)
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            ids = set().union(*(self._by_token.get(t, ()) for t in q.tokens)) if q.tokens else set()
+            candidates = [self._entries[i] for i in ids]
+        return heapq.nsmallest(k, ((_distance(q, e, now), e) for e in candidates), key=lambda x: x[0])
+
+    def estimate(self, brand: Any, model: Any, ram: Any, storage: Any, condition_tier: Any,
+                 k: int = 5) -> dict[str, Any]:
+        """
+        Instant estimate: inverse-distance weighted mean of the k nearest approved prices.
+        confidence is "high" when enough near-identical recent reviews agree, "medium" when the
+        nearest is close, otherwise "low"; "none" when nothing shares a model token.
+        """
+        hits = self.nearest(brand, model, ram, storage, condition_tier, k)
+        neighbors = [
+            {
+                "id": e.id,
+                "price": e.price,
+                "distance": round(d, 3),
+                "model": e.model,
+                "storage_gb": e.storage_gb,
+                "ram_gb": e.ram_gb,
+                "condition": e.condition,
+                "createdAt": e.created_at.isoformat() if e.created_at else None,
+            }
+            for d, e in hits
+        ]
+        if not hits:
+            return {"estimate": None, "confidence": "none", "neighbors": []}
+        weights = [1 / (d + 0.1) for d, _ in hits]
+        estimate = round(sum(w * e.price for w, (_, e) in zip(weights, hits)) / sum(weights))
+        close = [e.price for d, e in hits if d <= MATCH_DISTANCE]
+        if len(close) >= MIN_MATCHES and statistics.pstdev(close) <= MAX_SPREAD * statistics.mean(close):
+            confidence = "high"
+            estimate = round(statistics.median(close))
+        elif hits[0][0] <= 1.0:
+            confidence = "medium"
+        else:
+            confidence = "low"
+        return {"estimate": estimate, "confidence": confidence, "neighbors": neighbors}
+
+
+# Process-wide index used by the API.
+index = KBNeighborIndex()
@@ -0,0 +1,210 @@
+import csv
+import io
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Any, Iterable, Iterator, Mapping, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from models import ListingModel
+
+# Leading brand words dropped from canonical models so "Apple iPhone 13" and "iPhone 13" match.
+_BRAND_PREFIXES = ("apple", "samsung", "oneplus", "google", "xiaomi", "vivo", "oppo", "realme", "motorola", "nokia")
+
+# COPY column order; rows from listing_rows() are tuples in this order.
+COPY_COLUMNS = (
+    "run_id",
+    "source",
+    "query_key",
+    "model",
+    "canonical_model",
+    "storage_gb",
+    "ram_gb",
+    "color",
+    "condition",
+    "price",
+    "scraped_at",
+)
+
+
+def parse_price(value: Any) -> Optional[int]:
+    """'₹15,343' / 'Rs. 15343.00' / 15343 -> 15343. None when there is no number."""
+    if isinstance(value, (int, float)):
+        return int(value)
+    m = re.search(r"\d+(?:\.\d+)?", str(value or "").replace(",", ""))
+    return int(float(m.group())) if m else None
+
+
+def parse_gb(value: Any) -> Optional[int]:
+    """'128GB' / '128 gb' / '1 TB' / '8' -> size in GB. None when there is no number."""
+    raw = str(value or "")
+    m = re.search(r"\d+", raw)
+    if not m:
+        return None
+    return int(m.group()) * (1024 if re.search(r"tb", raw, re.I) else 1)
+
+
+def canonical_model(value: Any) -> str:
+    """
+    Lower-case model name without brand prefix, bracketed variants, sizes and punctuation:
+    'Apple iPhone 13 (Blue, 128 GB)' -> 'iphone 13'.
+    """
+    s = str(value or "").lower()
+    s = re.sub(r"\([^)]*\)|\[[^\]]*\]", " ", s)
+    s = re.sub(r"\b\d+\s*(?:gb|tb)\b", " ", s)
+    s = re.sub(r"\b(?:refurbished|renewed|unboxed|pre-owned|used)\b", " ", s)
+    s = re.sub(r"[^a-z0-9+]+", " ", s).strip()
+    words = s.split()
+    if len(words) > 1 and words[0] in _BRAND_PREFIXES:
+        words = words[1:]
+    return " ".join(words)
+
+
+def _field(row: Mapping[str, Any], *keys: str) -> str:
+    # BrowserUse rows use Price/Storage/...; the older scrapers used lowercase keys.
+    for k in keys:
+        v = row.get(k)
+        if v not in (None, ""):
+            return str(v).strip()
+    return ""
+
+
+def listing_rows(
+    results: Mapping[str, Iterable[Any]],
+    query: str,
+    run_id: Optional[str] = None,
+    scraped_at: Optional[datetime] = None,
+) -> Iterator[tuple]:
+    """
+    Typed listing tuples (COPY_COLUMNS order) from per-source scrape results
+    ({source: [BrowserScrapeDevice | dict, ...]}). Rows without a parseable price are skipped.
+    """
+    scraped_at = scraped_at or datetime.now(timezone.utc)
+    query_key = canonical_model(query)
+    for source, items in results.items():
+        for item in items or []:
+            row = item.model_dump() if hasattr(item, "model_dump") else item
+            if not isinstance(row, Mapping):
+                continue
+            price = parse_price(_field(row, "Price", "price", "effective_price"))
+            if price is None:
+                continue
+            model = _field(row, "Model", "name")
+            storage = _field(row, "Storage", "storage")
+            yield (
+                run_id,
+                source,
+                query_key,
+                model or None,
+                canonical_model(model) or query_key,
+                parse_gb(storage),
+                parse_gb(_field(row, "Ram", "ram")),
+                _field(row, "Color", "color") or None,
+                _field(row, "Condition", "condition") or None,
+                price,
+                scraped_at,
+            )
+
+
+def copy_listings(db: Session, rows: Iterable[tuple], commit: bool = True) -> int:
+    """
+    Bulk-load listing tuples with COPY FROM STDIN in the session's transaction (committing unless
+    commit=False). Falls back to a multi-row INSERT on drivers without copy_expert. Returns the row count.
+    """
+    rows = list(rows)
+    if not rows:
+        return 0
+    raw = db.connection().connection
+    cursor = raw.cursor()
+    try:
+        if hasattr(cursor, "copy_expert"):
+            buf = io.StringIO()
+            writer = csv.writer(buf)
+            for row in rows:
+                writer.writerow(["" if v is None else (v.isoformat() if isinstance(v, datetime) else v) for v in row])
+            buf.seek(0)
+            # Unquoted empty fields load as NULL in CSV format.
+            cursor.copy_expert(f"COPY listings ({', '.join(COPY_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buf)
+        else:
+            db.execute(ListingModel.__table__.insert(), [dict(zip(COPY_COLUMNS, r)) for r in rows])
+    finally:
+        cursor.close()
+    if commit:
+        db.commit()
+    return len(rows)
+
+
+def _listing_to_dict(r: Any) -> dict[str, Any]:
+    return {
+        "source": r.source,
+        "model": r.model,
+        "storage_gb": r.storage_gb,
+        "ram_gb": r.ram_gb,
+        "color": r.color,
+        "condition": r.condition,
+        "price": r.price,
+        "scraped_at": r.scraped_at.isoformat() if r.scraped_at else None,
+        "run_id": r.run_id,
+    }
+
+
+def latest_prices(
+    db: Session,
+    model: str,
+    storage_gb: Optional[int] = None,
+    ram_gb: Optional[int] = None,
+    source: Optional[str] = None,
+    max_age: Optional[timedelta] = None,
+) -> list[dict[str, Any]]:
+    """Most recent listing per (source, condition) for a config; served by ix_listings_config_latest."""
+    where = ["canonical_model = :model"]
+    params: dict[str, Any] = {"model": canonical_model(model)}
+    for col, value in (("storage_gb", storage_gb), ("ram_gb", ram_gb), ("source", source)):
+        if value is not None:
+            where.append(f"{col} = :{col}")
+            params[col] = value
+    if max_age is not None:
+        where.append("scraped_at >= :since")
+        params["since"] = datetime.now(timezone.utc) - max_age
+    rows = db.execute(
+        text(
+            "SELECT DISTINCT ON (source, condition) * FROM listings WHERE " + " AND ".join(where)
+            + " ORDER BY source, condition, scraped_at DESC"
+        ),
+        params,
+    ).all()
+    return [_listing_to_dict(r) for r in rows]
+
+
+def recent_for_query(db: Session, query: str, max_age: timedelta, limit: int = 200) -> list[dict[str, Any]]:
+    """
+    Listings from the latest scrape of `query` within max_age (one scrape batch per source),
+    or [] when there is none. Used to price without re-scraping.
+    """
+    rows = db.execute(
+        text(
+            """
+            SELECT l.* FROM listings l
+            JOIN (
+                SELECT source, max(scraped_at) AS scraped_at FROM listings
+                WHERE query_key = :q AND scraped_at >= :since
+                GROUP BY source
+            ) latest ON latest.source = l.source AND latest.scraped_at = l.scraped_at
+            WHERE l.query_key = :q
+            ORDER BY l.source, l.id
+            LIMIT :limit
+            """
+        ),
+        {"q": canonical_model(query), "since": datetime.now(timezone.utc) - max_age, "limit": limit},
+    ).all()
+    return [_listing_to_dict(r) for r in rows]
+
+
+def for_run(db: Session, run_id: str, query: str) -> list[dict[str, Any]]:
+    """Listings a run's scrape of `query` stored (what its pricing saw)."""
+    rows = db.execute(
+        text("SELECT * FROM listings WHERE run_id = :run_id AND query_key = :q ORDER BY source, id"),
+        {"run_id": run_id, "q": canonical_model(query)},
+    ).all()
+    return [_listing_to_dict(r) for r in rows]
@@ -0,0 +1,140 @@
+import logging
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterable, Iterator, Optional
+
+import metrics_helper
+
+logger = logging.getLogger("budli-api")
+
+# USD per million (input, output) tokens, matched in order by substring of the Bedrock model id.
+# BEDROCK_PRICE_INPUT_PER_MTOK / BEDROCK_PRICE_OUTPUT_PER_MTOK override the table (e.g. for a negotiated rate).
+MODEL_PRICES = (
+    ("claude-3-5-haiku", 0.8, 4.0),
+    ("claude-3-haiku", 0.25, 1.25),
+    ("haiku", 1.0, 5.0),
+    ("sonnet", 3.0, 15.0),
+    ("opus-4-5", 5.0, 25.0),
+    ("opus", 15.0, 75.0),
+)
+# Prompt caching: writes cost more than plain input tokens, reads much less.
+CACHE_WRITE_MULTIPLIER = 1.25
+CACHE_READ_MULTIPLIER = 0.1
+
+_TOKEN_FIELDS = ("input_tokens", "output_tokens", "cache_creation_input_tokens", "cache_read_input_tokens")
+
+# (attributes, collectors) for the code running in this context; asyncio tasks inherit it.
+_current: ContextVar[tuple[dict[str, Any], tuple[list, ...]]] = ContextVar("budli_llm_usage", default=({}, ()))
+
+
+def model_prices(model_id: str) -> tuple[float, float]:
+    env_in, env_out = os.getenv("BEDROCK_PRICE_INPUT_PER_MTOK"), os.getenv("BEDROCK_PRICE_OUTPUT_PER_MTOK")
+    if env_in and env_out:
+        return float(env_in), float(env_out)
+    for pattern, price_in, price_out in MODEL_PRICES:
+        if pattern in model_id:
+            return price_in, price_out
+    return 0.0, 0.0
+
+
+def cost_usd(model_id: str, usage: dict[str, int]) -> float:
+    price_in, price_out = model_prices(model_id)
+    return (
+        usage.get("input_tokens", 0) * price_in
+        + usage.get("cache_creation_input_tokens", 0) * price_in * CACHE_WRITE_MULTIPLIER
+        + usage.get("cache_read_input_tokens", 0) * price_in * CACHE_READ_MULTIPLIER
+        + usage.get("output_tokens", 0) * price_out
+    ) / 1_000_000
+
+
+@contextmanager
+def scope(collector: Optional[list] = None, **attributes: Any) -> Iterator[None]:
+    """
+    Attribute Bedrock calls made in this block (and tasks started from it) to `attributes`
+    (job_id, device_id, ...); calls are also appended to `collector` and every enclosing one.
+    """
+    attrs, collectors = _current.get()
+    token = _current.set(({**attrs, **attributes}, collectors + ((collector,) if collector is not None else ())))
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+class EndpointMiddleware:
+    """ASGI middleware: calls made while serving a request (or by jobs it starts) carry its path as `endpoint`."""
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope_: dict, receive: Any, send: Any) -> None:
+        if scope_["type"] != "http":
+            await self.app(scope_, receive, send)
+            return
+        with scope(endpoint=scope_["path"]):
+            await self.app(scope_, receive, send)
+
+
+def record(model_id: str, usage: Optional[dict[str, Any]], latency_ms: float, caller: str = "") -> dict[str, Any]:
+    """Record one invocation's usage block (Anthropic `usage`), with its cost, against the current scope."""
+    attrs, collectors = _current.get()
+    tokens = {f: int((usage or {}).get(f) or 0) for f in _TOKEN_FIELDS}
+    call = {
+        "model": model_id,
+        "caller": caller,
+        **{k: attrs[k] for k in ("endpoint", "job_id", "run_id", "device_id") if k in attrs},
+        **tokens,
+        "latency_ms": round(latency_ms, 1),
+        "cost_usd": cost_usd(model_id, tokens),
+    }
+    for collector in collectors:
+        collector.append(call)
+    for kind, field in (("input", "input_tokens"), ("output", "output_tokens"),
+                        ("cache_write", "cache_creation_input_tokens"), ("cache_read", "cache_read_input_tokens")):
+        if tokens[field]:
+            metrics_helper.LLM_TOKENS.inc(tokens[field], model=model_id, kind=kind)
+    metrics_helper.LLM_COST_USD.inc(call["cost_usd"], model=model_id, endpoint=attrs.get("endpoint", "background"))
+    logger.info(
+        "Bedrock %s (%s): %d in / %d out tokens, %.0f ms, $%.5f",
+        caller or "call", attrs.get("endpoint", "background"), tokens["input_tokens"], tokens["output_tokens"],
+        latency_ms, call["cost_usd"],
+    )
+    return call
+
+
+def summarize(
+    calls: Iterable[dict[str, Any]], group_by: tuple[str, ...] = ("model", "caller")
+) -> Optional[dict[str, Any]]:
+    """Totals over recorded calls (tokens, cost, latency), also per `group_by` key; None when there were none."""
+    calls = list(calls)
+    if not calls:
+        return None
+
+    def totals(group: list[dict[str, Any]]) -> dict[str, Any]:
+        return {
+            "calls": len(group),
+            **{f: sum(c[f] for c in group) for f in _TOKEN_FIELDS},
+            "latency_ms": round(sum(c["latency_ms"] for c in group), 1),
+            "cost_usd": round(sum(c["cost_usd"] for c in group), 6),
+        }
+
+    out = totals(calls)
+    for key in group_by:
+        groups: dict[str, list] = {}
+        for c in calls:
+            groups.setdefault(c.get(key) or "unknown", []).append(c)
+        out[f"by_{key}"] = {k: totals(v) for k, v in groups.items()}
+    return out
+
+
+def combine(by_device: dict[str, Optional[dict[str, Any]]]) -> Optional[dict[str, Any]]:
+    """Run totals from per-device summaries (as stored on run results), with them as `by_device_id`."""
+    parts = {k: v for k, v in by_device.items() if isinstance(v, dict)}
+    if not parts:
+        return None
+    fields = ("calls", *_TOKEN_FIELDS, "latency_ms", "cost_usd")
+    totals = {f: sum(v.get(f) or 0 for v in parts.values()) for f in fields}
+    totals["latency_ms"] = round(totals["latency_ms"], 1)
+    totals["cost_usd"] = round(totals["cost_usd"], 6)
+    return {**totals, "by_device_id": {k: {f: v.get(f) or 0 for f in fields} for k, v in parts.items()}}
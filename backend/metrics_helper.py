@@ -0,0 +1,224 @@
+import asyncio
+import bisect
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional
+
+# Seconds. Scrapes and LLM calls run from under a second to several minutes.
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+# Seconds. Event-loop stalls worth seeing start around a millisecond.
+LAG_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    """
+    One metric family with fixed label names. Updates take a per-metric lock (the scrapers record
+    from threadpool threads). `fn`, when given, is called at scrape time and returns
+    {label tuple: value} (or a bare number for an unlabelled metric), merged over recorded values.
+    """
+
+    kind = ""
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: tuple[str, ...] = (),
+        fn: Optional[Callable[[], Any]] = None,
+    ) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.fn = fn
+        self._values: dict[tuple, Any] = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def _key(self, labels: dict[str, Any]) -> tuple:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def _labels(self, key: tuple, extra: str = "") -> str:
+        parts = [f'{n}="{_escape(v)}"' for n, v in zip(self.labelnames, key)]
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+    def set_function(self, fn: Callable[[], Any]) -> None:
+        self.fn = fn
+
+    def _samples(self) -> dict[tuple, Any]:
+        with self._lock:
+            samples = dict(self._values)
+        if self.fn is not None:
+            values = self.fn()
+            samples.update(values if isinstance(values, dict) else {(): values})
+        return samples
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {_escape(self.help)}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in sorted(self._samples().items()):
+            lines.append(f"{self.name}{self._labels(key)} {_fmt(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, help: str, labelnames: tuple[str, ...] = (), buckets: tuple[float, ...] = LATENCY_BUCKETS
+    ) -> None:
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labelnames)
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [per-bucket counts (last slot is +Inf), sum]
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][i] += 1
+            state[1] += value
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        """Observe the duration of the block in seconds (also when it raises)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {_escape(self.help)}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {k: (list(counts), total) for k, (counts, total) in self._values.items()}
+        for key, (counts, total) in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, n in zip((*self.buckets, math.inf), counts):
+                cumulative += n
+                le = 'le="' + _fmt(bound) + '"'
+                lines.append(f"{self.name}_bucket{self._labels(key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(key)} {_fmt(total)}")
+            lines.append(f"{self.name}_count{self._labels(key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> None:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (0.0.4)."""
+        lines: list[str] = []
+        for metric in self._metrics.values():
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                # A broken callback must not take /metrics down with it.
+                lines.append(f"# {metric.name} unavailable: {_escape(e)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# BrowserUse
+BROWSER_SESSION_CREATE_SECONDS = Histogram(
+    "budli_browseruse_session_create_seconds", "BrowserUse sessions.create() latency.", ("outcome",)
+)
+SCRAPE_SECONDS = Histogram(
+    "budli_scrape_seconds", "Duration of one source's scrape (BrowserUse agent run or velocity scrape).", ("source", "outcome")
+)
+SCRAPE_ITEMS = Counter("budli_scrape_items_total", "Listings / items returned by scrapes.", ("source",))
+
+# Velocity scrapers (Amazon / Flipkart)
+PLAYWRIGHT_PAGE_LOAD_SECONDS = Histogram(
+    "budli_playwright_page_load_seconds", "Playwright navigation until results are on the page.", ("site",)
+)
+VELOCITY_SCRAPES = Counter(
+    "budli_velocity_scrapes_total",
+    "Velocity scrapes by the method that produced the items (bs4, playwright, or none).",
+    ("site", "method"),
+)
+
+# Bedrock
+BEDROCK_SECONDS = Histogram("budli_bedrock_request_seconds", "Bedrock invoke_model latency.", ("model", "outcome"))
+LLM_TOKENS = Counter("budli_llm_tokens_total", "Bedrock tokens by model and kind (input, output, cache_write, cache_read).", ("model", "kind"))
+LLM_COST_USD = Counter("budli_llm_cost_usd_total", "Estimated Bedrock spend in USD (see llm_usage_helper.MODEL_PRICES).", ("model", "endpoint"))
+LLM_JSON_PARSES = Counter(
+    "budli_llm_json_parses_total", "Parses of LLM responses expected to be JSON.", ("caller", "outcome")
+)
+
+# Process
+EVENT_LOOP_LAG_SECONDS = Histogram(
+    "budli_event_loop_lag_seconds", "How late the event loop ran a timer (blocking work on the loop).", buckets=LAG_BUCKETS
+)
+PROCESS_RESIDENT_MEMORY_BYTES = Gauge("budli_process_resident_memory_bytes", "Resident set size of this process.")
+
+
+def _resident_memory_bytes() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource  # no /proc (macOS): peak RSS instead, in bytes there
+
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+PROCESS_RESIDENT_MEMORY_BYTES.set_function(_resident_memory_bytes)
+
+
+async def monitor_event_loop_lag(interval: float = 0.1) -> None:
+    """Run forever on the loop, observing how much later than `interval` each sleep wakes up."""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG_SECONDS.observe(max(loop.time() - start - interval, 0.0))
+
+
+# Queues and caches (values read at scrape time)
+JOBS = Gauge("budli_jobs", "In-process jobs by kind and status.", ("kind", "status"))
+CACHE_REQUESTS = Counter("budli_cache_requests_total", "Cache lookups by cache and result.", ("cache", "result"))
@@ -0,0 +1,544 @@
+"""
+Versioned schema migrations for the BUDLI database.
+
+Run explicitly (e.g. as a deploy step):
+
+    python migrations.py upgrade    # apply pending migrations
+    python migrations.py status     # show applied / pending versions
+    python migrations.py check      # verify the models match the migrated schema and the hot queries use their indexes
+
+The API also applies pending migrations from its lifespan hook when RUN_MIGRATIONS_ON_STARTUP=1
+(the default), never at import time. Each migration runs in its own transaction under a
+Postgres advisory lock, so several instances starting at once apply it exactly once.
+New migrations are appended to MIGRATIONS with the next version number; never edit applied ones.
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+from typing import Any, Callable, Optional, Union
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+logger = logging.getLogger("budli-api")
+
+# Arbitrary constant shared by every instance: serializes concurrent `upgrade` calls.
+_ADVISORY_LOCK_ID = 727_310_031
+
+Step = Union[str, Callable[[Connection], None]]
+
+
+# Schema at the time migrations were introduced, frozen here. Later tables and columns come only from their
+# own migrations; never derive this from the current models (it would create them here and skip those).
+_BASELINE_TABLES = [
+    "CREATE TABLE IF NOT EXISTS runs ("
+    " id VARCHAR(36) NOT NULL PRIMARY KEY,"
+    " name VARCHAR NOT NULL,"
+    " status VARCHAR NOT NULL,"
+    " created_at TIMESTAMPTZ DEFAULT now(),"
+    " completed_at TIMESTAMPTZ,"
+    " devices JSONB,"
+    " results JSONB,"
+    " scrape_results JSONB,"
+    " feedback_submitted BOOLEAN)",
+    "CREATE TABLE IF NOT EXISTS knowledge_base ("
+    " id VARCHAR(36) NOT NULL PRIMARY KEY,"
+    " brand VARCHAR NOT NULL,"
+    " model VARCHAR NOT NULL,"
+    " ram VARCHAR NOT NULL,"
+    " storage VARCHAR NOT NULL,"
+    " condition_tier VARCHAR NOT NULL,"
+    " recommended_price INTEGER NOT NULL,"
+    " human_approved_price INTEGER NOT NULL,"
+    " delta INTEGER NOT NULL,"
+    " velocity_category VARCHAR NOT NULL,"
+    " human_velocity_override VARCHAR,"
+    " feedback_note VARCHAR,"
+    " run_id VARCHAR(36) NOT NULL,"
+    " created_at TIMESTAMPTZ DEFAULT now())",
+    "CREATE TABLE IF NOT EXISTS bulk_jobs ("
+    " id VARCHAR(36) NOT NULL PRIMARY KEY,"
+    " name VARCHAR,"
+    " status VARCHAR NOT NULL,"
+    " input_format VARCHAR NOT NULL,"
+    " fieldnames JSONB,"
+    " total_rows INTEGER NOT NULL,"
+    " done_rows INTEGER NOT NULL,"
+    " failed_rows INTEGER NOT NULL,"
+    " last_seq INTEGER NOT NULL,"
+    " unique_configs INTEGER NOT NULL,"
+    " concurrency INTEGER NOT NULL,"
+    " error VARCHAR,"
+    " created_at TIMESTAMPTZ DEFAULT now(),"
+    " updated_at TIMESTAMPTZ DEFAULT now(),"
+    " completed_at TIMESTAMPTZ)",
+    "CREATE TABLE IF NOT EXISTS bulk_job_rows ("
+    " job_id VARCHAR(36) NOT NULL,"
+    " row_idx INTEGER NOT NULL,"
+    " status VARCHAR NOT NULL,"
+    " input JSONB NOT NULL,"
+    " config_key VARCHAR,"
+    " output JSONB,"
+    " error VARCHAR,"
+    " attempts INTEGER NOT NULL,"
+    " seq INTEGER,"
+    " claimed_at TIMESTAMPTZ,"
+    " completed_at TIMESTAMPTZ,"
+    " PRIMARY KEY (job_id, row_idx))",
+]
+
+
+# Data backfills are frozen copies of what the helpers did when each migration was written, so a database
+# migrated later gets the same result. A later change to a rebuild gets its own migration.
+
+def _v5_backfill_rollups(conn: Connection) -> None:
+    # trends_helper.rebuild_rollups as of migration 5.
+    conn.execute(
+        text(
+            """
+            INSERT INTO listing_daily_stats
+                (day, canonical_model, storage_gb, ram_gb, source, listings, min_price, median_price, p90_price, max_price)
+            SELECT
+                (l.scraped_at AT TIME ZONE :tz)::date AS day,
+                l.canonical_model,
+                COALESCE(l.storage_gb, 0) AS storage_gb,
+                COALESCE(l.ram_gb, 0) AS ram_gb,
+                l.source,
+                count(*) AS listings,
+                min(l.price) AS min_price,
+                round(percentile_cont(0.5) WITHIN GROUP (ORDER BY l.price))::int AS median_price,
+                round(percentile_cont(0.9) WITHIN GROUP (ORDER BY l.price))::int AS p90_price,
+                max(l.price) AS max_price
+            FROM listings l
+            GROUP BY 1, 2, 3, 4, 5
+            ON CONFLICT (canonical_model, storage_gb, ram_gb, source, day) DO UPDATE SET
+                listings = EXCLUDED.listings,
+                min_price = EXCLUDED.min_price,
+                median_price = EXCLUDED.median_price,
+                p90_price = EXCLUDED.p90_price,
+                max_price = EXCLUDED.max_price,
+                updated_at = now()
+            """
+        ),
+        {"tz": os.getenv("TRENDS_TIMEZONE", "Asia/Kolkata")},
+    )
+
+
+_V9_BRAND_PREFIXES = ("apple", "samsung", "oneplus", "google", "xiaomi", "vivo", "oppo", "realme", "motorola", "nokia")
+
+
+def _v9_canonical_model(value: Any) -> str:
+    # listings_helper.canonical_model as of migration 9.
+    s = str(value or "").lower()
+    s = re.sub(r"\([^)]*\)|\[[^\]]*\]", " ", s)
+    s = re.sub(r"\b\d+\s*(?:gb|tb)\b", " ", s)
+    s = re.sub(r"\b(?:refurbished|renewed|unboxed|pre-owned|used)\b", " ", s)
+    s = re.sub(r"[^a-z0-9+]+", " ", s).strip()
+    words = s.split()
+    if len(words) > 1 and words[0] in _V9_BRAND_PREFIXES:
+        words = words[1:]
+    return " ".join(words)
+
+
+def _v9_rebuild_kb_corrections(conn: Connection) -> None:
+    # kb_corrections_helper.rebuild as of migration 9: per (brand, canonical model, condition) count, mean and
+    # M2 (sum of squared deviations) of human_approved_price - COALESCE(base_price, recommended_price).
+    def norm(value: Any) -> str:
+        return re.sub(r"\s+", " ", str(value or "")).strip().lower()
+
+    conn.execute(text("DELETE FROM kb_corrections"))
+    reviews = conn.execute(
+        text(
+            "SELECT brand, model, condition_tier, human_approved_price - COALESCE(base_price, recommended_price) AS delta "
+            "FROM knowledge_base ORDER BY created_at"
+        )
+    ).all()
+    by_key: dict[tuple[str, str, str], list[float]] = {}
+    for r in reviews:
+        key = (norm(r.brand), _v9_canonical_model(r.model), norm(r.condition_tier))
+        by_key.setdefault(key, []).append(float(r.delta))
+    rows = []
+    for (brand, model, condition_tier), deltas in by_key.items():
+        mean = sum(deltas) / len(deltas)
+        m2 = sum((x - mean) ** 2 for x in deltas)
+        rows.append({"brand": brand, "model": model, "condition_tier": condition_tier, "n": len(deltas), "mean": mean, "m2": m2})
+    if rows:
+        conn.execute(
+            text(
+                "INSERT INTO kb_corrections (brand, model, condition_tier, samples, mean_delta, m2_delta) "
+                "VALUES (:brand, :model, :condition_tier, :n, :mean, :m2)"
+            ),
+            rows,
+        )
+
+
+MIGRATIONS: list[tuple[int, str, list[Step]]] = [
+    (
+        1,
+        "baseline tables",
+        [
+            *_BASELINE_TABLES,
+            # Databases created before these columns existed.
+            "ALTER TABLE runs ADD COLUMN IF NOT EXISTS scrape_results JSONB DEFAULT '{}'",
+            "ALTER TABLE bulk_jobs ADD COLUMN IF NOT EXISTS last_seq INTEGER NOT NULL DEFAULT 0",
+            "ALTER TABLE bulk_jobs ADD COLUMN IF NOT EXISTS unique_configs INTEGER NOT NULL DEFAULT 0",
+            "ALTER TABLE bulk_job_rows ADD COLUMN IF NOT EXISTS config_key VARCHAR",
+        ],
+    ),
+    (
+        2,
+        "query indexes for runs, knowledge_base and bulk_job_rows",
+        [
+            # GET /runs: newest first, keyset on (created_at, id).
+            "CREATE INDEX IF NOT EXISTS ix_runs_created_at_id ON runs (created_at DESC, id DESC)",
+            # GET /runs?model=: JSONB containment on the devices array.
+            "CREATE INDEX IF NOT EXISTS ix_runs_devices_gin ON runs USING GIN (devices jsonb_path_ops)",
+            # GET /kb: newest first.
+            "CREATE INDEX IF NOT EXISTS ix_knowledge_base_created_at ON knowledge_base (created_at DESC)",
+            # KB lookups by device config.
+            "CREATE INDEX IF NOT EXISTS ix_knowledge_base_config "
+            "ON knowledge_base (brand, model, ram, storage, condition_tier)",
+            "CREATE INDEX IF NOT EXISTS ix_knowledge_base_run_id ON knowledge_base (run_id)",
+            # Bulk jobs: dedup lookups, result cursor, and claiming unfinished rows.
+            "CREATE INDEX IF NOT EXISTS ix_bulk_job_rows_job_config ON bulk_job_rows (job_id, config_key) "
+            "WHERE status = 'done'",
+            "CREATE INDEX IF NOT EXISTS ix_bulk_job_rows_job_seq ON bulk_job_rows (job_id, seq)",
+            "CREATE INDEX IF NOT EXISTS ix_bulk_job_rows_unfinished ON bulk_job_rows (job_id, row_idx) "
+            "WHERE status IN ('pending', 'in_progress')",
+            "CREATE INDEX IF NOT EXISTS ix_bulk_jobs_status ON bulk_jobs (status)",
+        ],
+    ),
+    (
+        3,
+        "runs.version for optimistic concurrency",
+        ["ALTER TABLE runs ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1"],
+    ),
+    (
+        4,
+        "listings table",
+        [
+            "CREATE TABLE IF NOT EXISTS listings ("
+            " id BIGSERIAL PRIMARY KEY,"
+            " run_id VARCHAR(36),"
+            " source VARCHAR NOT NULL,"
+            " query_key VARCHAR NOT NULL,"
+            " model VARCHAR,"
+            " canonical_model VARCHAR NOT NULL,"
+            " storage_gb INTEGER,"
+            " ram_gb INTEGER,"
+            " color VARCHAR,"
+            " condition VARCHAR,"
+            " price INTEGER NOT NULL,"
+            " scraped_at TIMESTAMPTZ NOT NULL DEFAULT now())",
+            # Latest price for a config (optionally per source).
+            "CREATE INDEX IF NOT EXISTS ix_listings_config_latest "
+            "ON listings (canonical_model, storage_gb, ram_gb, source, scraped_at DESC)",
+            # Reusing the latest scrape of a search query.
+            "CREATE INDEX IF NOT EXISTS ix_listings_query_latest ON listings (query_key, source, scraped_at DESC)",
+            "CREATE INDEX IF NOT EXISTS ix_listings_run_id ON listings (run_id)",
+        ],
+    ),
+    (
+        5,
+        "daily listing price rollups",
+        [
+            "CREATE TABLE IF NOT EXISTS listing_daily_stats ("
+            " canonical_model VARCHAR NOT NULL,"
+            " storage_gb INTEGER NOT NULL,"
+            " ram_gb INTEGER NOT NULL,"
+            " source VARCHAR NOT NULL,"
+            " day DATE NOT NULL,"
+            " listings INTEGER NOT NULL,"
+            " min_price INTEGER NOT NULL,"
+            " median_price INTEGER NOT NULL,"
+            " p90_price INTEGER NOT NULL,"
+            " max_price INTEGER NOT NULL,"
+            " updated_at TIMESTAMPTZ DEFAULT now(),"
+            " PRIMARY KEY (canonical_model, storage_gb, ram_gb, source, day))",
+            _v5_backfill_rollups,
+        ],
+    ),
+    (
+        6,
+        "kb price corrections",
+        [
+            "CREATE TABLE IF NOT EXISTS kb_corrections ("
+            " model VARCHAR NOT NULL,"
+            " condition_tier VARCHAR NOT NULL,"
+            " brand VARCHAR NOT NULL,"
+            " samples INTEGER NOT NULL,"
+            " mean_delta DOUBLE PRECISION NOT NULL,"
+            " m2_delta DOUBLE PRECISION NOT NULL,"
+            " updated_at TIMESTAMPTZ DEFAULT now(),"
+            " PRIMARY KEY (model, condition_tier, brand))",
+            # Filled by migration 9: rebuilding here would read knowledge_base.base_price before it exists.
+        ],
+    ),
+    (
+        7,
+        "per-table data versions for conditional GETs",
+        [
+            # One counter per table, bumped by a statement trigger on every write from any process,
+            # so list endpoints can tell whether their cached copy is still current.
+            "CREATE TABLE IF NOT EXISTS data_versions ("
+            " name VARCHAR PRIMARY KEY,"
+            " version BIGINT NOT NULL DEFAULT 1,"
+            " updated_at TIMESTAMPTZ NOT NULL DEFAULT now())",
+            "INSERT INTO data_versions (name) VALUES ('runs'), ('knowledge_base') ON CONFLICT DO NOTHING",
+            "CREATE OR REPLACE FUNCTION bump_data_version() RETURNS trigger LANGUAGE plpgsql AS $$ "
+            "BEGIN "
+            " UPDATE data_versions SET version = version + 1, updated_at = now() WHERE name = TG_TABLE_NAME; "
+            " RETURN NULL; "
+            "END $$",
+            "DROP TRIGGER IF EXISTS runs_data_version ON runs",
+            "CREATE TRIGGER runs_data_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON runs "
+            "FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version()",
+            "DROP TRIGGER IF EXISTS knowledge_base_data_version ON knowledge_base",
+            "CREATE TRIGGER knowledge_base_data_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON knowledge_base "
+            "FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version()",
+        ],
+    ),
+    (
+        8,
+        "runs.llm_usage for Bedrock token and cost totals",
+        ["ALTER TABLE runs ADD COLUMN IF NOT EXISTS llm_usage JSONB"],
+    ),
+    (
+        9,
+        "knowledge_base.base_price; corrections learn from human - base_price",
+        [
+            "ALTER TABLE knowledge_base ADD COLUMN IF NOT EXISTS base_price INTEGER",
+            # Recover the uncorrected price of existing reviews from their run's stored kbCorrection.
+            "UPDATE knowledge_base kb SET base_price = (res->'kbCorrection'->>'base_price')::integer "
+            "FROM runs r, "
+            " jsonb_array_elements(CASE WHEN jsonb_typeof(r.devices) = 'array' THEN r.devices ELSE '[]'::jsonb END) dev, "
+            " jsonb_array_elements(CASE WHEN jsonb_typeof(r.results) = 'array' THEN r.results ELSE '[]'::jsonb END) res "
+            "WHERE kb.base_price IS NULL AND r.id = kb.run_id AND res->>'deviceId' = dev->>'id' "
+            " AND dev->>'model' = kb.model AND dev->>'ram' = kb.ram AND dev->>'storage' = kb.storage "
+            " AND dev->>'condition' = kb.condition_tier "
+            " AND jsonb_typeof(res->'kbCorrection'->'base_price') = 'number'",
+            _v9_rebuild_kb_corrections,
+        ],
+    ),
+    (
+        10,
+        "runs.created_at NOT NULL for the (created_at, id) keyset",
+        [
+            # Runs saved without createdAt before the server default was relied on.
+            "UPDATE runs SET created_at = COALESCE(completed_at, now()) WHERE created_at IS NULL",
+            "ALTER TABLE runs ALTER COLUMN created_at SET DEFAULT now()",
+            "ALTER TABLE runs ALTER COLUMN created_at SET NOT NULL",
+        ],
+    ),
+]
+
+
+def _ensure_version_table(conn: Connection) -> None:
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        " version INTEGER PRIMARY KEY,"
+        " name VARCHAR NOT NULL,"
+        " applied_at TIMESTAMPTZ NOT NULL DEFAULT now())"
+    ))
+
+
+def applied_versions(conn: Connection) -> set[int]:
+    _ensure_version_table(conn)
+    return {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+
+def upgrade(engine: Optional[Engine] = None, target: Optional[int] = None) -> list[int]:
+    """Apply pending migrations up to `target` (default: latest). Returns the versions applied."""
+    if engine is None:
+        from database import get_engine
+
+        engine = get_engine()
+    applied: list[int] = []
+    for version, name, steps in MIGRATIONS:
+        if target is not None and version > target:
+            break
+        with engine.begin() as conn:
+            conn.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": _ADVISORY_LOCK_ID})
+            if version in applied_versions(conn):
+                continue
+            logger.info("Applying migration %d: %s", version, name)
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(text(step))
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, name) VALUES (:v, :n)"),
+                {"v": version, "n": name},
+            )
+        applied.append(version)
+    return applied
+
+
+def status(engine: Optional[Engine] = None) -> list[dict[str, Any]]:
+    if engine is None:
+        from database import get_engine
+
+        engine = get_engine()
+    with engine.begin() as conn:
+        done = applied_versions(conn)
+    return [{"version": v, "name": n, "applied": v in done} for v, n, _ in MIGRATIONS]
+
+
+# Hot queries and the index each must be able to use. Planner costs on small tables favour
+# sequential scans, so the check disables them to verify the index is *usable* for the query.
+EXPLAIN_CHECKS: list[tuple[str, str, dict[str, Any], str]] = [
+    (
+        "runs list page",
+        "SELECT id, name FROM runs WHERE (created_at, id) < (now(), '') ORDER BY created_at DESC, id DESC LIMIT 50",
+        {},
+        "ix_runs_created_at_id",
+    ),
+    (
+        "runs by device model",
+        "SELECT id FROM runs WHERE devices @> CAST(:devices AS JSONB)",
+        {"devices": json.dumps([{"model": "iPhone 13"}])},
+        "ix_runs_devices_gin",
+    ),
+    (
+        "kb list",
+        "SELECT id FROM knowledge_base ORDER BY created_at DESC LIMIT 100",
+        {},
+        "ix_knowledge_base_created_at",
+    ),
+    (
+        "kb by config",
+        "SELECT id FROM knowledge_base WHERE brand = :b AND model = :m AND ram = :r AND storage = :s "
+        "AND condition_tier = :c",
+        {"b": "Apple", "m": "iPhone 13", "r": "4", "s": "128", "c": "Good"},
+        "ix_knowledge_base_config",
+    ),
+    (
+        "kb by run",
+        "SELECT id FROM knowledge_base WHERE run_id = :r",
+        {"r": "run"},
+        "ix_knowledge_base_run_id",
+    ),
+    (
+        "bulk results cursor",
+        "SELECT row_idx FROM bulk_job_rows WHERE job_id = :j AND seq > 0 AND seq <= 100 ORDER BY seq",
+        {"j": "job"},
+        "ix_bulk_job_rows_job_seq",
+    ),
+    (
+        "bulk dedup lookup",
+        "SELECT output FROM bulk_job_rows WHERE job_id = :j AND config_key = :k AND status = 'done' LIMIT 1",
+        {"j": "job", "k": "key"},
+        "ix_bulk_job_rows_job_config",
+    ),
+    (
+        "latest listing for a config",
+        "SELECT DISTINCT ON (source, condition) price FROM listings "
+        "WHERE canonical_model = :m AND storage_gb = :s AND ram_gb = :r ORDER BY source, condition, scraped_at DESC",
+        {"m": "iphone 13", "s": 128, "r": 4},
+        "ix_listings_config_latest",
+    ),
+    (
+        "latest scrape of a query",
+        "SELECT source, max(scraped_at) FROM listings WHERE query_key = :q AND scraped_at >= now() - interval '1 day' "
+        "GROUP BY source",
+        {"q": "iphone 13"},
+        "ix_listings_query_latest",
+    ),
+    (
+        "trend series",
+        "SELECT day, median_price FROM listing_daily_stats WHERE canonical_model = :m AND day >= current_date - 90 "
+        "ORDER BY source, storage_gb, ram_gb, day",
+        {"m": "iphone 13"},
+        "listing_daily_stats_pkey",
+    ),
+    (
+        "kb correction lookup",
+        "SELECT samples FROM kb_corrections WHERE model = :m AND condition_tier = :c AND brand IN (:b, '') "
+        "ORDER BY brand DESC LIMIT 1",
+        {"m": "iphone 13", "c": "good", "b": "apple"},
+        "kb_corrections_pkey",
+    ),
+]
+
+
+def _plan_indexes(plan: dict[str, Any]) -> set[str]:
+    found = set()
+    if plan.get("Index Name"):
+        found.add(plan["Index Name"])
+    for child in plan.get("Plans", []):
+        found |= _plan_indexes(child)
+    return found
+
+
+def explain_check(engine: Optional[Engine] = None) -> list[dict[str, Any]]:
+    """EXPLAIN each hot query; `ok` is True when its expected index appears in the plan."""
+    if engine is None:
+        from database import get_engine
+
+        engine = get_engine()
+    results = []
+    with engine.connect() as conn:
+        with conn.begin():
+            conn.execute(text("SET LOCAL enable_seqscan = off"))
+            for name, sql, params, index in EXPLAIN_CHECKS:
+                raw = conn.execute(text("EXPLAIN (FORMAT JSON) " + sql), params).scalar_one()
+                plan = (raw if isinstance(raw, list) else json.loads(raw))[0]["Plan"]
+                used = sorted(_plan_indexes(plan))
+                results.append({"query": name, "expected_index": index, "indexes_used": used, "ok": index in used})
+    return results
+
+
+def schema_check(engine: Optional[Engine] = None) -> list[str]:
+    """Tables and columns the models declare that the migrated database lacks (empty when they agree)."""
+    from sqlalchemy import inspect
+
+    from database import Base
+    import models  # noqa: F401  (registers tables on Base.metadata)
+
+    if engine is None:
+        from database import get_engine
+
+        engine = get_engine()
+    db = inspect(engine)
+    tables = set(db.get_table_names())
+    missing = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in tables:
+            missing.append(f"table {table.name}")
+            continue
+        have = {c["name"] for c in db.get_columns(table.name)}
+        missing += [f"column {table.name}.{c.name}" for c in table.columns if c.name not in have]
+    return missing
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["upgrade", "status", "check"])
+    parser.add_argument("--target", type=int, default=None, help="upgrade: stop at this version")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == "upgrade":
+        applied = upgrade(target=args.target)
+        print(f"Applied: {applied}" if applied else "Database is up to date.")
+        return 0
+    if args.command == "status":
+        for m in status():
+            print(f"{m['version']:>4}  {'applied' if m['applied'] else 'pending':8}  {m['name']}")
+        return 0
+    failed = 0
+    for item in schema_check():
+        print(f"FAIL  schema: models declare {item}, but no migration creates it")
+        failed += 1
+    for r in explain_check():
+        print(f"{'OK  ' if r['ok'] else 'FAIL'}  {r['query']}: expected {r['expected_index']}, used {r['indexes_used']}")
+        failed += not r["ok"]
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
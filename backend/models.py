@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Float, Boolean, DateTime
+from sqlalchemy import BigInteger, Column, Date, String, Integer, Float, Boolean, DateTime
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.sql import func
 import uuid
@@ -11,12 +11,14 @@ class RunModel(Base):
     id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     name = Column(String, nullable=False)
     status = Column(String, nullable=False) # "pending", "processing", "completed", "error"
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
     completed_at = Column(DateTime(timezone=True), nullable=True)
     devices = Column(JSONB, default=list) # Array of DeviceInput objects
     results = Column(JSONB, default=list) # Array of PricingResult objects
     scrape_results = Column(JSONB, default=dict, nullable=True)  # Per-source tables: ovantica, refitglobal, cashify -> list of rows
     feedback_submitted = Column(Boolean, default=False)
+    version = Column(Integer, nullable=False, default=1, server_default="1")  # Bumped on every write; PATCH /runs checks it
+    llm_usage = Column(JSONB, nullable=True)  # Bedrock tokens / cost for the run (llm_usage_helper.summarize / combine)
 
 class KnowledgeBaseEntryModel(Base):
     __tablename__ = "knowledge_base"
@@ -31,6 +33,7 @@ class KnowledgeBaseEntryModel(Base):
     recommended_price = Column(Integer, nullable=False)
     human_approved_price = Column(Integer, nullable=False)
     delta = Column(Integer, nullable=False) # human - recommended
+    base_price = Column(Integer, nullable=True) # Price before the KB correction; null when none was applied
     
     velocity_category = Column(String, nullable=False)
     human_velocity_override = Column(String, nullable=True)
@@ -38,3 +41,81 @@ class KnowledgeBaseEntryModel(Base):
     
     run_id = Column(String(36), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class BulkJobModel(Base):
+    __tablename__ = "bulk_jobs"
+
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    name = Column(String, nullable=True)
+    status = Column(String, nullable=False) # "running", "completed", "error"
+    input_format = Column(String, nullable=False) # "csv" | "ndjson"
+    fieldnames = Column(JSONB, default=list) # Input column order, used for CSV downloads
+    total_rows = Column(Integer, nullable=False, default=0)
+    done_rows = Column(Integer, nullable=False, default=0)
+    failed_rows = Column(Integer, nullable=False, default=0)
+    last_seq = Column(Integer, nullable=False, default=0) # Last completion seq issued; results cursor
+    unique_configs = Column(Integer, nullable=False, default=0) # Distinct config keys among the rows (dedup)
+    concurrency = Column(Integer, nullable=False, default=4)
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+
+class BulkJobRowModel(Base):
+    __tablename__ = "bulk_job_rows"
+
+    job_id = Column(String(36), primary_key=True)
+    row_idx = Column(Integer, primary_key=True) # 1-based position in the upload
+    status = Column(String, nullable=False, default="pending") # "pending", "in_progress", "done", "error"
+    input = Column(JSONB, nullable=False)
+    config_key = Column(String, nullable=True) # Normalized brand/model/storage/RAM/network/condition/warranty
+    output = Column(JSONB, nullable=True) # Output columns (predicted_price, data_found_in, ...)
+    error = Column(String, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    seq = Column(Integer, nullable=True) # Completion order within the job; cursor for incremental downloads
+    claimed_at = Column(DateTime(timezone=True), nullable=True)
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+
+class ListingModel(Base):
+    __tablename__ = "listings"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    run_id = Column(String(36), nullable=True) # Run whose scrape produced the row (null for ad-hoc scrapes)
+    source = Column(String, nullable=False) # "ovantica", "refitglobal", "cashify"
+    query_key = Column(String, nullable=False) # Canonical search query the scrape ran for
+    model = Column(String, nullable=True) # Listing title as scraped
+    canonical_model = Column(String, nullable=False)
+    storage_gb = Column(Integer, nullable=True)
+    ram_gb = Column(Integer, nullable=True)
+    color = Column(String, nullable=True)
+    condition = Column(String, nullable=True)
+    price = Column(Integer, nullable=False) # INR
+    scraped_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+class ListingDailyStatModel(Base):
+    """Daily price rollup per canonical config and source, maintained by trends_helper."""
+    __tablename__ = "listing_daily_stats"
+
+    canonical_model = Column(String, primary_key=True)
+    storage_gb = Column(Integer, primary_key=True) # 0 = not stated
+    ram_gb = Column(Integer, primary_key=True) # 0 = not stated
+    source = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True)
+    listings = Column(Integer, nullable=False)
+    min_price = Column(Integer, nullable=False)
+    median_price = Column(Integer, nullable=False)
+    p90_price = Column(Integer, nullable=False)
+    max_price = Column(Integer, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class KBCorrectionModel(Base):
+    """Running mean / variance of review deltas per brand, model and condition; maintained by kb_corrections_helper."""
+    __tablename__ = "kb_corrections"
+
+    model = Column(String, primary_key=True) # Canonical model
+    condition_tier = Column(String, primary_key=True)
+    brand = Column(String, primary_key=True) # "" when reviews carried no brand
+    samples = Column(Integer, nullable=False)
+    mean_delta = Column(Float, nullable=False)
+    m2_delta = Column(Float, nullable=False) # Sum of squared deviations (Welford M2)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
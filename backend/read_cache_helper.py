@@ -0,0 +1,154 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Optional
+
+from fastapi import HTTPException
+from starlette.requests import Request
+from starlette.responses import Response
+
+import responses_helper
+
+# Within this many seconds of the last check a cached entry is served without asking the database.
+# Local writes invalidate immediately; this bounds how long a write made by another worker can go unseen.
+TTL_SECONDS = float(os.getenv("READ_CACHE_TTL_SECONDS", "5"))
+# Encoded bytes kept across all entries; least recently used entries are evicted beyond this.
+MAX_BYTES = int(os.getenv("READ_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+
+@dataclass
+class _Entry:
+    version: Any
+    etag: str
+    json_body: bytes  # canonical encoding; other variants are derived from it
+    headers: dict[str, str]
+    checked_at: float
+    # (media type, requested coding) -> (body, applied coding)
+    variants: dict[tuple[str, Optional[str]], tuple[bytes, Optional[str]]] = field(default_factory=dict)
+
+    @property
+    def size(self) -> int:
+        return len(self.json_body) + sum(len(b) for b, _ in self.variants.values() if b is not self.json_body)
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    # Weak comparison (RFC 9110 13.1.2): W/ prefixes are ignored.
+    tags = [t.strip() for t in if_none_match.split(",")]
+    bare = etag.removeprefix("W/")
+    return "*" in tags or any(t.removeprefix("W/") == bare for t in tags)
+
+
+class ReadCache:
+    """
+    Versioned, size-bounded LRU of encoded GET responses. An entry is reused while its version
+    matches the one read from the database (a primary-key or single-row lookup, skipped entirely
+    within TTL_SECONDS of the last check) and dropped by invalidate() when this process writes.
+    """
+
+    def __init__(self, ttl: float = TTL_SECONDS, max_bytes: int = MAX_BYTES) -> None:
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._generation = 0  # bumped by invalidate()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "revalidated": 0, "misses": 0, "not_modified": 0}
+
+    def _get(self, key: str) -> Optional[_Entry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def _put(self, key: str, entry: _Entry) -> None:
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old.size
+            self._entries[key] = entry
+            self._bytes += entry.size
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+
+    def _grow(self, key: str, entry: _Entry, variant: tuple, encoded: tuple[bytes, Optional[str]]) -> None:
+        with self._lock:
+            if self._entries.get(key) is entry and variant not in entry.variants:
+                entry.variants[variant] = encoded
+                if encoded[0] is not entry.json_body:
+                    self._bytes += len(encoded[0])
+
+    def invalidate(self, *prefixes: str) -> None:
+        """Drop every entry whose key starts with one of `prefixes`."""
+        with self._lock:
+            self._generation += 1
+            for key in [k for k in self._entries if k.startswith(prefixes)]:
+                self._bytes -= self._entries.pop(key).size
+
+    def info(self) -> dict[str, Any]:
+        """Entry count, encoded bytes and hit counters (for /health)."""
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "max_bytes": self.max_bytes, **self.stats}
+
+    async def respond(
+        self,
+        request: Request,
+        key: str,
+        etag_name: str,
+        get_version: Callable[[], Awaitable[Any]],
+        load: Callable[[], Awaitable[tuple[Any, dict[str, str]]]],
+    ) -> Response:
+        """
+        Conditional GET through the cache. `get_version()` returns the current version (raising
+        HTTPException when the resource is gone); `load()` returns (content, extra headers) and runs
+        only when the cached entry is missing or stale. Answers 304 when If-None-Match matches the ETag.
+        """
+        now = time.monotonic()
+        generation = self._generation
+        entry = self._get(key)
+        if entry is not None and now - entry.checked_at < self.ttl:
+            self.stats["hits"] += 1
+        else:
+            # The version is read before the content, so a write in between can only make the
+            # entry look stale (one extra load), never serve old data under a newer version.
+            version = await get_version()
+            if entry is not None and entry.version == version:
+                entry.checked_at = now
+                self.stats["revalidated"] += 1
+            else:
+                content, headers = await load()
+                entry = _Entry(
+                    version=version,
+                    etag=f'W/"{etag_name}-{version}"',
+                    json_body=responses_helper.dumps_json(content),
+                    headers=headers,
+                    # A local write landed while loading: keep the entry but re-check its version next time.
+                    checked_at=now if generation == self._generation else float("-inf"),
+                )
+                self._put(key, entry)
+                self.stats["misses"] += 1
+
+        headers = {**entry.headers, "ETag": entry.etag, "Cache-Control": "private, no-cache"}
+        if _etag_matches(request.headers.get("if-none-match", ""), entry.etag):
+            self.stats["not_modified"] += 1
+            return Response(status_code=304, headers={**headers, "Vary": "Accept, Accept-Encoding"})
+
+        variant = responses_helper.negotiate(request)
+        encoded = entry.variants.get(variant)
+        if encoded is None:
+            media_type, coding = variant
+            body = entry.json_body
+            if media_type != "application/json":
+                body = responses_helper.serialize(json.loads(body), media_type)
+            encoded = await responses_helper.compress(body, coding)
+            self._grow(key, entry, variant, encoded)
+        body, coding = encoded
+        return responses_helper.encoded_response(body, variant[0], coding, headers=headers)
+
+
+# Process-wide cache used by the API.
+cache = ReadCache()
@@ -0,0 +1,119 @@
+import functools
+import gzip
+import json
+import os
+from typing import Any, Mapping, Optional
+
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Bodies smaller than this are sent uncompressed (headers + CPU outweigh the saving).
+COMPRESS_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("RESPONSE_GZIP_LEVEL", "5"))
+BROTLI_QUALITY = int(os.getenv("RESPONSE_BROTLI_QUALITY", "4"))
+# Larger bodies are compressed in the threadpool so a big run does not stall the event loop.
+COMPRESS_OFFLOAD_BYTES = 256 * 1024
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+
+
+@functools.lru_cache(maxsize=None)
+def _optional(module: str) -> Any:
+    # brotli / msgpack are optional and imported on first use.
+    try:
+        return __import__(module)
+    except ImportError:
+        return None
+
+
+def dumps_json(content: Any) -> bytes:
+    """Compact UTF-8 JSON via orjson, or the stdlib when orjson is not installed."""
+    if orjson is not None:
+        return orjson.dumps(content, default=str, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=str, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _header_tokens(value: str) -> dict[str, float]:
+    """'gzip, br;q=0.5, *;q=0' -> {'gzip': 1.0, 'br': 0.5, '*': 0.0}"""
+    tokens: dict[str, float] = {}
+    for part in value.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            tokens[name.strip().lower()] = q
+    return tokens
+
+
+def _content_coding(accept_encoding: str) -> Optional[str]:
+    accepted = _header_tokens(accept_encoding)
+    if accepted.get("br", 0) > 0 and _optional("brotli") is not None:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+def _compress(body: bytes, coding: str) -> bytes:
+    if coding == "br":
+        return _optional("brotli").compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def wants_msgpack(request: Request) -> bool:
+    accepted = _header_tokens(request.headers.get("accept", ""))
+    return any(accepted.get(t, 0) > 0 for t in MSGPACK_MEDIA_TYPES)
+
+
+def negotiate(request: Request) -> tuple[str, Optional[str]]:
+    """(media type, content coding) to answer with; the coding only applies from COMPRESS_MIN_BYTES."""
+    media_type = "application/msgpack" if wants_msgpack(request) and _optional("msgpack") is not None else "application/json"
+    return media_type, _content_coding(request.headers.get("accept-encoding", ""))
+
+
+def serialize(content: Any, media_type: str) -> bytes:
+    if media_type == "application/msgpack":
+        return _optional("msgpack").packb(content, default=str)
+    return dumps_json(content)
+
+
+async def compress(body: bytes, coding: Optional[str]) -> tuple[bytes, Optional[str]]:
+    """(body, applied coding): unchanged below COMPRESS_MIN_BYTES or without an accepted coding."""
+    if not coding or len(body) < COMPRESS_MIN_BYTES:
+        return body, None
+    if len(body) >= COMPRESS_OFFLOAD_BYTES:
+        return await run_in_threadpool(_compress, body, coding), coding
+    return _compress(body, coding), coding
+
+
+def encoded_response(
+    body: bytes, media_type: str, coding: Optional[str], status_code: int = 200, headers: Optional[Mapping[str, str]] = None
+) -> Response:
+    out_headers = {"Vary": "Accept, Accept-Encoding", **(headers or {})}
+    if coding:
+        out_headers["Content-Encoding"] = coding
+    return Response(content=body, status_code=status_code, media_type=media_type, headers=out_headers)
+
+
+async def negotiated_response(
+    request: Request, content: Any, status_code: int = 200, headers: Optional[Mapping[str, str]] = None
+) -> Response:
+    """
+    Encode `content` as JSON (orjson) or, when the client Accepts it and msgpack is installed,
+    MessagePack; then compress with brotli or gzip per Accept-Encoding once the body reaches
+    COMPRESS_MIN_BYTES.
+    """
+    media_type, coding = negotiate(request)
+    body, coding = await compress(serialize(content, media_type), coding)
+    return encoded_response(body, media_type, coding, status_code, headers)
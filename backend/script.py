@@ -14,6 +14,14 @@ HEADERS = {
     "Connection": "keep-alive",
 }
 
+def _soup(html):
+    # Use lxml if installed; otherwise fall back to stdlib parser.
+    try:
+        return BeautifulSoup(html, "lxml")
+    except Exception:
+        return BeautifulSoup(html, "html.parser")
+
+
 def scrape_device_data(model_name):
     # This endpoint returns server-rendered product cards (no JS required).
     search_url = "https://ovantica.com/catalogsearch/result"
@@ -24,13 +32,12 @@ def scrape_device_data(model_name):
         timeout=30,
     )
     response.raise_for_status()
+    return parse_ovantica_search(response.text)
 
-    # Use lxml if installed; otherwise fall back to stdlib parser.
-    try:
-        soup = BeautifulSoup(response.text, "lxml")
-    except Exception:
-        soup = BeautifulSoup(response.text, "html.parser")
-    
+
+def parse_ovantica_search(html: str):
+    """Ovantica search page HTML -> list of {"name", "price", "link"} (no network)."""
+    soup = _soup(html)
     devices = []
     
     # Cards look like:
@@ -69,12 +76,12 @@ def scrape_refit_data(query: str):
         timeout=30,
     )
     response.raise_for_status()
+    return parse_refit_search(response.text)
 
-    try:
-        soup = BeautifulSoup(response.text, "lxml")
-    except Exception:
-        soup = BeautifulSoup(response.text, "html.parser")
 
+def parse_refit_search(html: str):
+    """ReFit Global search page HTML -> list of {"name", "price", "link"} (no network)."""
+    soup = _soup(html)
     products = []
 
     # Product cards in ReFit (Shopify/Dawn style).
@@ -198,8 +205,32 @@ def scrape_cashify_data(query: str, page_size: int = 20):
 
     resp = session.post(api_url, json=payload, headers=api_headers, timeout=30)
     resp.raise_for_status()
-    data = resp.json()
+    return map_cashify_results(resp.json())
+
+
+def _fmt_price(val):
+    # Format prices as ₹ strings to match other scrapers.
+    if val is None:
+        return None
+    try:
+        return f"₹{int(float(val)):,}"
+    except (ValueError, TypeError):
+        return str(val)
+
 
+def _discount_pct(sale_price, mrp):
+    # A non-numeric price (e.g. "on request") drops the discount, not the whole page.
+    try:
+        if sale_price and mrp and float(mrp) > 0:
+            return f"-{round((1 - float(sale_price) / float(mrp)) * 100)}%"
+    except (ValueError, TypeError):
+        pass
+    return None
+
+
+def map_cashify_results(data: dict):
+    """Cashify search API response -> list of product dicts (see scrape_cashify_data; no network)."""
+    base_url = "https://www.cashify.in"
     # Response: {"results": [...], "total": N, ...}
     items = data.get("results") or data.get("data", {}).get("results", [])
 
@@ -215,26 +246,13 @@ def scrape_cashify_data(query: str, page_size: int = 20):
         slug = item.get("slug") or item.get("url_slug")
         link = f"{base_url}/buy-{slug}-refurbished" if slug else None
 
-        # Format prices as ₹ strings to match other scrapers.
-        def fmt(val):
-            if val is None:
-                return None
-            try:
-                return f"₹{int(float(val)):,}"
-            except (ValueError, TypeError):
-                return str(val)
-
         products.append(
             {
                 "name": name,
-                "price": fmt(sale_price),
-                "original_price": fmt(mrp),
-                "effective_price": fmt(effective_price),
-                "discount_pct": (
-                    f"-{round((1 - float(sale_price) / float(mrp)) * 100)}%"
-                    if sale_price and mrp and float(mrp) > 0
-                    else None
-                ),
+                "price": _fmt_price(sale_price),
+                "original_price": _fmt_price(mrp),
+                "effective_price": _fmt_price(effective_price),
+                "discount_pct": _discount_pct(sale_price, mrp),
                 "rating": str(rating) if rating else None,
                 "storage": storage,
                 "image": img,
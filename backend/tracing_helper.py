@@ -0,0 +1,195 @@
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Iterator, Optional
+
+# When set, each finished job trace is appended to this file as one OTLP/JSON line
+# (an ExportTraceServiceRequest, the OpenTelemetry Collector file exporter format).
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", "")
+# Spans kept per trace; later spans are counted as dropped.
+MAX_SPANS = int(os.getenv("TRACE_MAX_SPANS", "5000"))
+SERVICE_NAME = "budli-api"
+
+_export_lock = threading.Lock()
+
+
+@dataclass
+class Span:
+    name: str
+    span_id: str
+    parent_id: Optional[str]
+    start_ns: int
+    end_ns: Optional[int] = None
+    attributes: dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def end(self, error: Optional[str] = None) -> None:
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            self.error = error
+
+
+class Trace:
+    """Spans of one job. The root span is opened on creation and closed by end()."""
+
+    def __init__(self, name: str, **attributes: Any) -> None:
+        self.trace_id = secrets.token_hex(16)
+        self.spans: list[Span] = []
+        self.dropped = 0
+        self.root = self.start(name, None, attributes)
+
+    def start(self, name: str, parent_id: Optional[str], attributes: dict[str, Any]) -> Span:
+        span = Span(name, secrets.token_hex(8), parent_id, time.time_ns(), attributes=dict(attributes))
+        if len(self.spans) < MAX_SPANS:
+            self.spans.append(span)
+        else:
+            self.dropped += 1
+        return span
+
+    def end(self, error: Optional[str] = None) -> None:
+        self.root.end(error)
+
+    def timeline(self) -> list[dict[str, Any]]:
+        """Spans in start order, with times in ms relative to the job start (duration null while running)."""
+        t0 = self.root.start_ns
+        return [
+            {
+                "name": s.name,
+                "span_id": s.span_id,
+                "parent_id": s.parent_id,
+                "start_ms": round((s.start_ns - t0) / 1e6, 1),
+                "duration_ms": round((s.end_ns - s.start_ns) / 1e6, 1) if s.end_ns is not None else None,
+                "attributes": s.attributes,
+                **({"error": s.error} if s.error else {}),
+            }
+            for s in sorted(self.spans, key=lambda s: s.start_ns)
+        ]
+
+    def critical_path(self) -> list[dict[str, Any]]:
+        """
+        Spans the job waited on, in time order: under each span, the child that finished last, then
+        the child that finished last before that one started, and so on (parallel siblings that did
+        not hold the job up are skipped). `depth` is the nesting level below the root.
+        """
+        children: dict[str, list[Span]] = {}
+        for s in self.spans:
+            if s.parent_id:
+                children.setdefault(s.parent_id, []).append(s)
+        now = time.time_ns()
+
+        def end(s: Span) -> int:
+            return s.end_ns if s.end_ns is not None else now
+
+        def walk(span: Span, depth: int) -> list[tuple[Span, int]]:
+            out: list[tuple[Span, int]] = []
+            cursor = end(span)
+            for child in sorted(children.get(span.span_id, []), key=end, reverse=True):
+                if end(child) <= cursor:
+                    out = walk(child, depth + 1) + out
+                    cursor = child.start_ns
+            return [(span, depth)] + out
+
+        t0 = self.root.start_ns
+        return [
+            {
+                "name": s.name,
+                "depth": depth,
+                "start_ms": round((s.start_ns - t0) / 1e6, 1),
+                "duration_ms": round((end(s) - s.start_ns) / 1e6, 1),
+                "attributes": s.attributes,
+            }
+            for s, depth in walk(self.root, 0)
+        ]
+
+    def to_otlp(self) -> dict[str, Any]:
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": _otlp_attributes({"service.name": SERVICE_NAME})},
+                "scopeSpans": [{
+                    "scope": {"name": "budli-api.jobs"},
+                    "spans": [
+                        {
+                            "traceId": self.trace_id,
+                            "spanId": s.span_id,
+                            **({"parentSpanId": s.parent_id} if s.parent_id else {}),
+                            "name": s.name,
+                            "kind": 1,  # SPAN_KIND_INTERNAL
+                            "startTimeUnixNano": str(s.start_ns),
+                            "endTimeUnixNano": str(s.end_ns if s.end_ns is not None else s.start_ns),
+                            "attributes": _otlp_attributes(s.attributes),
+                            "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+                        }
+                        for s in self.spans
+                    ],
+                }],
+            }]
+        }
+
+
+def _otlp_attributes(attributes: dict[str, Any]) -> list[dict[str, Any]]:
+    out = []
+    for key, value in attributes.items():
+        if isinstance(value, bool):
+            v = {"boolValue": value}
+        elif isinstance(value, int):
+            v = {"intValue": str(value)}
+        elif isinstance(value, float):
+            v = {"doubleValue": value}
+        else:
+            v = {"stringValue": str(value)}
+        out.append({"key": key, "value": v})
+    return out
+
+
+# (trace, parent span id) for the code running in this context; asyncio tasks inherit it.
+_current: ContextVar[Optional[tuple[Trace, str]]] = ContextVar("budli_trace", default=None)
+
+
+@contextmanager
+def activate(trace: Optional[Trace], parent: Optional[Span] = None) -> Iterator[None]:
+    """Record span() calls in this block (and tasks started from it) into `trace`, under `parent` or the root."""
+    if trace is None:
+        yield
+        return
+    token = _current.set((trace, (parent or trace.root).span_id))
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Child span of the current one; a no-op (yields None) outside an active trace."""
+    current = _current.get()
+    if current is None:
+        yield None
+        return
+    trace, parent_id = current
+    s = trace.start(name, parent_id, attributes)
+    token = _current.set((trace, s.span_id))
+    try:
+        yield s
+    except BaseException as e:
+        s.end(f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        s.end()
+        _current.reset(token)
+
+
+def export(trace: Trace) -> None:
+    """Append the trace to TRACE_EXPORT_PATH (blocking file I/O; no-op when unset)."""
+    if not TRACE_EXPORT_PATH:
+        return
+    line = json.dumps(trace.to_otlp(), separators=(",", ":"), default=str)
+    with _export_lock, open(TRACE_EXPORT_PATH, "a", encoding="utf-8") as f:
+        f.write(line + "\n")
@@ -0,0 +1,174 @@
+import json
+import os
+from datetime import datetime
+from typing import Any, Iterable, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+import listings_helper
+
+# Calendar days for rollups are taken in this zone (prices are INR, scraped for Indian stores).
+ROLLUP_TIMEZONE = os.getenv("TRENDS_TIMEZONE", "Asia/Kolkata")
+
+# One row per (day, canonical config, source). Unknown storage / RAM is stored as 0 so it can be part of the key.
+# The aggregate is recomputed from that group's listings, which keeps median/p90 exact.
+_ROLLUP_SELECT = """
+    SELECT
+        (l.scraped_at AT TIME ZONE :tz)::date AS day,
+        l.canonical_model,
+        COALESCE(l.storage_gb, 0) AS storage_gb,
+        COALESCE(l.ram_gb, 0) AS ram_gb,
+        l.source,
+        count(*) AS listings,
+        min(l.price) AS min_price,
+        round(percentile_cont(0.5) WITHIN GROUP (ORDER BY l.price))::int AS median_price,
+        round(percentile_cont(0.9) WITHIN GROUP (ORDER BY l.price))::int AS p90_price,
+        max(l.price) AS max_price
+    FROM listings l
+"""
+_ROLLUP_UPSERT = """
+    ON CONFLICT (canonical_model, storage_gb, ram_gb, source, day) DO UPDATE SET
+        listings = EXCLUDED.listings,
+        min_price = EXCLUDED.min_price,
+        median_price = EXCLUDED.median_price,
+        p90_price = EXCLUDED.p90_price,
+        max_price = EXCLUDED.max_price,
+        updated_at = now()
+"""
+_ROLLUP_COLUMNS = "(day, canonical_model, storage_gb, ram_gb, source, listings, min_price, median_price, p90_price, max_price)"
+
+
+def _rollup_key(row: tuple) -> tuple:
+    by_name = dict(zip(listings_helper.COPY_COLUMNS, row))
+    scraped_at = by_name["scraped_at"]
+    return (
+        scraped_at.isoformat() if isinstance(scraped_at, datetime) else None,
+        by_name["canonical_model"],
+        by_name["storage_gb"] or 0,
+        by_name["ram_gb"] or 0,
+        by_name["source"],
+    )
+
+
+# The (day, config, source) groups named by a JSON array of listing keys; the day is derived here so it matches _ROLLUP_SELECT.
+_KEY_GROUPS = """
+    SELECT DISTINCT (COALESCE(scraped_at, now()) AT TIME ZONE :tz)::date AS day,
+           canonical_model, storage_gb, ram_gb, source
+    FROM jsonb_to_recordset(CAST(:keys AS JSONB))
+        AS x(scraped_at timestamptz, canonical_model text, storage_gb int, ram_gb int, source text)
+"""
+
+
+def refresh_for_listings(db: Session, rows: Iterable[tuple], removed: bool = False) -> int:
+    """
+    Recompute the daily rollups touched by newly loaded listing tuples (listings_helper.COPY_COLUMNS
+    order). Only those (day, config, source) groups are re-aggregated. Does not commit. Returns the group count.
+
+    Call in the transaction that inserted the listings and commit right after. Each group is locked
+    (transaction-scoped advisory lock, in sorted order so concurrent loads cannot deadlock) before it
+    is re-aggregated, so a concurrent load of the same group waits for this commit and then counts
+    these listings too; otherwise the last writer would overwrite the rollup without the other's rows.
+    With removed=True the tuples are listings just deleted: their groups are dropped first, so a group
+    left without listings disappears instead of keeping its old aggregate.
+    """
+    keys = {_rollup_key(r) for r in rows}
+    if not keys:
+        return 0
+    params = {
+        "tz": ROLLUP_TIMEZONE,
+        "keys": json.dumps([
+            {"scraped_at": t, "canonical_model": m, "storage_gb": s, "ram_gb": r, "source": src}
+            for t, m, s, r, src in keys
+        ]),
+    }
+    db.execute(
+        text(
+            "SELECT count(pg_advisory_xact_lock(hashtext(k))) FROM ("
+            " SELECT concat_ws('|', 'listing_daily_stats', day, canonical_model, storage_gb, ram_gb, source) AS k"
+            " FROM (" + _KEY_GROUPS + ") g ORDER BY 1) locks"
+        ),
+        params,
+    )
+    if removed:
+        db.execute(
+            text(
+                "DELETE FROM listing_daily_stats s USING (" + _KEY_GROUPS + ") k "
+                "WHERE s.canonical_model = k.canonical_model AND s.storage_gb = k.storage_gb "
+                "AND s.ram_gb = k.ram_gb AND s.source = k.source AND s.day = k.day"
+            ),
+            params,
+        )
+    # A separate statement, so under READ COMMITTED its snapshot includes loads committed while waiting for the locks.
+    result = db.execute(
+        text(
+            "INSERT INTO listing_daily_stats " + _ROLLUP_COLUMNS + _ROLLUP_SELECT + """
+            JOIN (""" + _KEY_GROUPS + """) k
+              ON l.canonical_model = k.canonical_model
+             AND l.source = k.source
+             AND COALESCE(l.storage_gb, 0) = k.storage_gb
+             AND COALESCE(l.ram_gb, 0) = k.ram_gb
+             AND l.scraped_at >= k.day::timestamp AT TIME ZONE :tz
+             AND l.scraped_at < (k.day + 1)::timestamp AT TIME ZONE :tz
+            GROUP BY 1, 2, 3, 4, 5
+            """ + _ROLLUP_UPSERT
+        ),
+        params,
+    )
+    return result.rowcount
+
+
+def rebuild_rollups(conn: Connection) -> None:
+    """Recompute every rollup from the listings table (backfill / repair)."""
+    conn.execute(
+        text("INSERT INTO listing_daily_stats " + _ROLLUP_COLUMNS + _ROLLUP_SELECT + " GROUP BY 1, 2, 3, 4, 5" + _ROLLUP_UPSERT),
+        {"tz": ROLLUP_TIMEZONE},
+    )
+
+
+def get_trends(
+    db: Session,
+    model: str,
+    storage_gb: Optional[int] = None,
+    ram_gb: Optional[int] = None,
+    source: Optional[str] = None,
+    days: int = 90,
+) -> dict[str, Any]:
+    """
+    Daily price series for a canonical model from the precomputed rollups: one series per
+    (source, storage_gb, ram_gb), points oldest first. storage_gb / ram_gb of 0 mean "not stated".
+    """
+    canonical = listings_helper.canonical_model(model)
+    since = db.execute(
+        text("SELECT (now() AT TIME ZONE :tz)::date - CAST(:days AS INTEGER) + 1"), {"tz": ROLLUP_TIMEZONE, "days": days}
+    ).scalar_one()
+    where = ["canonical_model = :model", "day >= :since"]
+    params: dict[str, Any] = {"model": canonical, "since": since}
+    for col, value in (("storage_gb", storage_gb), ("ram_gb", ram_gb), ("source", source)):
+        if value is not None:
+            where.append(f"{col} = :{col}")
+            params[col] = value
+    rows = db.execute(
+        text(
+            "SELECT day, storage_gb, ram_gb, source, listings, min_price, median_price, p90_price, max_price "
+            "FROM listing_daily_stats WHERE " + " AND ".join(where)
+            + " ORDER BY source, storage_gb, ram_gb, day"
+        ),
+        params,
+    ).all()
+
+    series: dict[tuple, dict[str, Any]] = {}
+    for r in rows:
+        key = (r.source, r.storage_gb, r.ram_gb)
+        if key not in series:
+            series[key] = {"source": r.source, "storage_gb": r.storage_gb, "ram_gb": r.ram_gb, "points": []}
+        series[key]["points"].append({
+            "day": r.day.isoformat(),
+            "count": r.listings,
+            "min": r.min_price,
+            "median": r.median_price,
+            "p90": r.p90_price,
+            "max": r.max_price,
+        })
+    return {"model": canonical, "since": since.isoformat(), "series": list(series.values())}
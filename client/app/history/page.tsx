@@ -5,19 +5,35 @@ import Link from "next/link"
 import { Plus, Trash2, CheckCircle2, Clock, ChevronRight, FileText, Database } from "lucide-react"
 import { Button } from "@/components/ui/button"
 import { AppShell } from "@/components/app-shell"
-import { getRuns, deleteRun } from "@/lib/store"
-import type { Run } from "@/lib/types"
+import { getRunSummaries, deleteRun } from "@/lib/store"
+import type { RunSummary } from "@/lib/types"
+
+const PAGE_SIZE = 50
 
 export default function HistoryPage() {
-  const [runs, setRuns] = useState<Run[]>([])
+  const [runs, setRuns] = useState<RunSummary[]>([])
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
+
+  const loadFirstPage = async () => {
+    const page = await getRunSummaries(PAGE_SIZE)
+    setRuns(page.runs)
+    setNextCursor(page.nextCursor)
+  }
 
   useEffect(() => {
-    getRuns().then(setRuns)
+    loadFirstPage()
   }, [])
 
+  const loadMore = async () => {
+    if (!nextCursor) return
+    const page = await getRunSummaries(PAGE_SIZE, nextCursor)
+    setRuns(prev => [...prev, ...page.runs])
+    setNextCursor(page.nextCursor)
+  }
+
   const handleDelete = async (id: string) => {
     await deleteRun(id)
-    setRuns(await getRuns())
+    setRuns(prev => prev.filter(r => r.id !== id))
   }
 
   const formatINR = (n: number) => `₹${n.toLocaleString("en-IN")}`
@@ -55,10 +71,8 @@ export default function HistoryPage() {
         ) : (
           <div className="space-y-3">
             {runs.map(run => {
-              const avgPrice = run.results.length
-                ? Math.round(run.results.reduce((s, r) => s + r.recommendedPrice, 0) / run.results.length)
-                : 0
-              const withDataCount = run.results.filter(r => (r.dataFoundIn?.length ?? 0) > 0).length
+              const avgPrice = run.avgRecommendedPrice ?? 0
+              const withDataCount = run.withDataCount
 
               return (
                 <Link
@@ -86,11 +100,11 @@ export default function HistoryPage() {
                     <div className="flex flex-wrap items-center gap-4 sm:gap-6 shrink-0">
                       <div className="text-center">
                         <p className="text-xs text-muted-foreground">Devices</p>
-                        <p className="text-sm font-semibold">{run.devices.length}</p>
+                        <p className="text-sm font-semibold">{run.deviceCount}</p>
                       </div>
                       <div className="text-center">
                         <p className="text-xs text-muted-foreground">Avg Price</p>
-                        <p className="text-sm font-semibold text-primary">{run.results.length ? formatINR(avgPrice) : "—"}</p>
+                        <p className="text-sm font-semibold text-primary">{run.resultCount ? formatINR(avgPrice) : "—"}</p>
                       </div>
                       <div className="text-center">
                         <p className="text-xs text-muted-foreground">With data</p>
@@ -119,6 +133,13 @@ export default function HistoryPage() {
                 </Link>
               )
             })}
+            {nextCursor && (
+              <div className="flex justify-center pt-2">
+                <Button variant="outline" size="sm" onClick={loadMore}>
+                  Load more
+                </Button>
+              </div>
+            )}
           </div>
         )}
       </div>
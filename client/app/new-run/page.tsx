@@ -10,9 +10,9 @@ import { Input } from "@/components/ui/input"
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from "@/components/ui/select"
 import { Label } from "@/components/ui/label"
 import { AppShell } from "@/components/app-shell"
-import { saveRun, parseCSV, generateInputTemplateCSV, getKBPatterns } from "@/lib/store"
-import { startAnalyzeDevices, getAnalyzeDevicesStatus, mapAnalyzeResultsToPricingResults, startAmazonVelocityScrape, startFlipkartVelocityScrape } from "@/lib/pricing-engine"
-import type { DeviceInput, Condition, BrowserScrapeRow, PricingResult, VelocityScrapeResponse, FlipkartScrapeResponse } from "@/lib/types"
+import { getRun, saveRun, parseCSV, generateInputTemplateCSV, getKBPatterns } from "@/lib/store"
+import { startAnalyzeDevices, getAnalyzeDevicesStatus, getInstantEstimates, mapAnalyzeResultsToPricingResults, startAmazonVelocityScrape, startFlipkartVelocityScrape } from "@/lib/pricing-engine"
+import type { DeviceInput, Condition, BrowserScrapeRow, PricingResult, VelocityScrapeResponse, FlipkartScrapeResponse, KBEstimate } from "@/lib/types"
 import { cn } from "@/lib/utils"
 
 const POLL_INTERVAL_MS = 15_000 // 15 seconds
@@ -37,6 +37,10 @@ function emptyDevice(): DeviceInput {
   }
 }
 
+function defaultRunName(runName: string): string {
+  return runName || `Run ${new Date().toLocaleDateString("en-IN", { day: "2-digit", month: "short", year: "numeric" })}`
+}
+
 export default function NewRunPage() {
   const router = useRouter()
   const fileRef = useRef<HTMLInputElement>(null)
@@ -55,6 +59,8 @@ export default function NewRunPage() {
   const [lastRunResults, setLastRunResults] = useState<PricingResult[] | null>(null)
   const [completedRunId, setCompletedRunId] = useState<string | null>(null)
   const [velocityByDevice, setVelocityByDevice] = useState<Record<string, DeviceVelocityState>>({})
+  /** Nearest approved KB prices per device id, shown while the full pipeline runs. */
+  const [instantEstimates, setInstantEstimates] = useState<Record<string, KBEstimate>>({})
 
   const addDevice = () => {
     if (devices.length >= 10) return
@@ -201,6 +207,7 @@ export default function NewRunPage() {
     setProcessing(true)
     setLiveUrlsByDevice([])
     setAnalyzeJobId(null)
+    setInstantEstimates({})
 
     try {
       const payload = {
@@ -215,7 +222,16 @@ export default function NewRunPage() {
           warranty_months: "0",
           color: d.color ?? "",
         })),
+        // The server writes the run as devices finish; we only keep its id.
+        run_id: runId,
+        run_name: defaultRunName(runName),
+        run_devices: devices,
+        // Configs a reviewer has already priced consistently are taken from the KB without scraping.
+        instant_when_confident: true,
       }
+      getInstantEstimates(payload.devices)
+        .then(setInstantEstimates)
+        .catch(() => setInstantEstimates({}))
       const { job_id, live_urls_by_device } = await startAnalyzeDevices(payload)
       setAnalyzeJobId(job_id)
       setLiveUrlsByDevice(live_urls_by_device ?? [])
@@ -229,11 +245,21 @@ export default function NewRunPage() {
   const pollAnalyzeStatus = useCallback(async (aid: string) => {
     try {
       const data = await getAnalyzeDevicesStatus(aid)
+      if (data.status === "finished" && data.run_id && !data.results) {
+        const saved = await getRun(data.run_id)
+        setLastScrapeResults(saved?.scrapeResults ?? null)
+        setLastRunResults(saved?.results ?? null)
+        setCompletedRunId(data.run_id)
+        setProcessing(false)
+        setAnalyzeJobId(null)
+        setLiveUrlsByDevice([])
+        return
+      }
       if (data.status === "finished" && data.results) {
         const results = mapAnalyzeResultsToPricingResults(data.results)
         const run = {
           id: jobId!,
-          name: runName || `Run ${new Date().toLocaleDateString("en-IN", { day: "2-digit", month: "short", year: "numeric" })}`,
+          name: defaultRunName(runName),
           status: "completed" as const,
           createdAt: new Date().toISOString(),
           completedAt: new Date().toISOString(),
@@ -584,6 +610,17 @@ export default function NewRunPage() {
                 })()}
               </div>
 
+              {processing && (instantEstimates[device.id]?.estimate ?? null) !== null && (
+                <div className="border-t border-border px-4 py-2 text-xs text-muted-foreground">
+                  Instant estimate from approved history:{" "}
+                  <span className="font-semibold text-foreground">
+                    ₹{instantEstimates[device.id].estimate?.toLocaleString()}
+                  </span>{" "}
+                  ({instantEstimates[device.id].confidence} confidence, {instantEstimates[device.id].neighbors.length} nearest
+                  review{instantEstimates[device.id].neighbors.length === 1 ? "" : "s"})
+                </div>
+              )}
+
               {/* Under this device: Job ID + Live iframes (collapsible) when processing */}
               {processing && jobId && (liveUrlsByDevice[idx]?.length ?? 0) > 0 && (
                 <Collapsible defaultOpen className="group border-t border-border">
@@ -12,8 +12,9 @@ import { Input } from "@/components/ui/input"
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from "@/components/ui/select"
 import { Textarea } from "@/components/ui/textarea"
 import { AppShell } from "@/components/app-shell"
+import { ScrapeSourceTable } from "@/components/scrape-source-table"
 import { Database } from "lucide-react"
-import { getRun, saveRun, generateOutputCSV, addKBEntries } from "@/lib/store"
+import { getRun, patchRun, generateOutputCSV, addKBEntries } from "@/lib/store"
 import type { Run, PricingResult, VelocityCategory, KnowledgeBaseEntry } from "@/lib/types"
 import { cn } from "@/lib/utils"
 import Link from "next/link"
@@ -25,11 +26,13 @@ export default function RunResultsPage() {
   const [expanded, setExpanded] = useState<Record<string, boolean>>({})
   const [feedbackMode, setFeedbackMode] = useState(false)
   const [feedbackSaved, setFeedbackSaved] = useState(false)
+  const [feedbackError, setFeedbackError] = useState<string | null>(null)
   const [localResults, setLocalResults] = useState<PricingResult[]>([])
 
   useEffect(() => {
     async function loadRun() {
-      const r = await getRun(id)
+      // Scrape tables are paged per source on demand; only counts are loaded up front.
+      const r = await getRun(id, { scrape: "summary" })
       if (r) {
         setRun(r)
         setLocalResults(r.results.map(res => ({ ...res })))
@@ -66,36 +69,86 @@ export default function RunResultsPage() {
   }
 
   const submitFeedback = async () => {
-    // Save KB entries for reviewed devices
-    const entries: KnowledgeBaseEntry[] = []
-    localResults.forEach(result => {
-      if (result.humanApprovedPrice || result.isAccepted) {
-        const device = run.devices.find(d => d.id === result.deviceId)
-        if (!device) return
-        const approvedPrice = result.humanApprovedPrice ?? result.recommendedPrice
-        entries.push({
-          id: crypto.randomUUID(),
-          brand: "",
-          model: device.model,
-          ram: device.ram,
-          storage: device.storage,
-          conditionTier: device.condition,
-          recommendedPrice: result.recommendedPrice,
-          humanApprovedPrice: approvedPrice,
-          delta: approvedPrice - result.recommendedPrice,
-          velocityCategory: result.velocityCategory ?? "Medium",
-          humanVelocityOverride: result.humanVelocityOverride,
-          feedbackNote: result.humanFeedbackNote,
-          runId: run.id,
-          createdAt: new Date().toISOString(),
-        })
+    setFeedbackError(null)
+    const reviewed = localResults.filter(result => result.humanApprovedPrice || result.isAccepted)
+    const patchFor = (base: Run) => ({
+      version: base.version,
+      feedbackSubmitted: true,
+      // Send only the reviewed results; the rest of the run is untouched server-side.
+      results: reviewed.map(result => ({ deviceId: result.deviceId, result })),
+    })
+
+    let base = run
+    let outcome = await patchRun(run.id, patchFor(base))
+    if (!outcome.ok && outcome.conflict) {
+      // Saved elsewhere since this page loaded: reload, and only overwrite others' edits to the same devices if confirmed.
+      const fresh = await getRun(run.id, { scrape: "summary" })
+      if (!fresh) {
+        setFeedbackError("This run was changed elsewhere and could not be reloaded. Refresh the page and try again.")
+        return
       }
+      const loaded = new Map(run.results.map(r => [r.deviceId, JSON.stringify(r)]))
+      const clashes = reviewed.filter(r => {
+        const current = fresh.results.find(f => f.deviceId === r.deviceId)
+        return current && JSON.stringify(current) !== loaded.get(r.deviceId)
+      })
+      const names = clashes.map(r => run.devices.find(d => d.id === r.deviceId)?.model ?? r.deviceId)
+      if (
+        (fresh.feedbackSubmitted || clashes.length > 0) &&
+        !window.confirm(
+          fresh.feedbackSubmitted && clashes.length === 0
+            ? "Feedback for this run was already submitted elsewhere. Submit yours as well?"
+            : `These devices were changed elsewhere since you opened this run: ${names.join(", ")}. Overwrite them with your review?`
+        )
+      ) {
+        setFeedbackError("Not saved: this run was changed elsewhere. Refresh the page to see the latest version.")
+        return
+      }
+      base = fresh
+      outcome = await patchRun(run.id, patchFor(base))
+    }
+    if (!outcome.ok) {
+      setFeedbackError(
+        outcome.conflict
+          ? "Not saved: this run was changed again while saving. Try again."
+          : "Could not save feedback. Check your connection and try again."
+      )
+      return
+    }
+
+    // KB entries are added once the run is saved, so a failed or retried save does not add them twice.
+    const entries: KnowledgeBaseEntry[] = []
+    reviewed.forEach(result => {
+      const device = run.devices.find(d => d.id === result.deviceId)
+      if (!device) return
+      const approvedPrice = result.humanApprovedPrice ?? result.recommendedPrice
+      entries.push({
+        id: crypto.randomUUID(),
+        brand: "",
+        model: device.model,
+        ram: device.ram,
+        storage: device.storage,
+        conditionTier: device.condition,
+        recommendedPrice: result.recommendedPrice,
+        humanApprovedPrice: approvedPrice,
+        delta: approvedPrice - result.recommendedPrice,
+        basePrice: result.kbCorrection?.base_price ?? null,
+        velocityCategory: result.velocityCategory ?? "Medium",
+        humanVelocityOverride: result.humanVelocityOverride,
+        feedbackNote: result.humanFeedbackNote,
+        runId: run.id,
+        createdAt: new Date().toISOString(),
+      })
     })
     await addKBEntries(entries)
 
-    const updated: Run = { ...run, results: localResults, feedbackSubmitted: true }
-    await saveRun(updated)
-    setRun(updated)
+    const byDevice = new Map(reviewed.map(r => [r.deviceId, r]))
+    const results = [
+      ...base.results.map(r => byDevice.get(r.deviceId) ?? r),
+      ...reviewed.filter(r => !base.results.some(b => b.deviceId === r.deviceId)),
+    ]
+    setRun({ ...base, results, feedbackSubmitted: true, version: outcome.version })
+    setLocalResults(results.map(res => ({ ...res })))
     setFeedbackSaved(true)
     setFeedbackMode(false)
   }
@@ -156,6 +209,13 @@ export default function RunResultsPage() {
           ))}
         </div>
 
+        {feedbackError && (
+          <div className="mb-6 flex items-center gap-2 text-sm text-destructive bg-destructive/10 border border-destructive/20 rounded-md px-4 py-3">
+            <AlertCircle className="w-4 h-4" />
+            {feedbackError}
+          </div>
+        )}
+
         {feedbackSaved && (
           <div className="mb-6 flex items-center gap-2 text-sm text-primary bg-primary/10 border border-primary/20 rounded-md px-4 py-3">
             <CheckCircle2 className="w-4 h-4" />
@@ -415,65 +475,18 @@ export default function RunResultsPage() {
                     )}
 
                     {/* Scraped data by source — 3 tables, this device only */}
-                    {run.scrapeResults && Object.keys(run.scrapeResults).length > 0 && (() => {
-                      const deviceModelNorm = device.model.trim().toLowerCase()
-                      const sourceConfig = [
-                        { key: "ovantica", label: "Ovantica" },
-                        { key: "refitglobal", label: "ReFit Global" },
-                        { key: "cashify", label: "Cashify" },
-                      ] as const
-                      const rowMatchesDevice = (rowModel: string | undefined) => {
-                        const r = (rowModel ?? "").trim().toLowerCase()
-                        return r === deviceModelNorm || r.includes(deviceModelNorm) || deviceModelNorm.includes(r)
-                      }
-                      return (
-                        <div className="space-y-4">
-                          <p className="text-xs font-semibold text-muted-foreground uppercase tracking-wide">Scraped data by source</p>
-                          {sourceConfig.map(({ key, label }) => {
-                            const allRows = run.scrapeResults![key] ?? []
-                            const rows = allRows.filter((row: { Model?: string }) => rowMatchesDevice(row.Model))
-                            return (
-                              <div key={key} className="rounded-lg border border-border overflow-hidden bg-card">
-                                <div className="px-3 py-2 bg-muted/50 border-b border-border">
-                                  <p className="text-sm font-medium text-foreground">{label}</p>
-                                  <p className="text-[10px] text-muted-foreground">{rows.length} listing(s)</p>
-                                </div>
-                                <div className="overflow-x-auto">
-                                  {rows.length > 0 ? (
-                                    <table className="w-full text-xs min-w-[320px]">
-                                      <thead>
-                                        <tr className="bg-muted/30 border-b border-border">
-                                          <th className="text-left py-2 px-3 font-medium">Storage</th>
-                                          <th className="text-left py-2 px-3 font-medium">Model</th>
-                                          <th className="text-left py-2 px-3 font-medium">RAM</th>
-                                          <th className="text-left py-2 px-3 font-medium">Color</th>
-                                          <th className="text-left py-2 px-3 font-medium">Condition</th>
-                                          <th className="text-left py-2 px-3 font-medium">Price</th>
-                                        </tr>
-                                      </thead>
-                                      <tbody>
-                                        {rows.map((row: { Storage?: string; Model?: string; Ram?: string; Color?: string; Condition?: string; Price?: string }, i: number) => (
-                                          <tr key={i} className="border-b border-border last:border-0">
-                                            <td className="py-2 px-3">{row.Storage ?? "—"}</td>
-                                            <td className="py-2 px-3">{row.Model ?? "—"}</td>
-                                            <td className="py-2 px-3">{row.Ram ?? "—"}</td>
-                                            <td className="py-2 px-3">{row.Color ?? "—"}</td>
-                                            <td className="py-2 px-3">{row.Condition ?? "—"}</td>
-                                            <td className="py-2 px-3">{row.Price ?? "—"}</td>
-                                          </tr>
-                                        ))}
-                                      </tbody>
-                                    </table>
-                                  ) : (
-                                    <p className="text-xs text-muted-foreground px-3 py-4">No listings for this device from this source.</p>
-                                  )}
-                                </div>
-                              </div>
-                            )
-                          })}
-                        </div>
-                      )
-                    })()}
+                    {run.scrapeCounts && Object.values(run.scrapeCounts).some(n => n > 0) && (
+                      <div className="space-y-4">
+                        <p className="text-xs font-semibold text-muted-foreground uppercase tracking-wide">Scraped data by source</p>
+                        {([
+                          { key: "ovantica", label: "Ovantica" },
+                          { key: "refitglobal", label: "ReFit Global" },
+                          { key: "cashify", label: "Cashify" },
+                        ] as const).map(({ key, label }) => (
+                          <ScrapeSourceTable key={key} runId={run.id} source={key} label={label} model={device.model.trim()} />
+                        ))}
+                      </div>
+                    )}
 
                     {/* Human review */}
                     {feedbackMode && (
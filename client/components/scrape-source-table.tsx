@@ -0,0 +1,109 @@
+"use client"
+
+import { useEffect, useState } from "react"
+import { ChevronLeft, ChevronRight } from "lucide-react"
+import { getRunScrapePage } from "@/lib/store"
+import type { RunScrapePage, RunScrapeQuery } from "@/lib/types"
+
+const PAGE_SIZE = 25
+
+type SortKey = NonNullable<RunScrapeQuery["sort"]>
+
+const COLUMNS: { key: "Storage" | "Model" | "Ram" | "Color" | "Condition" | "Price"; label: string; sort?: SortKey }[] = [
+  { key: "Storage", label: "Storage", sort: "storage" },
+  { key: "Model", label: "Model", sort: "model" },
+  { key: "Ram", label: "RAM", sort: "ram" },
+  { key: "Color", label: "Color" },
+  { key: "Condition", label: "Condition", sort: "condition" },
+  { key: "Price", label: "Price", sort: "price" },
+]
+
+/** One source's scraped listings for a run, paged, sorted and filtered server-side. */
+export function ScrapeSourceTable({ runId, source, label, model }: { runId: string; source: string; label: string; model?: string }) {
+  const [page, setPage] = useState<RunScrapePage | null>(null)
+  const [offset, setOffset] = useState(0)
+  const [sort, setSort] = useState<SortKey>("index")
+  const [order, setOrder] = useState<"asc" | "desc">("asc")
+
+  useEffect(() => {
+    getRunScrapePage(runId, source, { offset, limit: PAGE_SIZE, sort, order, model }).then(setPage)
+  }, [runId, source, offset, sort, order, model])
+
+  const toggleSort = (key: SortKey) => {
+    if (sort === key) {
+      setOrder(order === "asc" ? "desc" : "asc")
+    } else {
+      setSort(key)
+      setOrder("asc")
+    }
+    setOffset(0)
+  }
+
+  const total = page?.total ?? 0
+  const rows = page?.items ?? []
+
+  return (
+    <div className="rounded-lg border border-border overflow-hidden bg-card">
+      <div className="px-3 py-2 bg-muted/50 border-b border-border flex items-center justify-between gap-2">
+        <div>
+          <p className="text-sm font-medium text-foreground">{label}</p>
+          <p className="text-[10px] text-muted-foreground">{total} listing(s)</p>
+        </div>
+        {total > PAGE_SIZE && (
+          <div className="flex items-center gap-1 text-[10px] text-muted-foreground">
+            <button
+              onClick={() => setOffset(Math.max(0, offset - PAGE_SIZE))}
+              disabled={offset === 0}
+              className="p-1 disabled:opacity-40"
+            >
+              <ChevronLeft className="w-3.5 h-3.5" />
+            </button>
+            <span>
+              {offset + 1}–{Math.min(offset + PAGE_SIZE, total)} of {total}
+            </span>
+            <button
+              onClick={() => setOffset(offset + PAGE_SIZE)}
+              disabled={offset + PAGE_SIZE >= total}
+              className="p-1 disabled:opacity-40"
+            >
+              <ChevronRight className="w-3.5 h-3.5" />
+            </button>
+          </div>
+        )}
+      </div>
+      <div className="overflow-x-auto">
+        {rows.length > 0 ? (
+          <table className="w-full text-xs min-w-[320px]">
+            <thead>
+              <tr className="bg-muted/30 border-b border-border">
+                {COLUMNS.map(col => (
+                  <th key={col.key} className="text-left py-2 px-3 font-medium">
+                    {col.sort ? (
+                      <button onClick={() => toggleSort(col.sort!)} className="hover:text-primary">
+                        {col.label}
+                        {sort === col.sort ? (order === "asc" ? " ↑" : " ↓") : ""}
+                      </button>
+                    ) : (
+                      col.label
+                    )}
+                  </th>
+                ))}
+              </tr>
+            </thead>
+            <tbody>
+              {rows.map(row => (
+                <tr key={row._index} className="border-b border-border last:border-0">
+                  {COLUMNS.map(col => (
+                    <td key={col.key} className="py-2 px-3">{row[col.key] ?? "—"}</td>
+                  ))}
+                </tr>
+              ))}
+            </tbody>
+          </table>
+        ) : (
+          <p className="text-xs text-muted-foreground px-3 py-4">No listings for this device from this source.</p>
+        )}
+      </div>
+    </div>
+  )
+}
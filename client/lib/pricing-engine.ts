@@ -3,6 +3,9 @@ import type {
   PricingResult,
   MarketSignal,
   KBPattern,
+  KBCorrection,
+  KBEstimate,
+  LLMUsage,
   ScrapeStartResponse,
   ScrapeResultsResponse,
   VelocityScrapeRequest,
@@ -90,7 +93,15 @@ export async function startFlipkartVelocityScrape(
 // Async analyze-devices (POST /analyze-devices/start, GET /analyze-devices/status/{job_id})
 // -------------------------------------------------------------------
 
-export async function startAnalyzeDevices(payload: { devices: Array<{ id: string; brand: string; model: string; storage_gb: string; ram_gb: string; network_type: string; condition_tier: string; warranty_months: string }> }): Promise<AnalyzeDevicesStartResponse> {
+export async function startAnalyzeDevices(payload: {
+  devices: Array<{ id: string; brand: string; model: string; storage_gb: string; ram_gb: string; network_type: string; condition_tier: string; warranty_months: string }>
+  /** Have the server write results into this run as devices finish. */
+  run_id?: string
+  run_name?: string
+  run_devices?: DeviceInput[]
+  /** Price devices with a high-confidence KB estimate without scraping them. */
+  instant_when_confident?: boolean
+}): Promise<AnalyzeDevicesStartResponse> {
   const res = await fetch(`${API_BASE_URL}/analyze-devices/start`, {
     method: "POST",
     headers: { "Content-Type": "application/json" },
@@ -112,6 +123,31 @@ export async function getAnalyzeDevicesStatus(jobId: string): Promise<AnalyzeDev
   return res.json()
 }
 
+// -------------------------------------------------------------------
+// Instant estimates from approved KB prices (POST /kb/estimate)
+// -------------------------------------------------------------------
+
+export async function getInstantEstimates(
+  devices: Array<{ id: string; brand?: string; model: string; storage_gb?: string; ram_gb?: string; condition_tier?: string }>,
+  k = 5,
+): Promise<Record<string, KBEstimate>> {
+  const res = await fetch(`${API_BASE_URL}/kb/estimate`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ devices, k }),
+  })
+  if (!res.ok) {
+    const err = await res.json().catch(() => ({}))
+    throw new Error(err.detail || res.statusText || "Failed to get instant estimates")
+  }
+  const data = (await res.json()) as { results: Array<KBEstimate & { id: string | null }> }
+  const byId: Record<string, KBEstimate> = {}
+  for (const { id, ...est } of data.results) {
+    if (id) byId[id] = est
+  }
+  return byId
+}
+
 // Response shape from POST /analyze-devices (aligned with backend)
 interface AnalyzeDevicesApiResult {
   id: string
@@ -530,6 +566,9 @@ export function mapAnalyzeResultsToPricingResults(
     source_urls?: Array<{ source: string; url: string }>
     amazon_velocity_items?: Array<{ title?: string | null; link?: string | null; rating?: string | null; reviews?: string | null; bought?: string | null }>
     flipkart_velocity_items?: Array<{ title?: string | null; link?: string | null; price?: string | null; rating?: string | null }>
+    kb_correction?: KBCorrection | null
+    instant_estimate?: KBEstimate | null
+    llm_usage?: LLMUsage | null
   }>
 ): PricingResult[] {
   return results.map((r) => {
@@ -573,6 +612,9 @@ export function mapAnalyzeResultsToPricingResults(
       sourceUrl: r.source_url,
       amazonVelocityItems: r.amazon_velocity_items ?? [],
       flipkartVelocityItems: r.flipkart_velocity_items ?? [],
+      kbCorrection: r.kb_correction ?? null,
+      instantEstimate: r.instant_estimate ?? null,
+      llmUsage: r.llm_usage ?? null,
     };
   });
 }
@@ -1,6 +1,6 @@
 "use client"
 
-import type { Run, KnowledgeBaseEntry, KBPattern } from "./types"
+import type { Run, RunPatch, RunPatchOutcome, RunSummaryPage, RunScrapePage, RunScrapeQuery, KnowledgeBaseEntry, KBPattern } from "./types"
 
 const API_BASE_URL = process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000"
 
@@ -17,9 +17,23 @@ export async function getRuns(): Promise<Run[]> {
   }
 }
 
-export async function getRun(id: string): Promise<Run | null> {
+export async function getRunSummaries(limit = 50, cursor?: string | null): Promise<RunSummaryPage> {
   try {
-    const res = await fetch(`${API_BASE_URL}/runs/${id}`)
+    const params = new URLSearchParams({ view: "summary", limit: String(limit) })
+    if (cursor) params.set("cursor", cursor)
+    const res = await fetch(`${API_BASE_URL}/runs?${params}`)
+    if (!res.ok) return { runs: [], nextCursor: null }
+    return { runs: await res.json(), nextCursor: res.headers.get("X-Next-Cursor") }
+  } catch (err) {
+    console.error("Failed to get run summaries", err)
+    return { runs: [], nextCursor: null }
+  }
+}
+
+export async function getRun(id: string, opts: { scrape?: "full" | "summary" } = {}): Promise<Run | null> {
+  try {
+    const query = opts.scrape ? `?scrape=${opts.scrape}` : ""
+    const res = await fetch(`${API_BASE_URL}/runs/${id}${query}`)
     if (!res.ok) return null
     return await res.json()
   } catch (err) {
@@ -28,6 +42,27 @@ export async function getRun(id: string): Promise<Run | null> {
   }
 }
 
+export async function getRunScrapePage(runId: string, source: string, q: RunScrapeQuery = {}): Promise<RunScrapePage | null> {
+  try {
+    const params = new URLSearchParams()
+    if (q.offset !== undefined) params.set("offset", String(q.offset))
+    if (q.limit !== undefined) params.set("limit", String(q.limit))
+    if (q.sort) params.set("sort", q.sort)
+    if (q.order) params.set("order", q.order)
+    if (q.minPrice !== undefined) params.set("min_price", String(q.minPrice))
+    if (q.maxPrice !== undefined) params.set("max_price", String(q.maxPrice))
+    if (q.storageGb !== undefined) params.set("storage_gb", String(q.storageGb))
+    if (q.condition) params.set("condition", q.condition)
+    if (q.model) params.set("model", q.model)
+    const res = await fetch(`${API_BASE_URL}/runs/${runId}/scrape/${source}?${params}`)
+    if (!res.ok) return null
+    return await res.json()
+  } catch (err) {
+    console.error("Failed to get scrape page", err)
+    return null
+  }
+}
+
 export async function saveRun(run: Run): Promise<void> {
   try {
     await fetch(`${API_BASE_URL}/runs`, {
@@ -40,6 +75,26 @@ export async function saveRun(run: Run): Promise<void> {
   }
 }
 
+export async function patchRun(id: string, patch: RunPatch): Promise<RunPatchOutcome> {
+  try {
+    const res = await fetch(`${API_BASE_URL}/runs/${id}`, {
+      method: "PATCH",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify(patch)
+    })
+    if (res.status === 409) {
+      const body = await res.json().catch(() => null)
+      return { ok: false, conflict: true, version: body?.detail?.version }
+    }
+    if (!res.ok) return { ok: false, conflict: false }
+    const { version } = await res.json()
+    return { ok: true, version }
+  } catch (err) {
+    console.error("Failed to patch run", err)
+    return { ok: false, conflict: false }
+  }
+}
+
 export async function deleteRun(id: string): Promise<void> {
   try {
     await fetch(`${API_BASE_URL}/runs/${id}`, {
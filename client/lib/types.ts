@@ -62,6 +62,12 @@ export interface PricingResult {
   /** Velocity listings for UI: Amazon (bought, rating, reviews, title, link) and Flipkart (rating, price, title, link) */
   amazonVelocityItems?: AmazonVelocityItem[]
   flipkartVelocityItems?: FlipkartVelocityItem[]
+  /** Correction learned from reviewed prices; basePrice is set when it was applied to recommendedPrice. */
+  kbCorrection?: KBCorrection | null
+  /** Set when the price came straight from approved KB history (the scrape and LLM were skipped). */
+  instantEstimate?: KBEstimate | null
+  /** Bedrock tokens and estimated cost spent pricing this device (null when the price was reused). */
+  llmUsage?: LLMUsage | null
   // Human review fields
   humanApprovedPrice?: number
   humanVelocityOverride?: VelocityCategory
@@ -80,7 +86,72 @@ export interface Run {
   results: PricingResult[]
   /** Per-source scrape tables (ovantica, refitglobal, cashify -> list of rows). Stored in DB, shown on run detail. */
   scrapeResults?: Record<string, BrowserScrapeRow[]> | null
+  /** Listings per source when loaded with getRun(id, { scrape: "summary" }); rows are paged via getRunScrapePage. */
+  scrapeCounts?: Record<string, number>
   feedbackSubmitted: boolean
+  /** Bumped by the server on every save; pass it to patchRun for optimistic concurrency. */
+  version?: number
+  /** Bedrock tokens and estimated cost for the run, with a by_device_id breakdown. */
+  llmUsage?: LLMUsage | null
+}
+
+/** Body of PATCH /runs/{id}: only the given fields are written. */
+export interface RunPatch {
+  version?: number
+  name?: string
+  status?: RunStatus
+  completedAt?: string
+  feedbackSubmitted?: boolean
+  /** Each item replaces the result with that deviceId (appended if missing) or at that index. */
+  results?: { deviceId?: string; index?: number; result: PricingResult }[]
+  /** Replaces only the listed sources. */
+  scrapeResults?: Record<string, BrowserScrapeRow[]>
+}
+
+export type RunPatchOutcome =
+  | { ok: true; version: number }
+  | { ok: false; conflict: boolean; version?: number }
+
+/** One page of GET /runs/{id}/scrape/{source}. */
+export interface RunScrapePage {
+  runId: string
+  source: string
+  total: number
+  offset: number
+  limit: number
+  items: Array<BrowserScrapeRow & { _index: number }>
+}
+
+export interface RunScrapeQuery {
+  offset?: number
+  limit?: number
+  sort?: "index" | "price" | "storage" | "ram" | "condition" | "model"
+  order?: "asc" | "desc"
+  minPrice?: number
+  maxPrice?: number
+  storageGb?: number
+  condition?: string
+  model?: string
+}
+
+/** Row of GET /runs?view=summary: counts computed server-side instead of full devices/results blobs. */
+export interface RunSummary {
+  id: string
+  name: string
+  status: RunStatus
+  createdAt: string
+  completedAt?: string | null
+  feedbackSubmitted: boolean
+  deviceCount: number
+  resultCount: number
+  avgRecommendedPrice: number | null
+  withDataCount: number
+}
+
+export interface RunSummaryPage {
+  runs: RunSummary[]
+  /** Pass to the next getRunSummaries call; null on the last page. */
+  nextCursor: string | null
 }
 
 export interface KnowledgeBaseEntry {
@@ -93,6 +164,8 @@ export interface KnowledgeBaseEntry {
   recommendedPrice: number
   humanApprovedPrice: number
   delta: number // human - recommended
+  /** Price before the KB correction (kbCorrection.base_price); corrections learn from human - basePrice. */
+  basePrice?: number | null
   velocityCategory: VelocityCategory
   humanVelocityOverride?: VelocityCategory
   feedbackNote?: string
@@ -100,6 +173,48 @@ export interface KnowledgeBaseEntry {
   createdAt: string
 }
 
+/** Running statistics of human-approved minus recommended price for one brand/model/condition. */
+export interface KBCorrection {
+  key: string
+  samples: number
+  mean_delta: number
+  stddev_delta: number | null
+  adjustment: number
+  base_price?: number
+}
+
+export interface KBNeighbor {
+  id: string
+  price: number
+  distance: number
+  model: string
+  storage_gb: number | null
+  ram_gb: number | null
+  condition: string
+  createdAt: string | null
+}
+
+/** k-nearest approved KB prices for a device config (POST /kb/estimate). */
+export interface KBEstimate {
+  estimate: number | null
+  confidence: "high" | "medium" | "low" | "none"
+  neighbors: KBNeighbor[]
+}
+
+/** Bedrock token / cost totals (llm_usage_helper.summarize on the server); by_<key> maps hold the same totals. */
+export interface LLMUsage {
+  calls: number
+  input_tokens: number
+  output_tokens: number
+  cache_creation_input_tokens: number
+  cache_read_input_tokens: number
+  latency_ms: number
+  cost_usd: number
+  by_model?: Record<string, LLMUsage>
+  by_caller?: Record<string, LLMUsage>
+  by_device_id?: Record<string, LLMUsage>
+}
+
 export interface KBPattern {
   key: string // brand+model+condition
   avgDelta: number
@@ -188,6 +303,8 @@ export interface AnalyzeDevicesStartResponse {
   job_id: string
   /** 3 URLs per device: [Ovantica, ReFit Global, Cashify]. One entry per device. */
   live_urls_by_device: string[][]
+  /** Run the job writes its results into (when started with run_id / run_name). */
+  run_id?: string
 }
 
 export interface AnalyzeDevicesStatusResponse {
@@ -196,6 +313,10 @@ export interface AnalyzeDevicesStatusResponse {
   /** 3 URLs per device when running. */
   live_urls_by_device?: string[][]
   error?: string
+  /** Set when the job persists to a run; results are then read from the run instead of returned here. */
+  run_id?: string
+  /** Persisting to the run failed; results are returned inline instead. */
+  run_error?: string
   results?: Array<{
     id: string
     predicted_price?: string
@@ -209,6 +330,11 @@ export interface AnalyzeDevicesStatusResponse {
     /** Full velocity items for UI: title, link, rating, reviews, bought (Amazon); title, link, price, rating (Flipkart) */
     amazon_velocity_items?: AmazonVelocityItem[]
     flipkart_velocity_items?: FlipkartVelocityItem[]
+    kb_correction?: KBCorrection | null
+    instant_estimate?: KBEstimate | null
+    llm_usage?: LLMUsage | null
   }>
   scrape_results?: Record<string, BrowserScrapeRow[]>
+  /** Bedrock tokens and estimated cost so far (final once the job ends), by model, caller and device. */
+  llm_usage?: LLMUsage
 }